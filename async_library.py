@@ -0,0 +1,232 @@
+"""
+asyncio facade for library_app.
+
+    async with AsyncLibrary() as library:
+        books = await library.search_books("myth")
+        ok, msg = await library.checkout_book("0195153448", "ID000010")
+
+Reads run concurrently on a thread pool, each worker thread with its
+own read-only connection. Writes are queued to a single writer task
+that takes whatever has piled up (up to max_batch operations, waiting
+at most batch_window seconds for more) and applies it with
+library_app.apply_batch(): one transaction, one savepoint per
+operation, one commit for the whole group.
+
+Backpressure: at most max_pending writes may wait in the queue; further
+callers wait for room (and time out like any other call). Writes made
+after close() fail with RuntimeError. Every method
+takes a timeout (seconds) and raises asyncio.TimeoutError when it
+expires. A write that times out before its batch starts is dropped; one
+that times out while its batch is already running may still be applied.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import library_app as library
+
+
+class AsyncLibrary:
+    def __init__(self, db_file=None, readers=4, max_pending=200, max_batch=64,
+                 batch_window=0.005, timeout=10.0):
+        self.db_file = db_file or library.DB_FILE
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.timeout = timeout
+        self.max_pending = max_pending
+
+        self._readers = ThreadPoolExecutor(readers, thread_name_prefix="library-read")
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="library-write")
+        self._reader_local = threading.local()
+        self._reader_conns = []
+        self._writer_conn = None
+        self._queue = None
+        self._writer_task = None
+        self._closing = False
+        self._stopped = False
+
+        # Group-commit counters
+        self.batches = 0
+        self.writes = 0
+
+    # ---------------- Lifecycle ----------------
+    async def start(self):
+        self._queue = asyncio.Queue(self.max_pending)
+        self._closing = self._stopped = False
+        self._writer_task = asyncio.create_task(self._write_loop())
+        return self
+
+    async def close(self):
+        self._closing = True
+        if self._writer_task is not None:
+            await self._queue.put(None)
+            await self._writer_task
+            self._writer_task = None
+        self._readers.shutdown()
+        self._writer.shutdown()
+        for conn in self._reader_conns:
+            conn.close()
+        if self._writer_conn is not None:
+            self._writer_conn.close()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    # ---------------- Reads ----------------
+    def _run_read(self, function, args):
+        # Runs on a reader thread; each thread keeps its own connection
+        conn = getattr(self._reader_local, 'conn', None)
+        if conn is None:
+            conn = library.open_connection(self.db_file, read_only=True, check_same_thread=False)
+            self._reader_local.conn = conn
+            self._reader_conns.append(conn)
+        with library.use_connection(read_conn=conn):
+            return function(*args)
+
+    async def _read(self, function, args, timeout):
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._readers, self._run_read, function, args)
+        return await asyncio.wait_for(future, timeout or self.timeout)
+
+    async def search_books(self, search_term, timeout=None):
+        return await self._read(library.search_books, (search_term,), timeout)
+
+    async def get_borrower_fines(self, card_id, include_paid=False, timeout=None):
+        return await self._read(library.get_borrower_fines, (card_id, include_paid), timeout)
+
+    # ---------------- Writes ----------------
+    async def _write(self, function, args, timeout):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout)
+        future = loop.create_future()
+        if self._closing:
+            raise RuntimeError("AsyncLibrary is closed.")
+        # Waits here while max_pending writes are already queued
+        await asyncio.wait_for(self._queue.put((function, args, future)),
+                               deadline - loop.time())
+        if self._stopped:
+            # Queued after the writer task had already finished
+            self._fail_pending()
+        # Cancelling the future on timeout tells the writer to skip it
+        return await asyncio.wait_for(future, max(0, deadline - loop.time()))
+
+    async def _write_loop(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            window_ends = loop.time() + self.batch_window
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = window_ends - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            # Callers that already gave up are not applied at all
+            batch = [entry for entry in batch if not entry[2].done()]
+            if not batch:
+                continue
+            calls = [(function, args) for function, args, _ in batch]
+            try:
+                results = await loop.run_in_executor(self._writer, self._run_batch, calls)
+            except Exception as e:
+                results = [e] * len(batch)
+
+            self.batches += 1
+            self.writes += len(batch)
+            for (_, _, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+        self._stopped = True
+        self._fail_pending()
+
+    def _fail_pending(self):
+        # Writes queued behind the shutdown marker: nothing will apply them
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            if item is not None and not item[2].done():
+                item[2].set_exception(RuntimeError("AsyncLibrary is closed."))
+
+    def _run_batch(self, calls):
+        # Runs on the single writer thread
+        if self._writer_conn is None:
+            self._writer_conn = library.open_connection(self.db_file, check_same_thread=False)
+        return library.apply_batch(self._writer_conn, calls)
+
+    async def checkout_book(self, isbn, card_id, timeout=None):
+        return await self._write(library.checkout_book, (isbn, card_id), timeout)
+
+    async def checkin_book(self, loan_id, timeout=None):
+        return await self._write(library.checkin_book, (loan_id,), timeout)
+
+    async def add_borrower(self, bname, ssn, address, phone, timeout=None):
+        return await self._write(library.add_borrower, (bname, ssn, address, phone), timeout)
+
+    async def update_all_fines(self, timeout=None):
+        return await self._write(library.update_all_fines, (), timeout)
+
+    async def pay_borrower_fines(self, card_id, timeout=None):
+        return await self._write(library.pay_borrower_fines, (card_id,), timeout)
+
+
+async def _demo(db_file, count=200):
+    """Concurrent checkouts + check-ins; prints how many commits they took."""
+    async with AsyncLibrary(db_file) as lib:
+        books = (await lib.search_books("the"))[:count]
+        borrowers = [f"ID{n:06d}" for n in range(1, count + 1)]
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(
+            lib.checkout_book(book['Isbn'], card) for book, card in zip(books, borrowers)))
+        elapsed = time.perf_counter() - started
+        ok = sum(1 for success, _ in results if success)
+        print(f"{len(results)} checkouts ({ok} ok) in {elapsed:.2f}s: "
+              f"{lib.batches} commit(s), {len(results) / elapsed:.0f} ops/sec")
+
+        loans = await lib._read(library.search_active_loans, ("",), None)
+        batches_before = lib.batches
+        started = time.perf_counter()
+        await asyncio.gather(*(lib.checkin_book(loan['Loan_id']) for loan in loans))
+        elapsed = time.perf_counter() - started
+        print(f"{len(loans)} check-ins in {elapsed:.2f}s: "
+              f"{lib.batches - batches_before} commit(s)")
+
+
+if __name__ == "__main__":
+    import os
+    import shutil
+    import tempfile
+
+    # Work on a copy so the demo leaves library.db untouched
+    workdir = tempfile.mkdtemp()
+    db_copy = os.path.join(workdir, "library.db")
+    shutil.copy(library.DB_FILE, db_copy)
+    try:
+        asyncio.run(_demo(db_copy))
+    finally:
+        shutil.rmtree(workdir)
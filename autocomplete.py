@@ -0,0 +1,203 @@
+import heapq
+import re
+from array import array
+from bisect import bisect_left
+
+# Keys are lower-case words separated by single spaces, so "Harry Potter
+# and the..." and "harry  potter" share the same prefix range.
+_NON_WORD_RE = re.compile(r"[^a-z0-9]+")
+
+KIND_TITLE = "title"
+KIND_AUTHOR = "author"
+KIND_ISBN = "isbn"
+
+
+def normalize_key(text):
+    """Lower-case, punctuation-free form used for prefix matching."""
+    return _NON_WORD_RE.sub(" ", (text or "").lower()).strip()
+
+
+class SuggestIndex:
+    """
+    Prefix autocomplete over titles, author names and ISBNs.
+
+    All completions live in one array sorted by normalized key, so a
+    prefix maps to a contiguous [lo, hi) range found with two bisects.
+    A max segment tree over the frequency column returns the top-k of
+    that range in O(k log n), no matter how many keys share the prefix.
+    """
+
+    def __init__(self, entries):
+        # entries: iterable of (key, display, kind, frequency)
+        entries = sorted(entries)
+        self.keys = [e[0] for e in entries]
+        self.displays = [e[1] for e in entries]
+        self.kinds = [e[2] for e in entries]
+        self.freq = array('l', (e[3] for e in entries))
+        self._build_tree()
+
+    # ---------------- Loading ----------------
+    @classmethod
+    def load(cls, conn):
+        """Builds the index from BOOK, AUTHORS, BOOK_AUTHORS and loan counts."""
+        cursor = conn.cursor()
+
+        # Lifetime circulation count per ISBN (hot + archived loans) is the ranking signal
+        cursor.execute("SELECT Isbn, COUNT(*) FROM ALL_LOANS GROUP BY Isbn")
+        loans = dict(cursor.fetchall())
+
+        titles = {}
+        entries = []
+        cursor.execute("SELECT Isbn, Title FROM BOOK")
+        for isbn, title in cursor:
+            isbn = str(isbn)
+            count = loans.get(isbn, 0)
+            entries.append((isbn.lower(), isbn, KIND_ISBN, count))
+            if title:
+                # The same title appears under several ISBNs: one entry
+                # per title, ranked by the circulation of all its copies
+                titles[title] = titles.get(title, 0) + count
+
+        for title, count in titles.items():
+            key = normalize_key(title)
+            if key:
+                entries.append((key, title, KIND_TITLE, count))
+
+        cursor.execute("""
+            SELECT A.Name, COALESCE(SUM(L.Loans), 0)
+            FROM AUTHORS A
+            LEFT JOIN BOOK_AUTHORS BA ON BA.Author_id = A.Author_id
+            LEFT JOIN (
+                SELECT Isbn, COUNT(*) AS Loans FROM ALL_LOANS GROUP BY Isbn
+            ) L ON L.Isbn = BA.Isbn
+            GROUP BY A.Name
+        """)
+        for name, count in cursor:
+            key = normalize_key(name)
+            if not key:
+                continue
+            entries.append((key, name, KIND_AUTHOR, count))
+            # Also reachable by surname, e.g. "lenardon" -> Robert J. Lenardon
+            surname = key.rsplit(" ", 1)[-1]
+            if surname != key:
+                entries.append((surname, name, KIND_AUTHOR, count))
+
+        return cls(entries)
+
+    # ---------------- Range-max segment tree ----------------
+    def _build_tree(self):
+        """tree[node] holds the position of the highest frequency under node."""
+        size = 1
+        while size < max(len(self.keys), 1):
+            size *= 2
+        self._size = size
+        tree = array('l', [-1]) * (2 * size)
+        for pos in range(len(self.keys)):
+            tree[size + pos] = pos
+        for node in range(size - 1, 0, -1):
+            tree[node] = self._better(tree[2 * node], tree[2 * node + 1])
+        self._tree = tree
+
+    def _better(self, a, b):
+        # Ties go to the left-most position, i.e. alphabetical order
+        if a < 0:
+            return b
+        if b < 0:
+            return a
+        return a if self.freq[a] >= self.freq[b] else b
+
+    def _range_best(self, lo, hi):
+        """Position of the max frequency in [lo, hi), or -1 if empty."""
+        best = -1
+        lo += self._size
+        hi += self._size
+        while lo < hi:
+            if lo & 1:
+                best = self._better(best, self._tree[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                best = self._better(self._tree[hi], best)
+            lo //= 2
+            hi //= 2
+        return best
+
+    def _bump_position(self, pos, amount):
+        self.freq[pos] += amount
+        node = (pos + self._size) // 2
+        while node:
+            self._tree[node] = self._better(self._tree[2 * node], self._tree[2 * node + 1])
+            node //= 2
+
+    # ---------------- Queries ----------------
+    def prefix_range(self, prefix):
+        key = normalize_key(prefix)
+        if not key:
+            return 0, 0
+        lo = bisect_left(self.keys, key)
+        # "\uffff" sorts after every character we keep in a key
+        hi = bisect_left(self.keys, key + "\uffff", lo)
+        return lo, hi
+
+    def suggest(self, prefix, limit=10):
+        """
+        Returns up to `limit` completions for prefix, most circulated
+        first. Each completion is a dict with 'Text', 'Kind' and 'Score'.
+        """
+        lo, hi = self.prefix_range(prefix)
+        results = []
+        seen = set()
+        heap = []
+
+        def push(a, b):
+            if a < b:
+                best = self._range_best(a, b)
+                heapq.heappush(heap, (-self.freq[best], best, a, b))
+
+        push(lo, hi)
+        while heap and len(results) < limit:
+            _, best, a, b = heapq.heappop(heap)
+            # An author can be reachable under two keys; show it once
+            ident = (self.kinds[best], self.displays[best])
+            if ident not in seen:
+                seen.add(ident)
+                results.append({
+                    'Text': self.displays[best],
+                    'Kind': self.kinds[best],
+                    'Score': self.freq[best],
+                })
+            push(a, best)
+            push(best + 1, b)
+        return results
+
+    # ---------------- Updates ----------------
+    def record_checkout(self, isbn, title):
+        """Raises the rank of a book's ISBN and title entries after a checkout."""
+        for key, display in ((str(isbn).lower(), str(isbn)), (normalize_key(title), title)):
+            pos = bisect_left(self.keys, key)
+            while pos < len(self.keys) and self.keys[pos] == key:
+                if self.displays[pos] == display:
+                    self._bump_position(pos, 1)
+                pos += 1
+
+
+if __name__ == "__main__":
+    import sqlite3
+    import time
+
+    import create_db
+
+    conn = sqlite3.connect("library.db")
+    create_db.ensure_support_schema(conn)
+    started = time.perf_counter()
+    index = SuggestIndex.load(conn)
+    conn.close()
+    print(f"Built {len(index.keys)} completions in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    for prefix in ("t", "the", "harry p", "lenard", "0195"):
+        started = time.perf_counter()
+        hits = index.suggest(prefix, 10)
+        elapsed = (time.perf_counter() - started) * 1000
+        lo, hi = index.prefix_range(prefix)
+        print(f"  '{prefix}' ({hi - lo} keys in range): {elapsed:.2f} ms -> "
+              f"{[h['Text'] for h in hits[:3]]}")
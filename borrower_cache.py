@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class BorrowerCache:
+    """
+    LRU + TTL cache of per-borrower query results (fines, active loans,
+    checkout eligibility), grouped by Card_id so that one write can drop
+    everything cached about a borrower.
+
+    - at most `maxsize` borrowers are kept; the least recently used one
+      is evicted first
+    - an entry is served for at most `ttl` seconds (changes made by
+      other processes show up after that)
+    - `epoch` moves on every invalidation: a result read from the
+      database before a write is not stored after it (see put)
+    """
+
+    def __init__(self, maxsize=1024, ttl=30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self._entries = OrderedDict()      # card_id -> {key: (expires_at, value)}
+        self._lock = threading.Lock()
+
+    def get(self, card_id, key):
+        """Returns the cached value, or None on a miss (expired entries are dropped)."""
+        now = time.monotonic()
+        with self._lock:
+            entries = self._entries.get(card_id)
+            item = entries.get(key) if entries else None
+            if item is None or item[0] <= now:
+                if item is not None:
+                    del entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(card_id)
+            self.hits += 1
+            return item[1]
+
+    def put(self, card_id, key, value, epoch):
+        """
+        Stores value, unless the cache was invalidated since `epoch` was
+        read (the value may then predate a write).
+        """
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            if epoch != self.epoch:
+                return
+            entries = self._entries.get(card_id)
+            if entries is None:
+                entries = self._entries[card_id] = {}
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._entries.move_to_end(card_id)
+            entries[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, card_id):
+        """Drops everything cached for one borrower."""
+        with self._lock:
+            self.epoch += 1
+            if self._entries.pop(card_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        """Drops every borrower (e.g. after a fine refresh touching many of them)."""
+        with self._lock:
+            self.epoch += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        """Hit / miss counters and the current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'evictions': self.evictions,
+                'borrowers': len(self._entries),
+            }
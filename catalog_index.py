@@ -0,0 +1,274 @@
+import re
+import sys
+from array import array
+from bisect import bisect_left
+
+# Words are lower-cased runs of letters/digits, e.g. "D'Este" -> ["d", "este"]
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+# Start of an ISBN: digits, optionally ending in the 'X' check character
+_ISBN_PREFIX_RE = re.compile(r"\d+X?")
+
+ISBN_WIDTH = 10  # Every ISBN in BOOK is stored as a 10-character string
+
+
+def tokenize(text):
+    """Splits text into lower-case word tokens."""
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+class CatalogIndex:
+    """
+    Compact in-process copy of the catalog (BOOK, AUTHORS, BOOK_AUTHORS)
+    used to answer search_books without touching SQLite.
+
+    Every book gets an ordinal (0..n-1) in Title order, and all data is
+    kept in column form indexed by that ordinal:
+    - titles:        one string blob + array of offsets
+    - isbns:         one fixed-width ASCII blob (10 bytes per book)
+    - authors:       interned name list + CSR arrays (offsets / author ids)
+    - availability:  bitmap, bit set = book is checked out
+    - tokens:        sorted token list + one posting array per token
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._title_blob = ""
+        self._title_offsets = array('I', [0])
+        self._isbn_blob = b""
+        self._isbn_order = array('I')      # ordinals sorted by ISBN
+        self.author_names = []             # interned, one entry per distinct name
+        self._author_offsets = array('I', [0])
+        self._author_ids = array('I')
+        self._checked_out = bytearray()
+        self._tokens = []                  # sorted
+        self._postings = []                # parallel to _tokens, each array('I')
+
+    # ---------------- Loading ----------------
+    @classmethod
+    def load(cls, conn):
+        """Builds the index from an open database connection."""
+        index = cls()
+        cursor = conn.cursor()
+
+        # Intern author names: AUTHORS can repeat the same name under
+        # several ids, we only keep one copy of each string.
+        name_slot = {}
+        author_slot = {}
+        cursor.execute("SELECT Author_id, Name FROM AUTHORS")
+        for author_id, name in cursor:
+            name = name or ""
+            slot = name_slot.get(name)
+            if slot is None:
+                slot = len(index.author_names)
+                name_slot[name] = slot
+                index.author_names.append(name)
+            author_slot[author_id] = slot
+
+        # Same rule as the SQL search: only books with at least one author
+        cursor.execute("""
+            SELECT B.Isbn, B.Title
+            FROM BOOK B
+            WHERE B.Isbn IN (SELECT Isbn FROM BOOK_AUTHORS)
+            ORDER BY B.Title, B.Isbn
+        """)
+        ordinal_of = {}
+        titles = []
+        isbn_parts = []
+        for ordinal, (isbn, title) in enumerate(cursor):
+            isbn = str(isbn)
+            ordinal_of[isbn] = ordinal
+            title = title or ""
+            titles.append(title)
+            index._title_offsets.append(index._title_offsets[-1] + len(title))
+            isbn_parts.append(isbn.encode('ascii')[:ISBN_WIDTH].ljust(ISBN_WIDTH))
+
+        index.count = len(titles)
+        index._title_blob = "".join(titles)
+        index._isbn_blob = b"".join(isbn_parts)
+        index._isbn_order = array('I', sorted(range(index.count), key=index.isbn_at))
+        index._checked_out = bytearray((index.count + 7) // 8)
+
+        # Author lists per book, kept in BOOK_AUTHORS order
+        per_book = [[] for _ in range(index.count)]
+        cursor.execute("SELECT Isbn, Author_id FROM BOOK_AUTHORS")
+        for isbn, author_id in cursor:
+            ordinal = ordinal_of.get(str(isbn))
+            slot = author_slot.get(author_id)
+            if ordinal is not None and slot is not None:
+                per_book[ordinal].append(slot)
+        for slots in per_book:
+            index._author_ids.extend(slots)
+            index._author_offsets.append(len(index._author_ids))
+
+        # Token -> posting list. Ordinals are appended in increasing order,
+        # so every posting array comes out sorted without an extra pass.
+        postings = {}
+        for ordinal in range(index.count):
+            words = set(tokenize(titles[ordinal]))
+            for slot in per_book[ordinal]:
+                words.update(tokenize(index.author_names[slot]))
+            for word in words:
+                posting = postings.get(word)
+                if posting is None:
+                    posting = postings[word] = array('I')
+                posting.append(ordinal)
+        index._tokens = sorted(postings)
+        index._postings = [postings[token] for token in index._tokens]
+
+        # Availability bitmap from the active loans
+        cursor.execute("SELECT DISTINCT Isbn FROM BOOK_LOANS WHERE Date_in IS NULL")
+        for (isbn,) in cursor:
+            ordinal = ordinal_of.get(str(isbn))
+            if ordinal is not None:
+                index._set_bit(ordinal, True)
+
+        return index
+
+    # ---------------- Column access ----------------
+    def title_at(self, ordinal):
+        return self._title_blob[self._title_offsets[ordinal]:self._title_offsets[ordinal + 1]]
+
+    def isbn_at(self, ordinal):
+        start = ordinal * ISBN_WIDTH
+        return self._isbn_blob[start:start + ISBN_WIDTH].decode('ascii').rstrip()
+
+    def authors_at(self, ordinal):
+        ids = self._author_ids[self._author_offsets[ordinal]:self._author_offsets[ordinal + 1]]
+        return [self.author_names[slot] for slot in ids]
+
+    def is_checked_out(self, ordinal):
+        return bool(self._checked_out[ordinal >> 3] & (1 << (ordinal & 7)))
+
+    def _set_bit(self, ordinal, checked_out):
+        if checked_out:
+            self._checked_out[ordinal >> 3] |= (1 << (ordinal & 7))
+        else:
+            self._checked_out[ordinal >> 3] &= ~(1 << (ordinal & 7)) & 0xFF
+
+    def _isbn_range(self, prefix):
+        """Returns (lo, hi) positions in _isbn_order whose ISBN starts with prefix."""
+        order = self._isbn_order
+        lo, hi = 0, len(order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.isbn_at(order[mid]) < prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        end = lo
+        while end < len(order) and self.isbn_at(order[end]).startswith(prefix):
+            end += 1
+        return lo, end
+
+    def ordinal_for_isbn(self, isbn):
+        """Binary search over the ISBN-sorted permutation; None if unknown."""
+        isbn = str(isbn)
+        lo, hi = self._isbn_range(isbn)
+        for pos in range(lo, hi):
+            if self.isbn_at(self._isbn_order[pos]) == isbn:
+                return self._isbn_order[pos]
+        return None
+
+    def vocabulary(self):
+        """Sorted list of every distinct word in titles and author names."""
+        return self._tokens
+
+    def postings_for(self, token):
+        """Sorted ordinals of the books containing token (empty if unknown)."""
+        pos = bisect_left(self._tokens, token)
+        if pos < len(self._tokens) and self._tokens[pos] == token:
+            return self._postings[pos]
+        return array('I')
+
+    # ---------------- Updates ----------------
+    def set_available(self, isbn, available):
+        """Flips the availability bit in place after a checkout / checkin."""
+        ordinal = self.ordinal_for_isbn(isbn)
+        if ordinal is not None:
+            self._set_bit(ordinal, not available)
+
+    # ---------------- Queries ----------------
+    def _prefix_postings(self, prefix):
+        """Union of the posting lists of every token starting with prefix."""
+        start = bisect_left(self._tokens, prefix)
+        matched = set()
+        for pos in range(start, len(self._tokens)):
+            if not self._tokens[pos].startswith(prefix):
+                break
+            matched.update(self._postings[pos])
+        return matched
+
+    def match(self, search_term):
+        """
+        Returns the sorted list of ordinals matching search_term.
+
+        Every word of the term must be the start of a word in the Title
+        or in one of the author names. A term that looks like the start
+        of an ISBN also matches on ISBN prefix.
+        """
+        term = (search_term or "").strip()
+        if not term:
+            return list(range(self.count))
+
+        result = None
+        for word in tokenize(term):
+            ordinals = self._prefix_postings(word)
+            result = ordinals if result is None else result & ordinals
+            if not result:
+                break
+        result = result or set()
+
+        compact = term.replace("-", "").replace(" ", "").upper()
+        if len(compact) <= ISBN_WIDTH and _ISBN_PREFIX_RE.fullmatch(compact):
+            lo, hi = self._isbn_range(compact)
+            result.update(self._isbn_order[lo:hi])
+
+        return sorted(result)
+
+    def search(self, search_term):
+        """Same row format as library_app.search_books (without 'NO')."""
+        rows = []
+        for ordinal in self.match(search_term):
+            rows.append({
+                'Isbn': self.isbn_at(ordinal),
+                'Title': self.title_at(ordinal),
+                'Authors': ", ".join(self.authors_at(ordinal)),
+                'Availability': 'OUT' if self.is_checked_out(ordinal) else 'IN',
+            })
+        return rows
+
+    # ---------------- Sizing ----------------
+    def memory_footprint(self):
+        """Approximate bytes held by the index (containers + their contents)."""
+        total = sys.getsizeof(self._title_blob) + sys.getsizeof(self._isbn_blob)
+        total += sys.getsizeof(self._checked_out)
+        for column in (self._title_offsets, self._isbn_order,
+                       self._author_offsets, self._author_ids):
+            total += sys.getsizeof(column)
+        total += sys.getsizeof(self.author_names)
+        total += sum(sys.getsizeof(name) for name in self.author_names)
+        total += sys.getsizeof(self._tokens) + sys.getsizeof(self._postings)
+        total += sum(sys.getsizeof(token) for token in self._tokens)
+        total += sum(sys.getsizeof(posting) for posting in self._postings)
+        return total
+
+
+if __name__ == "__main__":
+    import sqlite3
+    import time
+
+    conn = sqlite3.connect("library.db")
+    started = time.perf_counter()
+    index = CatalogIndex.load(conn)
+    load_ms = (time.perf_counter() - started) * 1000
+    conn.close()
+
+    footprint = index.memory_footprint()
+    print(f"Indexed {index.count} books in {load_ms:.0f} ms")
+    print(f"Memory footprint: {footprint / 1024 / 1024:.2f} MiB "
+          f"(~{footprint / max(index.count, 1) * 100000 / 1024 / 1024:.1f} MiB per 100k books)")
+
+    for term in ("mythology", "lenard", "0195153445", "harry potter"):
+        started = time.perf_counter()
+        hits = index.search(term)
+        print(f"  '{term}': {len(hits)} hits in {(time.perf_counter() - started) * 1000:.2f} ms")
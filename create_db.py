@@ -3,6 +3,427 @@ import os
 
 DB_FILE = "library.db"
 
+# Indexes and helper tables added on top of the project schema.
+# Everything here is idempotent (IF NOT EXISTS) so library_app can also
+# apply it to databases created by older versions of this script.
+SUPPORT_SCHEMA = [
+    # Reverse lookup from a book to its authors (the primary key
+    # is (Author_id, Isbn), which only helps author -> books)
+    "CREATE INDEX IF NOT EXISTS idx_book_authors_isbn ON BOOK_AUTHORS(Isbn);",
+    # Availability checks: "is this ISBN currently checked out?"
+    "CREATE INDEX IF NOT EXISTS idx_book_loans_isbn ON BOOK_LOANS(Isbn, Date_in);",
+    # Borrower lookups by name token (first word / last word) and by
+    # phone digits, so check-in and fines searches can use prefix ranges.
+    # The last word is what follows the last space: rtrim() strips the
+    # trailing non-space characters. (idx_borrower_surname indexed
+    # everything after the first space.)
+    "CREATE INDEX IF NOT EXISTS idx_borrower_name ON BORROWER(Bname COLLATE NOCASE);",
+    "DROP INDEX IF EXISTS idx_borrower_surname;",
+    """
+    CREATE INDEX IF NOT EXISTS idx_borrower_last_name
+    ON BORROWER(substr(Bname, length(rtrim(Bname, replace(Bname, ' ', ''))) + 1) COLLATE NOCASE);
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_borrower_phone
+    ON BORROWER(replace(replace(replace(replace(Phone, '(', ''), ')', ''), ' ', ''), '-', ''));
+    """,
+    # A borrower's loans (fines, loan limits) and the active-loan hot set
+    "CREATE INDEX IF NOT EXISTS idx_book_loans_card ON BOOK_LOANS(Card_id, Date_in);",
+    """
+    CREATE INDEX IF NOT EXISTS idx_book_loans_active
+    ON BOOK_LOANS(Due_date, Loan_id) WHERE Date_in IS NULL;
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_fines_unpaid ON FINES(Loan_id) WHERE Paid = 0;",
+    # Cold store for returned loans (and their paid fines) moved out of
+    # BOOK_LOANS / FINES by library_app.archive_closed_loans
+    """
+    CREATE TABLE IF NOT EXISTS LOAN_HISTORY (
+        Loan_id INTEGER PRIMARY KEY,
+        Isbn TEXT NOT NULL,
+        Card_id TEXT NOT NULL,
+        Date_out TEXT NOT NULL,
+        Due_date TEXT NOT NULL,
+        Date_in TEXT NOT NULL,
+        Fine_amt NUMERIC(10, 2),
+        Fine_paid INTEGER,
+        Archived_on TEXT NOT NULL
+    );
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_loan_history_card ON LOAN_HISTORY(Card_id);",
+    "CREATE INDEX IF NOT EXISTS idx_loan_history_isbn ON LOAN_HISTORY(Isbn);",
+    # Every loan ever made, hot or archived, with its fine (if any)
+    """
+    CREATE VIEW IF NOT EXISTS ALL_LOANS AS
+    SELECT BL.Loan_id, BL.Isbn, BL.Card_id, BL.Date_out, BL.Due_date, BL.Date_in,
+           F.Fine_amt, F.Paid AS Fine_paid, 0 AS Archived
+    FROM BOOK_LOANS BL
+    LEFT JOIN FINES F ON F.Loan_id = BL.Loan_id
+    UNION ALL
+    SELECT Loan_id, Isbn, Card_id, Date_out, Due_date, Date_in,
+           Fine_amt, Fine_paid, 1 AS Archived
+    FROM LOAN_HISTORY;
+    """,
+    # Persistent counters for generated keys (see library_app.allocate_card_ids)
+    """
+    CREATE TABLE IF NOT EXISTS ID_SEQUENCE (
+        Name TEXT PRIMARY KEY,
+        Next_value INTEGER NOT NULL
+    );
+    """,
+    # Append-only change-data-capture log, filled by the triggers below
+    # inside the same transaction as the change itself
+    """
+    CREATE TABLE IF NOT EXISTS CHANGE_LOG (
+        Seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        Table_name TEXT NOT NULL,
+        Op TEXT NOT NULL,
+        Row_key TEXT NOT NULL,
+        Payload TEXT,
+        Changed_at TEXT NOT NULL DEFAULT (datetime('now'))
+    );
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_change_log_key ON CHANGE_LOG(Table_name, Row_key);",
+    # Last sequence number each downstream reader has processed
+    """
+    CREATE TABLE IF NOT EXISTS CHANGE_LOG_CONSUMERS (
+        Name TEXT PRIMARY KEY,
+        Last_seq INTEGER NOT NULL DEFAULT 0
+    );
+    """,
+    # Report rollups (see reports.py), kept current by the trg_rollup_*
+    # triggers below: checkouts / check-ins per day, checkouts per title,
+    # unpaid fines per due date (for aging buckets) and per borrower
+    """
+    CREATE TABLE IF NOT EXISTS DAILY_CIRCULATION (
+        Day TEXT PRIMARY KEY,
+        Checkouts INTEGER NOT NULL DEFAULT 0,
+        Checkins INTEGER NOT NULL DEFAULT 0
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS TITLE_CIRCULATION (
+        Isbn TEXT PRIMARY KEY,
+        Checkouts INTEGER NOT NULL DEFAULT 0
+    );
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_title_circulation_count ON TITLE_CIRCULATION(Checkouts);",
+    """
+    CREATE TABLE IF NOT EXISTS FINE_AGING (
+        Due_date TEXT PRIMARY KEY,
+        Unpaid_amt NUMERIC(10, 2) NOT NULL DEFAULT 0,
+        Unpaid_count INTEGER NOT NULL DEFAULT 0
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS BORROWER_FINES (
+        Card_id TEXT PRIMARY KEY,
+        Unpaid_amt NUMERIC(10, 2) NOT NULL DEFAULT 0,
+        Unpaid_count INTEGER NOT NULL DEFAULT 0
+    );
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_borrower_fines_amt ON BORROWER_FINES(Unpaid_amt);",
+    # Fine and loan rules per borrower class (see fine_policy.py).
+    # Borrowers without a BORROWER_CLASS row are in the 'standard' class.
+    """
+    CREATE TABLE IF NOT EXISTS FINE_POLICY (
+        Class TEXT PRIMARY KEY,
+        Daily_rate NUMERIC(10, 2) NOT NULL DEFAULT 0.25,
+        Grace_days INTEGER NOT NULL DEFAULT 0,
+        Max_days INTEGER,
+        Max_fine NUMERIC(10, 2),
+        Loan_days INTEGER NOT NULL DEFAULT 14,
+        Max_loans INTEGER NOT NULL DEFAULT 3
+    );
+    """,
+    "INSERT OR IGNORE INTO FINE_POLICY (Class) VALUES ('standard');",
+    """
+    CREATE TABLE IF NOT EXISTS BORROWER_CLASS (
+        Card_id TEXT PRIMARY KEY,
+        Class TEXT NOT NULL,
+        FOREIGN KEY (Card_id) REFERENCES BORROWER(Card_id)
+            ON DELETE CASCADE,
+        FOREIGN KEY (Class) REFERENCES FINE_POLICY(Class)
+            ON UPDATE CASCADE
+    );
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_borrower_class_class ON BORROWER_CLASS(Class);",
+    # One row per fine accrual run (library_app.accrue_fines); the latest
+    # run also bounds the next incremental one
+    """
+    CREATE TABLE IF NOT EXISTS FINE_ACCRUAL_LOG (
+        Run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        Started_at TEXT NOT NULL,
+        Seconds REAL NOT NULL,
+        Rows_changed INTEGER NOT NULL,
+        Since TEXT
+    );
+    """,
+    # Incremental accrual reads loans still out / recently returned
+    "CREATE INDEX IF NOT EXISTS idx_book_loans_date_in ON BOOK_LOANS(Date_in);",
+    # Set by the triggers below whenever a policy or a class assignment
+    # changes (from any process); the next accrual then covers every loan
+    """
+    CREATE TABLE IF NOT EXISTS FINE_ACCRUAL_STATE (
+        Id INTEGER PRIMARY KEY CHECK (Id = 1),
+        Full_due INTEGER NOT NULL DEFAULT 0
+    );
+    """,
+    "INSERT OR IGNORE INTO FINE_ACCRUAL_STATE (Id, Full_due) VALUES (1, 0);",
+]
+SUPPORT_SCHEMA.extend(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_accrual_due_{table.lower()}_{op.lower()}
+    AFTER {op} ON {table}
+    BEGIN
+        UPDATE FINE_ACCRUAL_STATE SET Full_due = 1 WHERE Id = 1;
+    END;
+    """ for table in ('FINE_POLICY', 'BORROWER_CLASS') for op in ('INSERT', 'UPDATE', 'DELETE'))
+
+ROLLUP_TABLES = ['DAILY_CIRCULATION', 'TITLE_CIRCULATION', 'FINE_AGING', 'BORROWER_FINES']
+
+# Tables captured in CHANGE_LOG: table -> (key column, all columns)
+CHANGE_LOG_TABLES = {
+    'BORROWER': ('Card_id', ['Card_id', 'Ssn', 'Bname', 'Address', 'Phone']),
+    'BOOK_LOANS': ('Loan_id', ['Loan_id', 'Isbn', 'Card_id', 'Date_out', 'Due_date', 'Date_in']),
+    'FINES': ('Loan_id', ['Loan_id', 'Fine_amt', 'Paid']),
+    'LOAN_HISTORY': ('Loan_id', ['Loan_id', 'Isbn', 'Card_id', 'Date_out', 'Due_date', 'Date_in',
+                                 'Fine_amt', 'Fine_paid', 'Archived_on']),
+    'FINE_POLICY': ('Class', ['Class', 'Daily_rate', 'Grace_days', 'Max_days', 'Max_fine',
+                              'Loan_days', 'Max_loans']),
+    'BORROWER_CLASS': ('Card_id', ['Card_id', 'Class']),
+    # Rollups are logged too, so replicas get the same report numbers
+    'DAILY_CIRCULATION': ('Day', ['Day', 'Checkouts', 'Checkins']),
+    'TITLE_CIRCULATION': ('Isbn', ['Isbn', 'Checkouts']),
+    'FINE_AGING': ('Due_date', ['Due_date', 'Unpaid_amt', 'Unpaid_count']),
+    'BORROWER_FINES': ('Card_id', ['Card_id', 'Unpaid_amt', 'Unpaid_count']),
+}
+
+
+def _change_log_triggers():
+    """CREATE TRIGGER statements writing every insert/update/delete to CHANGE_LOG."""
+    statements = []
+    for table, (key, columns) in CHANGE_LOG_TABLES.items():
+        new_payload = "json_object(" + ", ".join(f"'{c}', NEW.{c}" for c in columns) + ")"
+        changed = " OR ".join(f"OLD.{c} IS NOT NEW.{c}" for c in columns)
+        statements.append(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_cdc_{table.lower()}_insert
+        AFTER INSERT ON {table}
+        BEGIN
+            INSERT INTO CHANGE_LOG (Table_name, Op, Row_key, Payload)
+            VALUES ('{table}', 'INSERT', NEW.{key}, {new_payload});
+        END;
+        """)
+        # No-op updates (e.g. a fine refresh that recomputes the same
+        # amount) are not logged
+        statements.append(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_cdc_{table.lower()}_update
+        AFTER UPDATE ON {table}
+        WHEN {changed}
+        BEGIN
+            INSERT INTO CHANGE_LOG (Table_name, Op, Row_key, Payload)
+            VALUES ('{table}', 'UPDATE', NEW.{key}, {new_payload});
+        END;
+        """)
+        statements.append(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_cdc_{table.lower()}_delete
+        AFTER DELETE ON {table}
+        BEGIN
+            INSERT INTO CHANGE_LOG (Table_name, Op, Row_key, Payload)
+            VALUES ('{table}', 'DELETE', OLD.{key}, NULL);
+        END;
+        """)
+    return statements
+
+
+SUPPORT_SCHEMA.extend(_change_log_triggers())
+
+
+def _fine_rollup_sql(sign, ref):
+    """Adds (sign '+') or removes (sign '-') the unpaid fine in row ref (NEW/OLD)."""
+    return f"""
+            INSERT INTO FINE_AGING (Due_date, Unpaid_amt, Unpaid_count)
+            SELECT Due_date, {sign}{ref}.Fine_amt, {sign}1
+            FROM BOOK_LOANS WHERE Loan_id = {ref}.Loan_id AND {ref}.Paid = 0
+            ON CONFLICT(Due_date) DO UPDATE SET
+                Unpaid_amt = Unpaid_amt + excluded.Unpaid_amt,
+                Unpaid_count = Unpaid_count + excluded.Unpaid_count;
+            INSERT INTO BORROWER_FINES (Card_id, Unpaid_amt, Unpaid_count)
+            SELECT Card_id, {sign}{ref}.Fine_amt, {sign}1
+            FROM BOOK_LOANS WHERE Loan_id = {ref}.Loan_id AND {ref}.Paid = 0
+            ON CONFLICT(Card_id) DO UPDATE SET
+                Unpaid_amt = Unpaid_amt + excluded.Unpaid_amt,
+                Unpaid_count = Unpaid_count + excluded.Unpaid_count;"""
+
+
+# Rollup maintenance: each circulation write adjusts a handful of
+# rollup rows in its own transaction. Loans moved to LOAN_HISTORY keep
+# their counts (archival deletes don't touch DAILY/TITLE_CIRCULATION).
+SUPPORT_SCHEMA.extend([
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_rollup_loan_insert
+    AFTER INSERT ON BOOK_LOANS
+    BEGIN
+        INSERT INTO DAILY_CIRCULATION (Day, Checkouts) VALUES (NEW.Date_out, 1)
+        ON CONFLICT(Day) DO UPDATE SET Checkouts = Checkouts + 1;
+        INSERT INTO TITLE_CIRCULATION (Isbn, Checkouts) VALUES (NEW.Isbn, 1)
+        ON CONFLICT(Isbn) DO UPDATE SET Checkouts = Checkouts + 1;
+        INSERT INTO DAILY_CIRCULATION (Day, Checkins)
+        SELECT NEW.Date_in, 1 WHERE NEW.Date_in IS NOT NULL
+        ON CONFLICT(Day) DO UPDATE SET Checkins = Checkins + 1;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_rollup_loan_return
+    AFTER UPDATE OF Date_in ON BOOK_LOANS
+    WHEN OLD.Date_in IS NULL AND NEW.Date_in IS NOT NULL
+    BEGIN
+        INSERT INTO DAILY_CIRCULATION (Day, Checkins) VALUES (NEW.Date_in, 1)
+        ON CONFLICT(Day) DO UPDATE SET Checkins = Checkins + 1;
+    END;
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_rollup_fine_insert
+    AFTER INSERT ON FINES
+    BEGIN{_fine_rollup_sql('', 'NEW')}
+    END;
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_rollup_fine_update
+    AFTER UPDATE ON FINES
+    WHEN OLD.Fine_amt IS NOT NEW.Fine_amt OR OLD.Paid IS NOT NEW.Paid
+    BEGIN{_fine_rollup_sql('-', 'OLD')}{_fine_rollup_sql('', 'NEW')}
+    END;
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_rollup_fine_delete
+    AFTER DELETE ON FINES
+    BEGIN{_fine_rollup_sql('-', 'OLD')}
+    END;
+    """,
+])
+
+# Recomputes every rollup from the base tables (first install, or
+# reports.rebuild_rollups after a manual repair)
+ROLLUP_BACKFILL = [f"DELETE FROM {table};" for table in ROLLUP_TABLES] + [
+    """
+    INSERT INTO DAILY_CIRCULATION (Day, Checkouts, Checkins)
+    SELECT Day, SUM(Outs), SUM(Ins) FROM (
+        SELECT Date_out AS Day, 1 AS Outs, 0 AS Ins FROM ALL_LOANS
+        UNION ALL
+        SELECT Date_in, 0, 1 FROM ALL_LOANS WHERE Date_in IS NOT NULL
+    )
+    GROUP BY Day;
+    """,
+    """
+    INSERT INTO TITLE_CIRCULATION (Isbn, Checkouts)
+    SELECT Isbn, COUNT(*) FROM ALL_LOANS GROUP BY Isbn;
+    """,
+    """
+    INSERT INTO FINE_AGING (Due_date, Unpaid_amt, Unpaid_count)
+    SELECT BL.Due_date, SUM(F.Fine_amt), COUNT(*)
+    FROM FINES F JOIN BOOK_LOANS BL ON BL.Loan_id = F.Loan_id
+    WHERE F.Paid = 0
+    GROUP BY BL.Due_date;
+    """,
+    """
+    INSERT INTO BORROWER_FINES (Card_id, Unpaid_amt, Unpaid_count)
+    SELECT BL.Card_id, SUM(F.Fine_amt), COUNT(*)
+    FROM FINES F JOIN BOOK_LOANS BL ON BL.Loan_id = F.Loan_id
+    WHERE F.Paid = 0
+    GROUP BY BL.Card_id;
+    """,
+]
+
+# Full-text indexes for fielded search (query_parser): word / prefix
+# matches on titles and author names instead of LIKE '%x%' scans.
+# AUTHORS has a stable integer key, so its index reads names from the
+# table itself; BOOK only has an implicit rowid (VACUUM may renumber
+# it), so the title index keeps its own copy keyed by Isbn.
+SEARCH_TABLES = ['BOOK_TITLE_FTS', 'AUTHOR_NAME_FTS']
+SUPPORT_SCHEMA.extend([
+    "CREATE VIRTUAL TABLE IF NOT EXISTS BOOK_TITLE_FTS USING fts5(Isbn UNINDEXED, Title);",
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS AUTHOR_NAME_FTS
+    USING fts5(Name, content='AUTHORS', content_rowid='Author_id');
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_search_book_insert
+    AFTER INSERT ON BOOK
+    BEGIN
+        INSERT INTO BOOK_TITLE_FTS (Isbn, Title) VALUES (NEW.Isbn, NEW.Title);
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_search_book_update
+    AFTER UPDATE OF Isbn, Title ON BOOK
+    BEGIN
+        DELETE FROM BOOK_TITLE_FTS WHERE Isbn = OLD.Isbn;
+        INSERT INTO BOOK_TITLE_FTS (Isbn, Title) VALUES (NEW.Isbn, NEW.Title);
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_search_book_delete
+    AFTER DELETE ON BOOK
+    BEGIN
+        DELETE FROM BOOK_TITLE_FTS WHERE Isbn = OLD.Isbn;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_search_author_insert
+    AFTER INSERT ON AUTHORS
+    BEGIN
+        INSERT INTO AUTHOR_NAME_FTS (rowid, Name) VALUES (NEW.Author_id, NEW.Name);
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_search_author_update
+    AFTER UPDATE OF Author_id, Name ON AUTHORS
+    BEGIN
+        INSERT INTO AUTHOR_NAME_FTS (AUTHOR_NAME_FTS, rowid, Name)
+        VALUES ('delete', OLD.Author_id, OLD.Name);
+        INSERT INTO AUTHOR_NAME_FTS (rowid, Name) VALUES (NEW.Author_id, NEW.Name);
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_search_author_delete
+    AFTER DELETE ON AUTHORS
+    BEGIN
+        INSERT INTO AUTHOR_NAME_FTS (AUTHOR_NAME_FTS, rowid, Name)
+        VALUES ('delete', OLD.Author_id, OLD.Name);
+    END;
+    """,
+])
+
+# Refills the full-text indexes from BOOK / AUTHORS (first install,
+# snapshot restore)
+SEARCH_BACKFILL = [
+    "DELETE FROM BOOK_TITLE_FTS;",
+    "INSERT INTO BOOK_TITLE_FTS (Isbn, Title) SELECT Isbn, Title FROM BOOK;",
+    "INSERT INTO AUTHOR_NAME_FTS (AUTHOR_NAME_FTS) VALUES ('rebuild');",
+]
+
+
+def ensure_support_schema(conn):
+    """
+    Creates any missing SUPPORT_SCHEMA objects on an open connection.
+    Report rollups and search indexes are filled from the existing data
+    when they are new.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'DAILY_CIRCULATION'")
+    new_rollups = cursor.fetchone() is None
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'BOOK_TITLE_FTS'")
+    new_search = cursor.fetchone() is None
+    for statement in SUPPORT_SCHEMA:
+        cursor.execute(statement)
+    if new_rollups:
+        for statement in ROLLUP_BACKFILL:
+            cursor.execute(statement)
+    if new_search:
+        for statement in SEARCH_BACKFILL:
+            cursor.execute(statement)
+    conn.commit()
+
+
 def create_database():
     """
     Creates the library database and all required tables
@@ -111,6 +532,7 @@ def create_database():
         VALUES ('Library', 'Guest', NULL, 1);
         """)
 
+        ensure_support_schema(conn)
 
         conn.commit()
         print(f"Success! Database '{DB_FILE}' and all tables created.")
@@ -0,0 +1,342 @@
+"""
+Batch fine recomputation for very large loan histories.
+
+update_all_fines() recomputes every overdue loan with one SQL upsert
+per policy class, rewriting rows whose amount did not change. This
+engine is meant for year-end runs and for applying policy changes (a
+new daily rate, a cap) once they are saved in FINE_POLICY:
+
+- overdue loans are read in Loan_id order, chunk_rows at a time, as
+  columns of day numbers (Loan_id, due day, return day or today, the
+  current fine in cents and the borrower's policy class);
+- the fines are computed for the whole chunk at once: with NumPy when
+  it is installed, otherwise in a plain loop over stdlib arrays;
+- only loans whose fine changed are written back, with executemany;
+  unpaid fines that now come to nothing (e.g. a longer grace period)
+  are deleted.
+
+Each chunk is read and written in its own short BEGIN IMMEDIATE
+transaction, so circulation desks can still write between chunks.
+Paid fines are never touched. "Today" is SQLite's date('now') (UTC),
+the same day the compiled policy upserts use.
+
+    python library_admin.py policy set standard --rate 0.30 --max-fine 25
+    python library_admin.py fines-recompute
+    python library_admin.py fines-bench --loans 20000000
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import create_db
+import library_app as library
+from fine_policy import DEFAULT_CLASS, FinePolicy
+
+CHUNK_ROWS = 500000
+WRITE_ROWS = 20000
+
+# Overdue loans without a paid fine: Loan_id, due day, return day (today
+# while still out), current fine in cents (-1: no FINES row yet) and the
+# borrower's policy class. Day numbers are whole days since 1970-01-01.
+# Loans returned on time never leave SQLite.
+_CHUNK_SQL = """
+    SELECT BL.Loan_id,
+           CAST(julianday(BL.Due_date) - 2440587.5 AS INTEGER),
+           CAST(julianday(COALESCE(BL.Date_in, :today)) - 2440587.5 AS INTEGER),
+           COALESCE(CAST(ROUND(F.Fine_amt * 100) AS INTEGER), -1),
+           COALESCE(BC.Class, :default_class)
+    FROM BOOK_LOANS BL
+    LEFT JOIN FINES F ON F.Loan_id = BL.Loan_id
+    LEFT JOIN BORROWER_CLASS BC ON BC.Card_id = BL.Card_id
+    WHERE BL.Loan_id > :after
+      AND COALESCE(BL.Date_in, :today) > BL.Due_date
+      AND COALESCE(F.Paid, 0) = 0
+    ORDER BY BL.Loan_id
+    LIMIT :limit
+"""
+
+_UPSERT_SQL = """
+    INSERT INTO FINES (Loan_id, Fine_amt, Paid) VALUES (?, ?, 0)
+    ON CONFLICT(Loan_id) DO UPDATE SET Fine_amt = excluded.Fine_amt
+    WHERE FINES.Paid = 0
+"""
+
+_CLEAR_SQL = "DELETE FROM FINES WHERE Loan_id = ? AND Paid = 0"
+
+# Stands in for "no cap" in the per-class parameter columns
+_NO_CAP = 2 ** 40
+
+
+def _class_parameters(policies):
+    """
+    Per-class (rate in cents, grace days, max days, max cents) columns,
+    plus {class name: position} for the class column of a chunk.
+    """
+    slots = {}
+    rate, grace, max_days, max_cents = array('d'), array('q'), array('q'), array('q')
+    for policy in policies:
+        slots[policy.name] = len(slots)
+        rate.append(round(policy.daily_rate * 100, 6))
+        grace.append(policy.grace_days)
+        max_days.append(policy.max_days if policy.max_days is not None else _NO_CAP)
+        max_cents.append(round(policy.max_fine * 100) if policy.max_fine is not None else _NO_CAP)
+    return slots, (rate, grace, max_days, max_cents)
+
+
+def _read_chunk(cursor, today, after, limit, slots, default):
+    """Next chunk of loans as five array('q') columns (the last one: class position)."""
+    loan_ids, due, end, old, classes = array('q'), array('q'), array('q'), array('q'), array('q')
+    params = {'today': today, 'after': after, 'limit': limit, 'default_class': DEFAULT_CLASS}
+    for row in cursor.execute(_CHUNK_SQL, params):
+        loan_ids.append(row[0])
+        due.append(row[1])
+        end.append(row[2])
+        old.append(row[3])
+        classes.append(slots.get(row[4], default))
+    return loan_ids, due, end, old, classes
+
+
+def _changed_numpy(loan_ids, due, end, old, classes, parameters):
+    def column(values):
+        return numpy.frombuffer(values, dtype=numpy.int64)
+
+    rate = numpy.frombuffer(parameters[0], dtype=numpy.float64)
+    grace, max_days, max_cents = (column(values) for values in parameters[1:])
+    slot = column(classes)
+    days = numpy.minimum(column(end) - column(due) - grace[slot], max_days[slot])
+    cents = numpy.minimum(numpy.floor(days * rate[slot] + 0.5).astype(numpy.int64), max_cents[slot])
+    changed = (days > 0) & (cents != column(old))
+    cleared = (days <= 0) & (column(old) != -1)
+    ids = column(loan_ids)
+    return (list(zip(ids[changed].tolist(), (cents[changed] / 100).tolist())),
+            [(loan_id,) for loan_id in ids[cleared].tolist()])
+
+
+def _changed_python(loan_ids, due, end, old, classes, parameters):
+    rules = list(zip(*parameters))
+    changed, cleared = [], []
+    for loan_id, due_day, end_day, old_cents, slot in zip(loan_ids, due, end, old, classes):
+        rate, grace, max_days, max_cents = rules[slot]
+        days = min(end_day - due_day - grace, max_days)
+        if days <= 0:
+            if old_cents != -1:
+                cleared.append((loan_id,))
+            continue
+        cents = min(int(days * rate + 0.5), max_cents)
+        if cents != old_cents:
+            changed.append((loan_id, cents / 100))
+    return changed, cleared
+
+
+def recompute_fines(today=None, db_file=None, chunk_rows=CHUNK_ROWS, write_rows=WRITE_ROWS,
+                    use_numpy=None):
+    """
+    Recomputes the fine of every unpaid overdue loan and writes back only
+    the ones that differ from FINES. Each loan follows the FINE_POLICY of
+    its borrower's class (the same rules as update_all_fines), read
+    fresh from db_file.
+
+    use_numpy: None picks NumPy when it is installed.
+
+    Returns a dictionary with 'success', 'message', 'rows' (overdue loans read),
+    'changed', 'seconds', 'rows_per_sec' and 'engine'.
+    """
+    if use_numpy and numpy is None:
+        return {'success': False, 'message': "Error: NumPy is not installed.",
+                'rows': 0, 'changed': 0, 'seconds': 0.0, 'rows_per_sec': 0.0, 'engine': None}
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    engine = 'numpy' if use_numpy else 'array'
+    compute = _changed_numpy if use_numpy else _changed_python
+
+    started = time.perf_counter()
+    rows = changed = 0
+    conn = library.open_connection(db_file)
+    try:
+        cursor = conn.cursor()
+        if today is None:
+            today = cursor.execute("SELECT date('now')").fetchone()[0]
+        else:
+            today = today.isoformat()
+        slots, parameters = _class_parameters(FinePolicy.load_all(cursor).values())
+        default = slots[DEFAULT_CLASS]
+
+        after = 0
+        while True:
+            cursor.execute("BEGIN IMMEDIATE")
+            columns = _read_chunk(cursor, today, after, chunk_rows, slots, default)
+            if not columns[0]:
+                conn.commit()
+                break
+            updates, cleared = compute(*columns, parameters)
+            for start in range(0, len(updates), write_rows):
+                cursor.executemany(_UPSERT_SQL, updates[start:start + write_rows])
+            cursor.executemany(_CLEAR_SQL, cleared)
+            conn.commit()
+
+            rows += len(columns[0])
+            changed += len(updates) + len(cleared)
+            after = columns[0][-1]
+    except sqlite3.Error as e:
+        conn.rollback()
+        return {'success': False, 'message': f"An unexpected database error occurred: {e}",
+                'rows': rows, 'changed': changed, 'seconds': time.perf_counter() - started,
+                'rows_per_sec': 0.0, 'engine': engine}
+    finally:
+        conn.close()
+        if changed:
+            library.clear_borrower_cache()
+
+    seconds = time.perf_counter() - started
+    rows_per_sec = rows / seconds if seconds else 0.0
+    return {'success': True, 'rows': rows, 'changed': changed, 'seconds': seconds,
+            'rows_per_sec': rows_per_sec, 'engine': engine,
+            'message': f"Recomputed {rows} loans ({engine}): {changed} fine(s) changed "
+                       f"in {seconds:.2f}s ({rows_per_sec:,.0f} rows/s)."}
+
+
+# ---------------- Benchmark ----------------
+
+def build_synthetic_database(path, loans, books=10000, borrowers=10000, years=3, seed=11):
+    """
+    Creates a library database at path with `loans` synthetic loans
+    spread over the last `years` years: most returned on time, about
+    10% returned late and the newest ones still out (some overdue).
+
+    The rows are generated inside SQLite; rollups are backfilled once
+    at the end instead of through the triggers.
+    """
+    original = create_db.DB_FILE
+    create_db.DB_FILE = path
+    try:
+        create_db.create_database()
+    finally:
+        create_db.DB_FILE = original
+
+    conn = sqlite3.connect(path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA journal_mode = OFF")
+        cursor.execute("PRAGMA synchronous = OFF")
+        triggers = cursor.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger'").fetchall()
+        for name, _ in triggers:
+            cursor.execute(f"DROP TRIGGER {name}")
+
+        cursor.execute("BEGIN")
+        cursor.execute("""
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+            INSERT INTO BOOK (Isbn, Title) SELECT printf('%010d', i), 'Title ' || i FROM n
+        """, (books,))
+        cursor.execute("""
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+            INSERT INTO BORROWER (Card_id, Ssn, Bname, Address, Phone)
+            SELECT printf('ID%06d', i), printf('%09d', i), 'Borrower ' || i, 'Address', '0000000000'
+            FROM n
+        """, (borrowers,))
+        # Loan i goes out (years * 365) * (1 - i/loans) days ago; a
+        # pseudo-random k decides whether / how late it came back
+        cursor.execute("""
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < :loans),
+            L(i, days_ago, k) AS (
+                SELECT i, CAST(:span * (:loans - i) / :loans AS INTEGER),
+                       ((i * 2654435761 + :seed) % 1000) FROM n)
+            INSERT INTO BOOK_LOANS (Loan_id, Isbn, Card_id, Date_out, Due_date, Date_in)
+            SELECT i, printf('%010d', 1 + i % :books), printf('ID%06d', 1 + (i * 7) % :borrowers),
+                   date('now', -days_ago || ' day'),
+                   date('now', (14 - days_ago) || ' day'),
+                   CASE
+                       WHEN days_ago < 30 AND k < 500 THEN NULL
+                       WHEN k < 100 THEN date('now', (14 + k % 60 - days_ago) || ' day')
+                       ELSE date('now', (k % 14 - days_ago) || ' day')
+                   END
+            FROM L
+        """, {'loans': loans, 'span': years * 365, 'books': books,
+              'borrowers': borrowers, 'seed': seed})
+        # Dates in the future (recent loans) mean "not returned yet"
+        cursor.execute("UPDATE BOOK_LOANS SET Date_in = NULL WHERE Date_in > date('now')")
+        for statement in create_db.ROLLUP_BACKFILL:
+            cursor.execute(statement)
+        for _, sql in triggers:
+            cursor.execute(sql)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _sql_upsert(path):
+    original = library.DB_FILE
+    library.DB_FILE = path
+    try:
+        started = time.perf_counter()
+        success, message = library.update_all_fines()
+        return success, message, time.perf_counter() - started
+    finally:
+        library.DB_FILE = original
+
+
+def _set_standard_rate(path, rate):
+    original = library.DB_FILE
+    library.DB_FILE = path
+    try:
+        return library.set_fine_policy(DEFAULT_CLASS, rate)
+    finally:
+        library.DB_FILE = original
+
+
+def benchmark(loans=20000000, workdir=None):
+    """
+    Compares update_all_fines (one SQL upsert) with recompute_fines on a
+    synthetic database of `loans` loans:
+      1. first run, FINES empty (SQL upsert)
+      2. nightly re-run, nothing changed (SQL upsert, then the batch engine)
+      3. a rate change to $0.30/day (batch engine), then back to $0.25 (SQL upsert)
+    The database is built in a temporary directory (under workdir when
+    given); it needs roughly 90 bytes of disk per loan.
+    """
+    workdir = tempfile.mkdtemp(dir=workdir)
+    path = os.path.join(workdir, "fines-bench.db")
+    try:
+        started = time.perf_counter()
+        build_synthetic_database(path, loans)
+        print(f"Built {loans:,} synthetic loans in {time.perf_counter() - started:.1f}s")
+
+        def report(label, seconds, changed=None):
+            rate = f"{loans / seconds:>12,.0f} loans/s" if seconds else ""
+            extra = f"  ({changed:,} changed)" if changed is not None else ""
+            print(f"  {label:<40}{seconds:8.2f}s {rate}{extra}")
+
+        _, message, seconds = _sql_upsert(path)
+        report("first run: SQL upsert", seconds)
+        _, message, seconds = _sql_upsert(path)
+        report("re-run, no change: SQL upsert", seconds)
+
+        engines = ['array'] + (['numpy'] if numpy is not None else [])
+        for engine in engines:
+            result = recompute_fines(db_file=path, use_numpy=engine == 'numpy')
+            report(f"re-run, no change: batch ({engine})", result['seconds'], result['changed'])
+
+        for engine in engines:
+            _set_standard_rate(path, 0.30)
+            result = recompute_fines(db_file=path, use_numpy=engine == 'numpy')
+            report(f"rate -> 0.30: batch ({engine})", result['seconds'], result['changed'])
+            _set_standard_rate(path, 0.25)
+            result = recompute_fines(db_file=path, use_numpy=engine == 'numpy')
+            report(f"rate -> 0.25: batch ({engine})", result['seconds'], result['changed'])
+        _set_standard_rate(path, 0.30)
+        recompute_fines(db_file=path)
+        _set_standard_rate(path, 0.25)
+        _, message, seconds = _sql_upsert(path)
+        report("rate -> 0.25: SQL upsert", seconds)
+        if numpy is None:
+            print("  (NumPy is not installed: only the array engine was measured)")
+    finally:
+        shutil.rmtree(workdir)
@@ -0,0 +1,168 @@
+"""
+Fine and loan policies per borrower class (the FINE_POLICY table).
+
+A policy sets how a class is fined and how much it may borrow:
+    Daily_rate   fine per day overdue
+    Grace_days   days overdue that are not charged
+    Max_days     most days charged per loan (NULL: no cap)
+    Max_fine     most charged per loan (NULL: no cap)
+    Loan_days    loan period used by checkout_book
+    Max_loans    active loans allowed at once
+
+Each policy is compiled once into a set-based upsert over every loan
+of its class, with the policy constants inlined and the clauses it does
+not need left out, plus a delete of the unpaid fines the policy no
+longer charges (e.g. after the grace period grew); library_app's
+update_all_fines runs both per class, and accrue_fines an incremental
+form limited to loans still out or recently returned.
+"""
+
+DEFAULT_CLASS = 'standard'
+
+# Days a loan is overdue (today while it is still out); date('now')
+# rather than 'now': whole days, no time of day
+_LATE_DAYS = "(JULIANDAY(COALESCE(BL.Date_in, date('now'))) - JULIANDAY(BL.Due_date))"
+
+
+class FinePolicy:
+    """One FINE_POLICY row."""
+
+    def __init__(self, name=DEFAULT_CLASS, daily_rate=0.25, grace_days=0, max_days=None,
+                 max_fine=None, loan_days=14, max_loans=3):
+        self.name = name
+        self.daily_rate = float(daily_rate)
+        self.grace_days = int(grace_days)
+        self.max_days = int(max_days) if max_days is not None else None
+        self.max_fine = float(max_fine) if max_fine is not None else None
+        self.loan_days = int(loan_days)
+        self.max_loans = int(max_loans)
+        self._upsert = None
+        self._accrual = None
+        self._clear = None
+        self._accrual_clear = None
+
+    @classmethod
+    def from_row(cls, row):
+        """Builds a policy from a (Class, Daily_rate, ..., Max_loans) row."""
+        return cls(*row)
+
+    @classmethod
+    def load_all(cls, cursor):
+        """Reads FINE_POLICY into {class: FinePolicy} (the default class always present)."""
+        cursor.execute("""
+            SELECT Class, Daily_rate, Grace_days, Max_days, Max_fine, Loan_days, Max_loans
+            FROM FINE_POLICY
+        """)
+        policies = {row[0]: cls.from_row(tuple(row)) for row in cursor.fetchall()}
+        policies.setdefault(DEFAULT_CLASS, cls(DEFAULT_CLASS))
+        return policies
+
+    def __repr__(self):
+        return (f"FinePolicy({self.name!r}, daily_rate={self.daily_rate}, "
+                f"grace_days={self.grace_days}, max_days={self.max_days}, "
+                f"max_fine={self.max_fine}, loan_days={self.loan_days}, "
+                f"max_loans={self.max_loans})")
+
+    # ---------------- Fines ----------------
+    def fine_for(self, late_days):
+        """Fine in dollars for a loan `late_days` days overdue."""
+        days = late_days - self.grace_days
+        if days <= 0:
+            return 0.0
+        if self.max_days is not None:
+            days = min(days, self.max_days)
+        fine = round(days * self.daily_rate, 2)
+        if self.max_fine is not None:
+            fine = min(fine, self.max_fine)
+        return fine
+
+    def fine_expression(self, late_days=_LATE_DAYS):
+        """SQL expression computing fine_for() from a days-overdue expression."""
+        days = f"{late_days} - {self.grace_days}" if self.grace_days else late_days
+        if self.max_days is not None:
+            days = f"MIN({days}, {self.max_days})"
+        fine = f"ROUND(({days}) * {self.daily_rate!r}, 2)"
+        if self.max_fine is not None:
+            fine = f"MIN({fine}, {self.max_fine!r})"
+        return fine
+
+    def _source(self, recent_only):
+        if self.name == DEFAULT_CLASS:
+            # Standard borrowers and everyone without a class row, walked from BOOK_LOANS
+            source = """
+                FROM BOOK_LOANS BL
+                LEFT JOIN BORROWER_CLASS BC ON BC.Card_id = BL.Card_id
+                WHERE (BC.Class IS NULL OR BC.Class = ?)"""
+        else:
+            # Small classes: start from their members (Class index)
+            source = """
+                FROM BORROWER_CLASS BC
+                JOIN BOOK_LOANS BL ON BL.Card_id = BC.Card_id
+                WHERE BC.Class = ?"""
+        if recent_only:
+            # Loans still out, or returned since the given day
+            source += """
+                  AND (BL.Date_in IS NULL OR BL.Date_in >= ?)"""
+        return source.strip()
+
+    def _compile(self, recent_only):
+        # Unchanged amounts are not rewritten
+        return f"""
+                INSERT INTO FINES (Loan_id, Fine_amt, Paid)
+                SELECT BL.Loan_id, {self.fine_expression()}, 0
+                {self._source(recent_only)}
+                  AND {_LATE_DAYS} > {self.grace_days}
+                ON CONFLICT(Loan_id) DO UPDATE SET
+                    Fine_amt = excluded.Fine_amt
+                WHERE FINES.Paid = 0 AND FINES.Fine_amt IS NOT excluded.Fine_amt;
+            """
+
+    def _compile_clear(self, recent_only):
+        # Walks the (few) unpaid fines, not the loans
+        return f"""
+                DELETE FROM FINES
+                WHERE Paid = 0 AND EXISTS (
+                    SELECT 1
+                    {self._source(recent_only)}
+                      AND BL.Loan_id = FINES.Loan_id
+                      AND {_LATE_DAYS} <= {self.grace_days});
+            """
+
+    @property
+    def fine_upsert_sql(self):
+        """
+        INSERT ... ON CONFLICT statement refreshing the fines of every
+        overdue loan in this class (paid fines are left alone). Its one
+        parameter is the class name.
+        """
+        if self._upsert is None:
+            self._upsert = self._compile(recent_only=False)
+        return self._upsert
+
+    @property
+    def accrual_upsert_sql(self):
+        """
+        Incremental form of fine_upsert_sql: only loans still out or
+        returned on or after a given day. Parameters: class name, day.
+        """
+        if self._accrual is None:
+            self._accrual = self._compile(recent_only=True)
+        return self._accrual
+
+    @property
+    def fine_clear_sql(self):
+        """
+        DELETE statement dropping the unpaid fines of loans in this class
+        that the policy no longer charges (late no more than the grace
+        days). Its one parameter is the class name.
+        """
+        if self._clear is None:
+            self._clear = self._compile_clear(recent_only=False)
+        return self._clear
+
+    @property
+    def accrual_clear_sql(self):
+        """Incremental form of fine_clear_sql. Parameters: class name, day."""
+        if self._accrual_clear is None:
+            self._accrual_clear = self._compile_clear(recent_only=True)
+        return self._accrual_clear
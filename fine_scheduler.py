@@ -0,0 +1,91 @@
+"""
+Background fine accrual.
+
+FineAccrualScheduler runs library_app.accrue_fines on its own thread
+every `interval` seconds and again just after midnight UTC (when
+SQLite's date('now'), and so every loan still out, moves a day on), so checkout_book's unpaid-fine check
+sees current amounts and nobody waits on a refresh at the desk.
+
+    scheduler = FineAccrualScheduler(interval=300)
+    scheduler.start()
+    ...
+    scheduler.run_now(full=True)   # e.g. the FinesPage "Refresh Fines" button
+
+Runs never overlap: a run that would start while another is in progress
+is skipped (and counted in `skipped`). Every run is recorded in
+FINE_ACCRUAL_LOG; see library_app.get_accrual_status.
+"""
+import datetime
+import threading
+
+import library_app as library
+
+
+class FineAccrualScheduler(threading.Thread):
+    """Background thread running accrue_fines on an interval and after midnight UTC."""
+
+    def __init__(self, interval=300.0, midnight_delay=5.0):
+        super().__init__(daemon=True, name="fine-accrual")
+        self.interval = interval
+        self.midnight_delay = midnight_delay
+
+        # Run metrics (the durable copy is FINE_ACCRUAL_LOG)
+        self.runs = 0
+        self.full_runs = 0
+        self.skipped = 0
+        self.last_result = None
+        self._full_requested = False
+
+        self._running = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+
+    def seconds_until_next_run(self, now=None):
+        """Interval, or less when midnight UTC (plus midnight_delay) comes first."""
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        tomorrow = datetime.datetime.combine(now.date() + datetime.timedelta(days=1),
+                                             datetime.time.min, tzinfo=now.tzinfo)
+        after_midnight = (tomorrow - now).total_seconds() + self.midnight_delay
+        return min(self.interval, after_midnight)
+
+    def run_once(self, full=False):
+        """
+        Runs one accrual now, on the calling thread (full=True: every
+        loan). Returns the accrue_fines result, or None when a run was
+        already in progress.
+        """
+        if not self._running.acquire(blocking=False):
+            self.skipped += 1
+            return None
+        try:
+            result = library.accrue_fines(full=full)
+            self.runs += 1
+            if full:
+                self.full_runs += 1
+            self.last_result = result
+            if not result['success']:
+                print(f"Fine accrual failed: {result['message']}")
+            return result
+        finally:
+            self._running.release()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            full, self._full_requested = self._full_requested, False
+            if self.run_once(full) is None and full:
+                self._full_requested = True
+            self._wake.wait(self.seconds_until_next_run())
+            self._wake.clear()
+
+    def run_now(self, full=False):
+        """
+        Asks the scheduler thread for a run without waiting for it
+        (full=True: over every loan; full_runs counts those).
+        """
+        if full:
+            self._full_requested = True
+        self._wake.set()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
@@ -0,0 +1,143 @@
+from array import array
+from collections import Counter
+
+from catalog_index import tokenize
+
+
+def trigrams(word):
+    """Padded trigrams, e.g. 'myth' -> {'  m', ' my', 'myt', 'yth', 'th '}."""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """
+    Levenshtein distance between a and b, or limit + 1 as soon as the
+    distance is known to exceed limit (keeps scoring cheap).
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            ))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class FuzzyIndex:
+    """
+    Typo-tolerant search over the words of titles and author names.
+
+    Built on top of a CatalogIndex: a trigram -> word posting list over
+    the catalog vocabulary finds the words sharing enough trigrams with
+    each query word, only those candidates are scored by edit distance,
+    and the catalog's word -> book postings turn them into books.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.words = catalog.vocabulary()
+        postings = {}
+        for word_id, word in enumerate(self.words):
+            for gram in trigrams(word):
+                posting = postings.get(gram)
+                if posting is None:
+                    posting = postings[gram] = array('I')
+                posting.append(word_id)
+        self._trigram_postings = postings
+
+    def similar_words(self, word, min_similarity=0.6, min_overlap=0.4):
+        """
+        Returns {word_id: similarity} for vocabulary words close to word.
+
+        Candidates must share at least min_overlap of the query's
+        trigrams; similarity is 1 - edit_distance / longer length.
+        """
+        grams = trigrams(word)
+        needed = max(1, int(len(grams) * min_overlap + 0.5))
+        shared = Counter()
+        for gram in grams:
+            posting = self._trigram_postings.get(gram)
+            if posting is not None:
+                shared.update(posting)
+
+        limit = int(len(word) * (1 - min_similarity))
+        matches = {}
+        for word_id, count in shared.items():
+            if count < needed:
+                continue
+            candidate = self.words[word_id]
+            distance = edit_distance(word, candidate, limit)
+            if distance <= limit:
+                matches[word_id] = 1 - distance / max(len(word), len(candidate))
+        return matches
+
+    def search(self, search_term, limit=50, min_score=0.6):
+        """
+        Returns up to `limit` books ranked by match score (0..1).
+
+        Each query word contributes its best similarity against the words
+        of the book, and the score is the average over the query words,
+        so every word has to be (approximately) present to rank well.
+        """
+        query_words = tokenize(search_term)
+        if not query_words:
+            return []
+
+        totals = Counter()
+        for word in query_words:
+            best = {}
+            for word_id, similarity in self.similar_words(word, min_score).items():
+                for ordinal in self.catalog.postings_for(self.words[word_id]):
+                    if similarity > best.get(ordinal, 0):
+                        best[ordinal] = similarity
+            for ordinal, similarity in best.items():
+                totals[ordinal] += similarity
+
+        ranked = []
+        for ordinal, total in totals.items():
+            score = total / len(query_words)
+            if score >= min_score:
+                ranked.append((-score, ordinal))
+        ranked.sort()
+
+        results = []
+        for negative_score, ordinal in ranked[:limit]:
+            results.append({
+                'Isbn': self.catalog.isbn_at(ordinal),
+                'Title': self.catalog.title_at(ordinal),
+                'Authors': ", ".join(self.catalog.authors_at(ordinal)),
+                'Availability': 'OUT' if self.catalog.is_checked_out(ordinal) else 'IN',
+                'Score': round(-negative_score, 3),
+            })
+        return results
+
+
+if __name__ == "__main__":
+    import sqlite3
+    import time
+
+    from catalog_index import CatalogIndex
+
+    conn = sqlite3.connect("library.db")
+    catalog = CatalogIndex.load(conn)
+    conn.close()
+
+    started = time.perf_counter()
+    index = FuzzyIndex(catalog)
+    print(f"Trigram index over {len(index.words)} words built in "
+          f"{(time.perf_counter() - started) * 1000:.0f} ms")
+
+    for term in ("mythologie", "Lenardn", "hary poter", "clasical mithology"):
+        started = time.perf_counter()
+        hits = index.search(term, limit=5)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"  '{term}': {elapsed:.1f} ms -> {[(h['Title'], h['Score']) for h in hits[:3]]}")
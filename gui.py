@@ -1,7 +1,13 @@
+import sys
 import tkinter as tk
 from tkinter import ttk, messagebox
 import library_app as library  #Backend functions
+import isbn_utils #ISBN normalization
 import theme #Theme module
+import reports #Fines aging / circulation reports
+
+# Background fine accrual (fine_scheduler.py), started in __main__
+accrual_scheduler = None
 
 def validate_digits_with_limit(new_value: str, max_len_str: str) -> bool:
     """
@@ -40,7 +46,7 @@ class MainApp(tk.Tk): #Initialize tkinter window
 
         #Dictionary to hold pages / frames
         self.frames = {}
-        for F in (LoginPage, SignUpPage, HomePage, SearchPage, LoansPage, BorrowersPage, FinesPage):
+        for F in (LoginPage, SignUpPage, HomePage, SearchPage, LoansPage, BorrowersPage, FinesPage, ReportsPage):
             frame = F(container, self)
             self.frames[F] = frame
             frame.grid(row=0, column=0, sticky="nsew")
@@ -142,8 +148,6 @@ class LoginPage(tk.Frame):
         ).grid(row=4, column=0, columnspan=2, pady=(5, 0), sticky="ew")
 
     def handle_login(self):
-        import sqlite3
-
         username = self.username_entry.get().strip()
         password = self.password_entry.get().strip()
 
@@ -152,33 +156,19 @@ class LoginPage(tk.Frame):
             return
 
         try:
-            conn = sqlite3.connect("library.db")
-            cur = conn.cursor()
-            cur.execute("""
-                SELECT username, password, card_id, is_librarian
-                FROM USERS
-                WHERE username = ?
-            """, (username,))
-            row = cur.fetchone()
-            conn.close()
-
-            if row is None:
-                messagebox.showerror("Error", "Incorrect username or password.", parent=self)
-                return
-
-            db_username, db_password, db_card_id, is_librarian = row
-
-            if password != db_password:
-                messagebox.showerror("Error", "Incorrect username or password.", parent=self)
-                return
-
-            self.controller.current_user = db_username
-            self.controller.current_card_id = db_card_id
-            self.controller.is_librarian = bool(is_librarian)
-            self.controller.show_frame(HomePage)
-
+            user = library.authenticate_user(username, password)
         except Exception as e:
             messagebox.showerror("Error", f"Database error during login:\n{e}", parent=self)
+            return
+
+        if not user['success']:
+            messagebox.showerror("Error", user['message'], parent=self)
+            return
+
+        self.controller.current_user = user['username']
+        self.controller.current_card_id = user['card_id']
+        self.controller.is_librarian = user['is_librarian']
+        self.controller.show_frame(HomePage)
 
 
 class SignUpPage(tk.Frame):
@@ -359,8 +349,6 @@ class SignUpPage(tk.Frame):
         ).grid(row=9, column=0, columnspan=2, pady=(5, 0), sticky="ew")
 
     def handle_signup(self):
-        import sqlite3
-
         fullname = self.fullname_entry.get().strip()
         ssn = self.ssn_entry.get().strip()
         address = self.address_entry.get().strip()
@@ -373,39 +361,15 @@ class SignUpPage(tk.Frame):
             return
 
         try:
-            conn = sqlite3.connect("library.db")
-            cur = conn.cursor()
-
-            cur.execute("SELECT 1 FROM USERS WHERE username = ?", (username,))
-            if cur.fetchone():
-                conn.close()
-                messagebox.showerror("Error", "Username is already taken.", parent=self)
-                return
+            new_card_id = library.allocate_card_ids()[0]
 
-            cur.execute("SELECT card_id FROM BORROWER WHERE ssn = ?", (ssn,))
-            if cur.fetchone():
-                conn.close()
-                messagebox.showerror("Error", "An account with this SSN already exists.", parent=self)
+            # Borrower and login are created together (SSN / username checks included)
+            success, msg = library.add_borrower(fullname, ssn, address, phone,
+                                                new_card_id, username, password)
+            if not success:
+                messagebox.showerror("Error", msg, parent=self)
                 return
 
-            cur.execute("SELECT MAX(CAST(SUBSTR(card_id, 3) AS INTEGER)) FROM BORROWER")
-            result = cur.fetchone()[0]
-            new_number = int(result) + 1 if result else 1
-            new_card_id = f"ID{new_number:06d}"
-
-            cur.execute("""
-                INSERT INTO BORROWER (card_id, Ssn, Bname, Address, Phone)
-                VALUES (?, ?, ?, ?, ?)
-            """, (new_card_id, ssn, fullname, address, phone))
-
-            cur.execute("""
-                INSERT INTO USERS (username, password, card_id, is_librarian)
-                VALUES (?, ?, ?, 0)
-            """, (username, password, new_card_id))
-
-            conn.commit()
-            conn.close()
-
             messagebox.showinfo(
                 "Success",
                 f"Account created.\nYour Card ID: {new_card_id}",
@@ -421,11 +385,6 @@ class SignUpPage(tk.Frame):
             self.controller.show_frame(LoginPage)
 
         except Exception as e:
-            try:
-                conn.rollback()
-                conn.close()
-            except Exception:
-                pass
             messagebox.showerror("Error", f"Database error during sign up:\n{e}", parent=self)
 
 class HomePage(tk.Frame):
@@ -482,6 +441,17 @@ class HomePage(tk.Frame):
         self.btn_loans = nav_button("📚  Manage Loans", LoansPage)
         self.btn_borrowers = nav_button("👤  Manage Borrowers", BorrowersPage)
         self.btn_fines = nav_button("💸  Manage Fines", FinesPage)
+        self.btn_reports = nav_button("📊  Reports", ReportsPage)
+
+        # Borrower summary (loans, fines, eligibility), shown to borrowers
+        self.account_label = tk.Label(
+            content_frame,
+            text="",
+            justify="left",
+            bg=theme.CARD_BG,
+            fg=theme.TEXT_MAIN,
+            font=theme.FONT_BODY
+        )
 
         # Logout button – clears user context and returns to Login page
         self.btn_logout = ttk.Button(
@@ -501,12 +471,28 @@ class HomePage(tk.Frame):
         self.controller.is_librarian = False
         self.controller.show_frame(LoginPage)
 
+    def _account_summary(self, card_id):
+        # Cached per borrower in the backend; writes refresh it
+        loans = library.get_borrower_loans(card_id)
+        eligibility = library.get_checkout_eligibility(card_id)
+        overdue = sum(1 for loan in loans if loan['Is_overdue'])
+        lines = [f"Books out: {len(loans)} of {eligibility['max_loans']}"
+                 + (f" ({overdue} overdue)" if overdue else "")]
+        for loan in loans:
+            lines.append(f"   • {loan['Title'][:40]}, due {loan['Due_date']}")
+        lines.append(f"Unpaid fines: ${eligibility['unpaid_fines']:.2f}")
+        lines.append("You can borrow more books." if eligibility['eligible']
+                     else eligibility['reason'])
+        return "\n".join(lines)
+
     def refresh_for_user(self):
         for btn in (
             self.btn_search,
             self.btn_loans,
             self.btn_borrowers,
             self.btn_fines,
+            self.btn_reports,
+            self.account_label,
             self.btn_logout,
         ):
             btn.pack_forget()
@@ -517,9 +503,12 @@ class HomePage(tk.Frame):
 
         # Only librarians see these
         if self.controller.is_librarian:
-            for btn in (self.btn_loans, self.btn_borrowers, self.btn_fines):
+            for btn in (self.btn_loans, self.btn_borrowers, self.btn_fines, self.btn_reports):
                 btn.pack(fill="x", pady=6, ipady=3)
                 btn.state(["!disabled", "!active"])
+        elif self.controller.current_card_id:
+            self.account_label.config(text=self._account_summary(self.controller.current_card_id))
+            self.account_label.pack(fill="x", pady=6)
 
         # Logout always visible
         self.btn_logout.pack(fill="x", pady=(12, 0), ipady=3)
@@ -585,6 +574,26 @@ class SearchPage(tk.Frame):
         self.search_entry.grid(row = 1, column = 0, pady = 5, sticky = "w")
         # enable pressing Enter to search
         self.search_entry.bind("<Return>", lambda event: self.perform_search())
+        # autocomplete: refresh suggestions as the user types
+        self.search_entry.bind("<KeyRelease>", self.on_search_key)
+        self.search_entry.bind("<Down>", self.focus_suggestions)
+
+        # Suggestion dropdown (only shown while there are suggestions)
+        self.suggest_job = None
+        self.suggestions = tk.Listbox(
+            search_frame,
+            height=6,
+            width=50,
+            bg=theme.INPUT_BG,
+            fg=theme.INPUT_FG,
+            relief="flat",
+            highlightthickness=1,
+            highlightbackground=theme.OUTLINE_COLOR,
+            activestyle="none"
+        )
+        self.suggestions.bind("<ButtonRelease-1>", self.use_suggestion)
+        self.suggestions.bind("<Return>", self.use_suggestion)
+        self.suggestions.bind("<Escape>", lambda event: self.hide_suggestions())
 
         #Search button
         ttk.Button(
@@ -594,13 +603,25 @@ class SearchPage(tk.Frame):
             command=self.perform_search
         ).grid(row =1, column=1, padx=10)
 
+        # Fuzzy mode tolerates typos ("mythologie", "Lenardn")
+        self.fuzzy_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            search_frame,
+            text="Fuzzy",
+            variable=self.fuzzy_var,
+            bg=theme.CARD_BG,
+            fg=theme.TEXT_MAIN,
+            activebackground=theme.CARD_BG,
+            font=theme.FONT_BODY
+        ).grid(row=1, column=2, padx=5)
+
         #Table to show search results
         table_frame = tk.Frame(self, bg=theme.BG_COLOR)
         table_frame.pack(fill="both", expand=True, padx=10, pady=10)
 
         self.tree = ttk.Treeview(
             table_frame,
-            columns=("ISBN", "Title", "Authors", "Availability", "BorrowerID"),
+            columns=("ISBN", "Title", "Authors", "Availability", "BorrowerID", "Match"),
             show="headings",
             style="Treeview",
             selectmode="browse"
@@ -608,15 +629,69 @@ class SearchPage(tk.Frame):
         for col in self.tree["columns"]:
             self.tree.heading(col, text=col)
             self.tree.column(col, width=150, anchor="center")  
+        self.tree.column("Match", width=60)
         self.tree.pack(fill="both", expand=True)
 
         self.tree.bind("<<TreeviewSelect>>", self.on_book_selected)
         self.tree.bind("<Double-1>", self.on_tree_double_click)
 
+    # ---------------- Autocomplete ----------------
+    def on_search_key(self, event):
+        # Navigation keys should not re-query
+        if event.keysym in ("Return", "Down", "Up", "Escape", "Tab"):
+            if event.keysym == "Escape":
+                self.hide_suggestions()
+            return
+        # Small debounce so fast typing only triggers one lookup
+        if self.suggest_job is not None:
+            self.after_cancel(self.suggest_job)
+        self.suggest_job = self.after(120, self.update_suggestions)
+
+    def update_suggestions(self):
+        self.suggest_job = None
+        prefix = self.search_entry.get().strip()
+        results = library.suggest(prefix, 8) if prefix else []
+
+        self.suggestions.delete(0, tk.END)
+        if not results:
+            self.hide_suggestions()
+            return
+
+        self.suggestion_texts = [item["Text"] for item in results]
+        for item in results:
+            self.suggestions.insert(tk.END, f"{item['Text']}  ({item['Kind']})")
+        self.suggestions.configure(height=len(results))
+        self.suggestions.grid(row=2, column=0, sticky="w")
+
+    def hide_suggestions(self):
+        self.suggestions.grid_remove()
+
+    def focus_suggestions(self, event=None):
+        if self.suggestions.winfo_ismapped() and self.suggestions.size():
+            self.suggestions.focus_set()
+            self.suggestions.selection_clear(0, tk.END)
+            self.suggestions.selection_set(0)
+            self.suggestions.activate(0)
+
+    def use_suggestion(self, event=None):
+        selected = self.suggestions.curselection()
+        if not selected:
+            return
+        text = self.suggestion_texts[selected[0]]
+        self.search_entry.delete(0, tk.END)
+        self.search_entry.insert(0, text)
+        self.hide_suggestions()
+        self.search_entry.focus_set()
+        self.perform_search()
+
     #Function that actually performs search is in library_app.py
     def perform_search(self):
+        self.hide_suggestions()
         term = self.search_entry.get()
-        results = library.search_books(term)  #Call search_books from library_app.py
+        if self.fuzzy_var.get():
+            results = library.fuzzy_search_books(term)
+        else:
+            results = library.search_books(term)  #Call search_books from library_app.py
 
         #Clear previous results
         for row in self.tree.get_children():
@@ -628,7 +703,8 @@ class SearchPage(tk.Frame):
             self.tree.insert(
                 "",
                 "end",
-                values=(item["Isbn"], item["Title"], item["Authors"], item["Availability"], borrower_id)
+                values=(item["Isbn"], item["Title"], item["Authors"], item["Availability"], borrower_id,
+                        f"{item['Score']:.0%}" if "Score" in item else "")
             )
 
     def on_book_selected(self, event):
@@ -642,7 +718,7 @@ class SearchPage(tk.Frame):
             return
 
         raw_isbn = str(values[0]).strip()
-        isbn_str = raw_isbn.zfill(10)  # keep leading zeros
+        isbn_str = isbn_utils.normalize(raw_isbn, restore_zeros=True)  # keep leading zeros
 
         # get the LoansPage instance from the controller and set its ISBN entry
         try:
@@ -662,7 +738,7 @@ class SearchPage(tk.Frame):
             return
 
         raw_isbn = str(values[0]).strip()
-        isbn_str = raw_isbn.zfill(10)
+        isbn_str = isbn_utils.normalize(raw_isbn, restore_zeros=True)
 
         # Copy to clipboard
         self.clipboard_clear()
@@ -689,7 +765,7 @@ class SearchPage(tk.Frame):
         raw_isbn = str(values[0]).strip()
         borrower_id = values[4]  # BorrowerID column
 
-        normalized_isbn = raw_isbn.replace("-", "").replace(" ", "").zfill(10)
+        normalized_isbn = isbn_utils.normalize(raw_isbn, restore_zeros=True)
         loans_page = self.controller.frames[LoansPage]
 
         # Autofill ISBN field
@@ -857,7 +933,7 @@ class LoansPage(tk.Frame):
         results = library.search_books("")  
         for item in results:
             if item["Availability"] == "IN":
-                isbn = str(item["Isbn"]).strip().zfill(10)
+                isbn = isbn_utils.normalize(item["Isbn"], restore_zeros=True)
                 self.available_tree.insert(
                     "",
                     "end",
@@ -868,11 +944,11 @@ class LoansPage(tk.Frame):
         """
         Focus and select a book in the available books tree by its raw ISBN.
         """
-        target = str(isbn_raw).replace("-", "").replace(" ", "").strip().zfill(10)
+        target = isbn_utils.normalize(isbn_raw, restore_zeros=True)
 
         for item_id in self.available_tree.get_children():
             row_isbn = str(self.available_tree.item(item_id)["values"][0])
-            row_isbn_norm = row_isbn.replace("-", "").replace(" ", "").strip().zfill(10)
+            row_isbn_norm = isbn_utils.normalize(row_isbn, restore_zeros=True)
 
             if row_isbn_norm == target:
                 self.available_tree.selection_set(item_id)
@@ -894,7 +970,7 @@ class LoansPage(tk.Frame):
             return
 
         raw = str(self.available_tree.item(selected[0])["values"][0]).strip()
-        isbn_str = raw.zfill(10)
+        isbn_str = isbn_utils.normalize(raw, restore_zeros=True)
 
         self.isbn_entry.delete(0, tk.END)
         self.isbn_entry.insert(0, isbn_str)
@@ -925,7 +1001,7 @@ class LoansPage(tk.Frame):
 
         isbn = str(self.available_tree.item(selected[0])["values"][0])
         card_id = self.card_entry.get().strip()
-        isbn = isbn.replace("-", "").replace(" ", "").zfill(10) #When retrieving values from tree it removes leading zeroes, add them back (All isbns are 10 chars)
+        isbn = isbn_utils.normalize(isbn, restore_zeros=True) #When retrieving values from tree it removes leading zeroes, add them back (All isbns are 10 chars)
 
         if not card_id:
             messagebox.showerror("Error", "Please enter Borrower Card ID", parent=self)
@@ -1100,52 +1176,28 @@ class BorrowersPage(tk.Frame):
         address = self.address_entry.get().strip()
         phone = self.phone_entry.get().strip()
 
-        # 1. Validate required fields (NOT NULL)
-        if not name or not ssn or not address:
+        # Checked before a card_id is reserved (BORROWER columns are NOT NULL)
+        if not name or not ssn or not address or not phone:
             self.status_label.config(
-                text="Error: Name, SSN, and Address are required.",
+                text="Error: All fields (Name, SSN, Address, Phone) are required.",
                 fg="red"
             )
             return
 
         try:
-            import sqlite3
-            conn = sqlite3.connect("library.db")
-            cur = conn.cursor()
-
-            # 2. Enforce ONE borrower per SSN
-            cur.execute("SELECT card_id FROM BORROWER WHERE ssn = ?", (ssn,))
-            if cur.fetchone():
-                self.status_label.config(
-                    text="Error: A borrower with this SSN already exists.",
-                    fg="red"
-                )
-                conn.close()
-                return
-
-            # 3. Auto-generate new card_id in the format ID000001
-            cur.execute("SELECT MAX(CAST(SUBSTR(card_id, 3) AS INTEGER)) FROM BORROWER")
-            result = cur.fetchone()[0]
-            new_number = int(result) + 1 if result else 1
-            new_card_id = f"ID{new_number:06d}"  # ID + 6-digit zero-padded number
-
-            # 4. Insert new borrower
-            cur.execute("""
-                INSERT INTO BORROWER (card_id, bname, address, phone, ssn)
-                VALUES (?, ?, ?, ?, ?)
-            """, (new_card_id, name, address, phone, ssn))
+            # 1. Reserve the next card_id (format ID000001) from the shared sequence
+            new_card_id = library.allocate_card_ids()[0]
 
-            # 5. Also create a login in USERS:
+            # 2. Insert the borrower (required fields and one borrower per
+            #    SSN are checked there) with a login in USERS:
             #    username = card_id, password = SSN, is_librarian = 0
-            cur.execute("""
-                INSERT INTO USERS (username, password, card_id, is_librarian)
-                VALUES (?, ?, ?, 0)
-            """, (new_card_id, ssn, new_card_id))
-
-            conn.commit()
-            conn.close()
+            success, msg = library.add_borrower(name, ssn, address, phone,
+                                                new_card_id, new_card_id, ssn)
+            if not success:
+                self.status_label.config(text=msg, fg="red")
+                return
 
-            # 6. Success message + clear form
+            # 3. Success message + clear form
             self.last_card_id = new_card_id
 
             self.status_label.config(
@@ -1281,6 +1333,13 @@ class FinesPage(tk.Frame):
             command=self.refresh_fines
         ).grid(row=0, column=5, padx=5)
 
+        ttk.Button(
+            search_frame,
+            text="Fines Report",
+            style="Accent.TButton",
+            command=lambda: controller.show_frame(ReportsPage)
+        ).grid(row=0, column=6, padx=5)
+
         # --- Table ---
         self.tree = ttk.Treeview(
             card,
@@ -1313,51 +1372,65 @@ class FinesPage(tk.Frame):
         self.message.pack(pady=5)
         self.message.pack(pady=5)
 
-    # ---------------- REFRESH FINES ----------------
-    def refresh_fines(self):
-        import sqlite3, datetime
-        conn = sqlite3.connect("library.db")
-        cur = conn.cursor()
+        # Last background accrual run (FINE_ACCRUAL_LOG)
+        self.accrual_label = tk.Label(
+            card,
+            text="",
+            bg=theme.CARD_BG,
+            fg=theme.TEXT_MAIN,
+            font=theme.FONT_BODY
+        )
+        self.accrual_label.pack(pady=(0, 5))
+
+    def refresh_for_user(self):
+        self.show_accrual_status()
 
-        today = datetime.date.today()
+    def show_accrual_status(self):
+        status = library.get_accrual_status()
+        if status is None:
+            text = "Fines have not been accrued yet."
+        else:
+            text = (f"Fines last accrued {status['Started_at']} "
+                    f"({status['Seconds']:.2f}s, {status['Rows_changed']} changed)")
+        if accrual_scheduler is not None:
+            text += f" · automatic every {accrual_scheduler.interval / 60:g} min"
+        self.accrual_label.config(text=text)
 
-        cur.execute("""
-            SELECT loan_id, due_date, date_in 
-            FROM BOOK_LOANS
-            WHERE due_date IS NOT NULL
-        """)
-        loans = cur.fetchall()
+    # ---------------- REFRESH FINES ----------------
+    def refresh_fines(self):
+        # Fines follow each borrower's class policy (FINE_POLICY), applied
+        # set-based by the backend. With the background scheduler the
+        # refresh (a full one, covering returned loans too) runs on its
+        # thread and the window stays responsive.
+        if accrual_scheduler is not None and accrual_scheduler.is_alive():
+            runs_before = accrual_scheduler.full_runs
+            accrual_scheduler.run_now(full=True)
+            self.message.config(text="Refreshing fines...", fg="green")
+            self.after(200, self._wait_for_refresh, runs_before)
+            return
 
-        for loan_id, due, returned in loans:
-            due_date = datetime.date.fromisoformat(due)
+        success, msg = library.update_all_fines()
+        if success:
+            self.message.config(text="Fines refreshed successfully.", fg="green")
+        else:
+            self.message.config(text=msg, fg="red")
+        self.show_accrual_status()
+        self.search_fines()
 
-            if returned:
-                returned_date = datetime.date.fromisoformat(returned)
-                late_days = (returned_date - due_date).days
+    def _wait_for_refresh(self, runs_before):
+        if accrual_scheduler.full_runs == runs_before:
+            if accrual_scheduler.is_alive():
+                self.after(200, self._wait_for_refresh, runs_before)
             else:
-                late_days = (today - due_date).days
-
-            if late_days > 0:
-                fine_amt = round(late_days * 0.25, 2)
-
-                cur.execute("SELECT paid FROM FINES WHERE loan_id = ?", (loan_id,))
-                row = cur.fetchone()
-
-                if row:
-                    if row[0] == 0:                     # unpaid → update only
-                        cur.execute("""
-                            UPDATE FINES SET fine_amt = ?
-                            WHERE loan_id = ?
-                        """, (fine_amt, loan_id))
-                else:
-                    cur.execute("""
-                        INSERT INTO FINES (loan_id, fine_amt, paid)
-                        VALUES (?, ?, 0)
-                    """, (loan_id, fine_amt))
-
-        conn.commit()
-        conn.close()
-        self.message.config(text="Fines refreshed successfully.", fg="green")
+                # The scheduler thread died: refresh here instead
+                self.refresh_fines()
+            return
+        result = accrual_scheduler.last_result
+        if result['success']:
+            self.message.config(text="Fines refreshed successfully.", fg="green")
+        else:
+            self.message.config(text=result['message'], fg="red")
+        self.show_accrual_status()
         self.search_fines()
 
     # ---------------- SEARCH FINES ----------------
@@ -1366,48 +1439,15 @@ class FinesPage(tk.Frame):
         for row in self.tree.get_children():
             self.tree.delete(row)
 
-        import sqlite3
-        conn = sqlite3.connect("library.db")
-        cur = conn.cursor()
-
         card = self.card_entry.get().strip()
         name = self.name_entry.get().strip()
 
-        # base SELECT
-        base = """
-            SELECT B.card_id, B.bname, SUM(F.fine_amt)
-            FROM BORROWER B
-            JOIN BOOK_LOANS L ON B.card_id = L.card_id
-            JOIN FINES F ON L.loan_id = F.loan_id
-        """
-
-        params = []
-
-        # build WHERE depending on which fields are filled
-        if card and name:
-            # match EITHER the card OR the name
-            where_clause = "WHERE F.paid = 0 AND (B.card_id = ? OR B.bname LIKE ?)"
-            params = [card, f"%{name}%"]
-        elif card:
-            where_clause = "WHERE F.paid = 0 AND B.card_id = ?"
-            params = [card]
-        elif name:
-            where_clause = "WHERE F.paid = 0 AND B.bname LIKE ?"
-            params = [f"%{name}%"]
-        else:
-            # no filters → all unpaid fines
-            where_clause = "WHERE F.paid = 0"
-
-        group_by = " GROUP BY B.card_id, B.bname"
-
-        query = base + " " + where_clause + group_by
+        # Card ID matches exactly, name matches the start of the first name
+        # or surname (both indexed); no filters → all unpaid fines
+        results = library.search_unpaid_fines(card, name)
 
-        cur.execute(query, params)
-        results = cur.fetchall()
-        conn.close()
-
-        for card_id, bname, total in results:
-            self.tree.insert("", "end", values=(card_id, bname, f"{total:.2f}"))
+        for item in results:
+            self.tree.insert("", "end", values=(item["Card_id"], item["Bname"], f"{item['Total']:.2f}"))
     # ---------------- PAY FINE ----------------
     def pay_fine(self):
         selected = self.tree.selection()
@@ -1417,39 +1457,140 @@ class FinesPage(tk.Frame):
 
         card_id = self.tree.item(selected[0])["values"][0]
 
-        import sqlite3
-        conn = sqlite3.connect("library.db")
-        cur = conn.cursor()
-
-        #Do not allow paying if book not returned
-        cur.execute("""
-            SELECT 1 FROM BOOK_LOANS L
-            JOIN FINES F ON L.loan_id = F.loan_id
-            WHERE L.card_id = ? AND L.date_in IS NULL AND F.paid = 0
-        """, (card_id,))
-        if cur.fetchone():
-            self.message.config(text="Error: Cannot pay fine for books not yet returned.")
-            conn.close()
-            return
+        # Same rules and cache invalidation as every other payment path
+        success, msg = library.pay_borrower_fines(str(card_id))
+        self.message.config(text=msg, fg="green" if success else "red")
+        if success:
+            self.search_fines()
+
+
+class ReportsPage(tk.Frame):
+    """Dashboards read from the report rollups (see reports.py)."""
+
+    # tab title -> (report key, [(column, heading, width)])
+    TABS = [
+        ("Fines Aging", "aging", [
+            ("Bucket", "Days Overdue", 160), ("Fines", "Unpaid Fines", 120),
+            ("Amount", "Amount ($)", 120)]),
+        ("Top Borrowers", "borrowers", [
+            ("Card_id", "Card ID", 110), ("Bname", "Borrower Name", 220),
+            ("Unpaid_amt", "Unpaid ($)", 100), ("Unpaid_count", "Fines", 80),
+            ("Overdue_books", "Overdue Books", 110)]),
+        ("Top Titles", "titles", [
+            ("Isbn", "ISBN", 120), ("Title", "Title", 400), ("Checkouts", "Checkouts", 100)]),
+        ("Top Authors", "authors", [
+            ("Name", "Author", 300), ("Titles", "Titles", 100), ("Checkouts", "Checkouts", 100)]),
+        ("Daily Volumes", "daily", [
+            ("Day", "Day", 140), ("Checkouts", "Checkouts", 120), ("Checkins", "Check-ins", 120)]),
+    ]
+
+    def __init__(self, parent, controller):
+        super().__init__(parent, bg=theme.BG_COLOR)
+        self.controller = controller
+
+        # Top bar
+        topBar = tk.Frame(self, bg=theme.BG_COLOR)
+        topBar.pack(fill="x", pady=10, padx=10)
+
+        tk.Label(
+            topBar,
+            text="Reports",
+            font=theme.FONT_TITLE,
+            bg=theme.BG_COLOR,
+            fg="white"
+        ).pack(side="left")
 
-        # Mark all unpaid fines as paid
-        cur.execute("""
-            UPDATE FINES SET paid = 1
-            WHERE loan_id IN (
-                SELECT L.loan_id FROM BOOK_LOANS L
-                JOIN FINES F ON L.loan_id = F.loan_id
-                WHERE L.card_id = ? AND F.paid = 0
+        ttk.Button(
+            topBar,
+            text="← Back to Home",
+            style="Accent.TButton",
+            command=lambda: controller.show_frame(HomePage)
+        ).pack(side="right")
+
+        ttk.Button(
+            topBar,
+            text="Refresh",
+            style="Accent.TButton",
+            command=self.load_reports
+        ).pack(side="right", padx=5)
+
+        # Card container
+        card = tk.Frame(self, bg=theme.CARD_BG, padx=20, pady=15)
+        card.pack(fill="both", expand=True, padx=15, pady=10)
+
+        notebook = ttk.Notebook(card)
+        notebook.pack(fill="both", expand=True)
+
+        # One table per report
+        self.trees = {}
+        for title, key, columns in self.TABS:
+            tree = ttk.Treeview(
+                notebook,
+                columns=[name for name, _, _ in columns],
+                show="headings",
+                style="Treeview"
             )
-        """, (card_id,))
+            for name, heading, width in columns:
+                tree.heading(name, text=heading)
+                tree.column(name, width=width, anchor="w" if width > 200 else "center")
+            notebook.add(tree, text=title)
+            self.trees[key] = (tree, [name for name, _, _ in columns])
 
-        conn.commit()
-        conn.close()
-        self.message.config(text="Fine paid successfully.", fg="green")
-        self.search_fines()
+    def refresh_for_user(self):
+        if self.controller.is_librarian:
+            self.load_reports()
+
+    def load_reports(self):
+        report = reports.dashboard()
+        for key, (tree, columns) in self.trees.items():
+            for row in tree.get_children():
+                tree.delete(row)
+            for item in report[key]:
+                values = []
+                for name in columns:
+                    value = item[name]
+                    values.append(f"{value:.2f}" if isinstance(value, float) else value)
+                tree.insert("", "end", values=values)
 
 
 # -------------------- Run the App --------------------
 
 if __name__ == "__main__":
+    # Shared desks: "python gui.py --server http://host:8080" goes through
+    # server.py instead of opening library.db directly
+    if "--server" in sys.argv:
+        import library_client
+        library_client.connect(sys.argv[sys.argv.index("--server") + 1])
+        library = library_client
+        # Reports are read on the service as well (GET /reports)
+        reports = library_client
+        # The service owns the database: these only apply to a local one
+        for option in ("--catalog-index", "--replica"):
+            if option in sys.argv:
+                print(f"Ignoring {option}: not available with --server.")
+    # Front-desk kiosks: "python gui.py --catalog-index" serves searches from memory
+    if "--catalog-index" in sys.argv and "--server" not in sys.argv:
+        ok, msg = library.enable_catalog_index()
+        print(msg)
+    # Branch workstations: "python gui.py --replica branch.db" reads from a
+    # local copy kept in sync with the shared library.db
+    if "--replica" in sys.argv and "--server" not in sys.argv:
+        import os
+        import replica
+        replica_path = sys.argv[sys.argv.index("--replica") + 1]
+        if not os.path.exists(replica_path):
+            print(replica.seed_replica(library.DB_FILE, replica_path)[1])
+        replica.ReplicaFollower(library.DB_FILE, replica_path).start()
+        library.configure_replica(replica_path)
+    # Fines accrue in the background every 5 minutes and after midnight
+    # ("--accrual-interval 0" turns it off; with --server the service does it)
+    if "--server" not in sys.argv:
+        interval = 300.0
+        if "--accrual-interval" in sys.argv:
+            interval = float(sys.argv[sys.argv.index("--accrual-interval") + 1])
+        if interval > 0:
+            import fine_scheduler
+            accrual_scheduler = fine_scheduler.FineAccrualScheduler(interval)
+            accrual_scheduler.start()
     app = MainApp()
     app.mainloop()
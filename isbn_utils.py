@@ -0,0 +1,88 @@
+"""
+Central ISBN handling: normalization, ISBN-10 / ISBN-13 validation
+(including check digits) and conversion between the two forms.
+
+BOOK stores ISBN-10 strings, so canonical() is the key to use for
+primary-key lookups.
+"""
+
+
+def normalize(value, restore_zeros=False):
+    """
+    Strips spaces and hyphens and upper-cases a trailing 'x'.
+
+    With restore_zeros=True, a short all-digit value gets its leading
+    zeros back (Tkinter tables turn "0195153445" into 195153445).
+    """
+    text = str(value if value is not None else "").strip()
+    text = text.replace("-", "").replace(" ", "").upper()
+    if restore_zeros and 0 < len(text) < 10 and text.isdigit():
+        text = text.zfill(10)
+    return text
+
+
+def isbn10_check_digit(first_nine):
+    """Check character ('0'-'9' or 'X') for the first 9 digits of an ISBN-10."""
+    total = sum((10 - i) * int(digit) for i, digit in enumerate(first_nine))
+    check = (11 - total % 11) % 11
+    return "X" if check == 10 else str(check)
+
+
+def isbn13_check_digit(first_twelve):
+    """Check digit for the first 12 digits of an ISBN-13."""
+    total = sum((3 if i % 2 else 1) * int(digit) for i, digit in enumerate(first_twelve))
+    return str((10 - total % 10) % 10)
+
+
+def is_valid_isbn10(value):
+    text = normalize(value)
+    return (len(text) == 10 and text[:9].isdigit()
+            and (text[9].isdigit() or text[9] == "X")
+            and isbn10_check_digit(text[:9]) == text[9])
+
+
+def is_valid_isbn13(value):
+    text = normalize(value)
+    return (len(text) == 13 and text.isdigit()
+            and text[:3] in ("978", "979")
+            and isbn13_check_digit(text[:12]) == text[12])
+
+
+def is_valid(value):
+    """True for a valid ISBN-10 or ISBN-13 (hyphens/spaces allowed)."""
+    return is_valid_isbn10(value) or is_valid_isbn13(value)
+
+
+def to_isbn13(value):
+    """ISBN-10 -> ISBN-13 (978 prefix). Returns None if value is not a valid ISBN-10."""
+    text = normalize(value)
+    if not is_valid_isbn10(text):
+        return None
+    body = "978" + text[:9]
+    return body + isbn13_check_digit(body)
+
+
+def to_isbn10(value):
+    """
+    ISBN-13 -> ISBN-10. Returns None if value is not a valid ISBN-13
+    or has the 979 prefix (those have no ISBN-10 form).
+    """
+    text = normalize(value)
+    if not is_valid_isbn13(text) or not text.startswith("978"):
+        return None
+    body = text[3:12]
+    return body + isbn10_check_digit(body)
+
+
+def canonical(value):
+    """
+    Returns the form stored in BOOK (ISBN-10) for any valid ISBN-10 or
+    convertible ISBN-13, the ISBN-13 itself for 979 ISBNs, or None if
+    value is not a valid ISBN at all.
+    """
+    text = normalize(value)
+    if is_valid_isbn10(text):
+        return text
+    if is_valid_isbn13(text):
+        return to_isbn10(text) or text
+    return None
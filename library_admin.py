@@ -0,0 +1,330 @@
+"""
+Command-line maintenance tasks for the library database.
+
+Usage examples:
+    python library_admin.py archive --min-age-days 365
+    python library_admin.py backup --dir backups --keep 7
+    python library_admin.py restore backups/library-20250101-120000.db restored.db
+    python library_admin.py compact-log
+    python library_admin.py group-commit-bench --threads 16 --ops 400
+    python library_admin.py snapshot export library.snap
+    python library_admin.py snapshot restore library.snap branch.db
+    python library_admin.py export fines fines-2025-01.csv.gz --from 2025-01-01 --to 2025-01-31
+    python library_admin.py fines-recompute
+    python library_admin.py fines-bench --loans 20000000
+    python library_admin.py policy set staff --rate 0.10 --grace-days 3 --max-loans 10 --loan-days 28
+    python library_admin.py policy assign ID000123 staff
+"""
+import argparse
+import datetime
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+import fine_batch
+import library_app as library
+import snapshot
+
+
+def cmd_archive(args):
+    success, message = library.archive_closed_loans(
+        min_age_days=args.min_age_days,
+        batch_size=args.batch_size,
+        pause=args.pause,
+    )
+    print(message)
+    return 0 if success else 1
+
+
+def _print_progress(done, total):
+    percent = done * 100 // total if total else 100
+    print(f"\r  {done}/{total} pages ({percent}%)", end="", flush=True)
+
+
+def cmd_backup(args):
+    os.makedirs(args.dir, exist_ok=True)
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    dest = os.path.join(args.dir, f"library-{stamp}.db")
+
+    result = library.backup_database(dest, pages_per_step=args.pages, sleep=args.sleep,
+                                     progress=_print_progress)
+    print()
+    print(result['message'])
+    if not result['success']:
+        return 1
+
+    for path in library.rotate_backups(args.dir, keep=args.keep):
+        print(f"  removed old backup {path}")
+    return 0
+
+
+def cmd_restore(args):
+    result = library.restore_database(args.backup, args.dest, pages_per_step=args.pages,
+                                      progress=_print_progress, overwrite=args.overwrite)
+    print()
+    print(result['message'])
+    return 0 if result['success'] else 1
+
+
+def cmd_compact_log(args):
+    success, message = library.compact_change_log(args.upto)
+    print(message)
+    return 0 if success else 1
+
+
+def _run_checkouts(db_path, jobs, threads, batcher=None):
+    """Runs the (isbn, card_id) jobs from `threads` threads; returns (seconds, successes)."""
+    library.DB_FILE = db_path
+    successes = []
+    chunks = [jobs[i::threads] for i in range(threads)]
+
+    def worker(chunk):
+        for isbn, card_id in chunk:
+            if batcher is not None:
+                success, _ = batcher.checkout_book(isbn, card_id)
+            else:
+                success, _ = library.checkout_book(isbn, card_id)
+            successes.append(success)
+
+    workers = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - started, sum(successes)
+
+
+def cmd_group_commit_bench(args):
+    source = args.db
+    conn = sqlite3.connect(source)
+    isbns = [row[0] for row in conn.execute(
+        "SELECT Isbn FROM BOOK WHERE Isbn NOT IN (SELECT Isbn FROM BOOK_LOANS WHERE Date_in IS NULL) "
+        "LIMIT ?", (args.ops,))]
+    cards = [row[0] for row in conn.execute(
+        "SELECT Card_id FROM BORROWER ORDER BY Card_id LIMIT ?", (args.ops,))]
+    conn.close()
+    jobs = list(zip(isbns, cards))
+
+    workdir = tempfile.mkdtemp()
+    try:
+        print(f"{len(jobs)} checkouts from {args.threads} threads")
+        print(f"  {'mode':<28}{'ops/sec':>10}{'commits':>10}{'commits/sec':>14}")
+
+        db_path = os.path.join(workdir, "single.db")
+        shutil.copy(source, db_path)
+        seconds, ok = _run_checkouts(db_path, jobs, args.threads)
+        print(f"  {'commit per operation':<28}{ok / seconds:>10.0f}{ok:>10}{ok / seconds:>14.0f}")
+
+        for window in args.window:
+            db_path = os.path.join(workdir, f"batched-{window}.db")
+            shutil.copy(source, db_path)
+            library.DB_FILE = db_path
+            batcher = library.WriteBatcher(db_path, window=window, max_batch=args.max_batch)
+            seconds, ok = _run_checkouts(db_path, jobs, args.threads, batcher)
+            batcher.close()
+            label = f"group commit {window * 1000:g} ms/{args.max_batch}"
+            print(f"  {label:<28}{ok / seconds:>10.0f}{batcher.batches:>10}"
+                  f"{batcher.batches / seconds:>14.0f}")
+    finally:
+        shutil.rmtree(workdir)
+        library.DB_FILE = source
+    print("Each commit is one journal + database fsync.")
+    return 0
+
+
+def cmd_snapshot_export(args):
+    result = snapshot.export_snapshot(args.db, args.snapshot, chunk_rows=args.chunk_rows)
+    print(result['message'])
+    return 0 if result['success'] else 1
+
+
+def cmd_snapshot_restore(args):
+    result = snapshot.restore_snapshot(args.snapshot, args.dest, overwrite=args.overwrite)
+    print(result['message'])
+    return 0 if result['success'] else 1
+
+
+def cmd_snapshot_bench(args):
+    snapshot.benchmark(args.scales, args.csv_dir)
+    return 0
+
+
+def cmd_export(args):
+    if args.what == "loans":
+        rows = library.iter_loans(args.date_from, args.date_to, include_archived=args.archived)
+    elif args.what == "fines":
+        rows = library.iter_fines(args.date_from, args.date_to, unpaid_only=args.unpaid,
+                                  include_archived=args.archived)
+    else:
+        rows = library.iter_catalog()
+
+    started = time.perf_counter()
+    count = library.write_export(rows, args.output, fmt=args.format,
+                                 compress=True if args.gzip else None)
+    print(f"Exported {count} {args.what} row(s) to {args.output} "
+          f"in {time.perf_counter() - started:.2f}s.")
+    return 0
+
+
+def cmd_fines_recompute(args):
+    use_numpy = {'auto': None, 'numpy': True, 'array': False}[args.engine]
+    result = fine_batch.recompute_fines(chunk_rows=args.chunk_rows, use_numpy=use_numpy)
+    print(result['message'])
+    return 0 if result['success'] else 1
+
+
+def cmd_fines_bench(args):
+    fine_batch.benchmark(args.loans, args.workdir)
+    return 0
+
+
+def cmd_policy_list(args):
+    print(f"  {'class':<14}{'rate':>6}{'grace':>7}{'max days':>10}{'max fine':>10}"
+          f"{'loan days':>11}{'max loans':>11}")
+    for policy in library.get_fine_policies():
+        max_days = policy.max_days if policy.max_days is not None else "-"
+        max_fine = f"{policy.max_fine:.2f}" if policy.max_fine is not None else "-"
+        print(f"  {policy.name:<14}{policy.daily_rate:>6.2f}{policy.grace_days:>7}{max_days:>10}"
+              f"{max_fine:>10}{policy.loan_days:>11}{policy.max_loans:>11}")
+    return 0
+
+
+def cmd_policy_set(args):
+    success, message = library.set_fine_policy(
+        args.name, daily_rate=args.rate, grace_days=args.grace_days, max_days=args.max_days,
+        max_fine=args.max_fine, loan_days=args.loan_days, max_loans=args.max_loans)
+    print(message)
+    return 0 if success else 1
+
+
+def cmd_policy_assign(args):
+    success, message = library.set_borrower_class(args.card_id, args.name)
+    print(message)
+    return 0 if success else 1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Library database maintenance")
+    parser.add_argument("--db", default=library.DB_FILE,
+                        help=f"database file (default: {library.DB_FILE})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    archive = commands.add_parser(
+        "archive", help="move old returned loans into LOAN_HISTORY")
+    archive.add_argument("--min-age-days", type=int, default=365,
+                         help="only archive loans returned more than this many days ago")
+    archive.add_argument("--batch-size", type=int, default=500,
+                         help="loans moved per transaction")
+    archive.add_argument("--pause", type=float, default=0.05,
+                         help="seconds to sleep between batches")
+    archive.set_defaults(func=cmd_archive)
+
+    backup = commands.add_parser(
+        "backup", help="online backup with integrity check and rotation")
+    backup.add_argument("--dir", default="backups", help="backup directory")
+    backup.add_argument("--keep", type=int, default=7, help="number of backups to keep")
+    backup.add_argument("--pages", type=int, default=256, help="pages copied per step")
+    backup.add_argument("--sleep", type=float, default=0.05,
+                        help="seconds the database stays unlocked between steps")
+    backup.set_defaults(func=cmd_backup)
+
+    restore = commands.add_parser("restore", help="restore a backup into a new file")
+    restore.add_argument("backup", help="backup file to restore")
+    restore.add_argument("dest", help="database file to create")
+    restore.add_argument("--pages", type=int, default=1024, help="pages copied per step")
+    restore.add_argument("--overwrite", action="store_true", help="replace dest if it exists")
+    restore.set_defaults(func=cmd_restore)
+
+    compact = commands.add_parser(
+        "compact-log", help="drop superseded CHANGE_LOG entries")
+    compact.add_argument("--upto", type=int, default=None,
+                         help="only compact entries up to this sequence number")
+    compact.set_defaults(func=cmd_compact_log)
+
+    bench = commands.add_parser(
+        "group-commit-bench", help="compare commit-per-checkout with WriteBatcher (on a copy)")
+    bench.add_argument("--threads", type=int, default=16, help="concurrent desks")
+    bench.add_argument("--ops", type=int, default=400, help="checkouts to run")
+    bench.add_argument("--window", type=float, nargs="+", default=[0.002, 0.005, 0.02],
+                       help="batch windows to try, in seconds")
+    bench.add_argument("--max-batch", type=int, default=32, help="operations per batch at most")
+    bench.set_defaults(func=cmd_group_commit_bench)
+
+    snap = commands.add_parser(
+        "snapshot", help="compressed whole-database snapshots (export / restore / bench)")
+    snap_commands = snap.add_subparsers(dest="snapshot_command", required=True)
+    snap_export = snap_commands.add_parser("export", help="write a snapshot of --db")
+    snap_export.add_argument("snapshot", help="snapshot file to write")
+    snap_export.add_argument("--chunk-rows", type=int, default=20000, help="rows per compressed chunk")
+    snap_export.set_defaults(func=cmd_snapshot_export)
+    snap_restore = snap_commands.add_parser("restore", help="build a database from a snapshot")
+    snap_restore.add_argument("snapshot", help="snapshot file to read")
+    snap_restore.add_argument("dest", help="database file to create")
+    snap_restore.add_argument("--overwrite", action="store_true", help="replace dest if it exists")
+    snap_restore.set_defaults(func=cmd_snapshot_restore)
+    snap_bench = snap_commands.add_parser("bench", help="snapshot restore vs CSV reload")
+    snap_bench.add_argument("--scales", type=int, nargs="+", default=[1, 10])
+    snap_bench.add_argument("--csv-dir", default=".", help="directory with the source CSVs")
+    snap_bench.set_defaults(func=cmd_snapshot_bench)
+
+    export = commands.add_parser(
+        "export", help="stream loans, fines or the catalog to CSV / JSONL")
+    export.add_argument("what", choices=["loans", "fines", "catalog"])
+    export.add_argument("output", help="file to write (.csv, .jsonl, optionally .gz)")
+    export.add_argument("--from", dest="date_from", help="first day, YYYY-MM-DD "
+                        "(loans: Date_out, fines: Due_date)")
+    export.add_argument("--to", dest="date_to", help="last day, YYYY-MM-DD")
+    export.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file name")
+    export.add_argument("--gzip", action="store_true", help="compress (default for .gz names)")
+    export.add_argument("--archived", action="store_true", help="include LOAN_HISTORY")
+    export.add_argument("--unpaid", action="store_true", help="fines: unpaid only")
+    export.set_defaults(func=cmd_export)
+
+    recompute = commands.add_parser(
+        "fines-recompute", help="recompute all unpaid fines in chunks, writing only changes")
+    recompute.add_argument("--chunk-rows", type=int, default=fine_batch.CHUNK_ROWS,
+                           help="loans per chunk (and per transaction)")
+    recompute.add_argument("--engine", choices=["auto", "numpy", "array"], default="auto")
+    recompute.set_defaults(func=cmd_fines_recompute)
+
+    fines_bench = commands.add_parser(
+        "fines-bench", help="batch engine vs update_all_fines on synthetic loans")
+    fines_bench.add_argument("--loans", type=int, default=20000000)
+    fines_bench.add_argument("--workdir", default=None,
+                             help="where to build the scratch database (default: system temp)")
+    fines_bench.set_defaults(func=cmd_fines_bench)
+
+    policy = commands.add_parser(
+        "policy", help="fine / loan policies per borrower class (list / set / assign)")
+    policy_commands = policy.add_subparsers(dest="policy_command", required=True)
+    policy_list = policy_commands.add_parser("list", help="show every policy class")
+    policy_list.set_defaults(func=cmd_policy_list)
+    policy_set = policy_commands.add_parser("set", help="create or replace a policy class")
+    policy_set.add_argument("name", help="class name ('standard' is the default class)")
+    policy_set.add_argument("--rate", type=float, default=0.25, help="fine per day overdue")
+    policy_set.add_argument("--grace-days", type=int, default=0, help="days overdue not charged")
+    policy_set.add_argument("--max-days", type=int, default=None, help="most days charged per loan")
+    policy_set.add_argument("--max-fine", type=float, default=None, help="most charged per loan")
+    policy_set.add_argument("--loan-days", type=int, default=14, help="loan period")
+    policy_set.add_argument("--max-loans", type=int, default=3, help="active loans allowed")
+    policy_set.set_defaults(func=cmd_policy_set)
+    policy_assign = policy_commands.add_parser("assign", help="put a borrower in a class")
+    policy_assign.add_argument("card_id")
+    policy_assign.add_argument("name", help="class name ('standard' removes the assignment)")
+    policy_assign.set_defaults(func=cmd_policy_assign)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    library.DB_FILE = args.db
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,23 +1,496 @@
 import sqlite3
 import datetime
+import copy
+import csv
+import functools
+import glob
+import gzip
+import json
+import os
+import queue
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import create_db
+import isbn_utils
+import query_parser
+from autocomplete import SuggestIndex
+from borrower_cache import BorrowerCache
+from catalog_index import CatalogIndex
+from fine_policy import DEFAULT_CLASS, FinePolicy
+from fuzzy_search import FuzzyIndex
 
 DB_FILE = "library.db"
 
+# Optional local read replica (see replica.py / configure_replica).
+# When set, read-only paths use it and writes still go to DB_FILE.
+REPLICA_DB_FILE = None
+
+# Seconds a connection waits on another desk's lock before giving up
+# with "database is locked" (sqlite3's own default)
+BUSY_TIMEOUT = 5.0
+
+# Database files that already had create_db.SUPPORT_SCHEMA applied
+_schema_checked = set()
+
+# Optional in-memory catalog index (see enable_catalog_index).
+# It is loaded on demand by fuzzy search too; search_books only answers
+# from it when _catalog_search_enabled is set.
+_catalog_index = None
+_catalog_search_enabled = False
+
+# Trigram index for fuzzy_search_books, built on first use
+_fuzzy_index = None
+
+# Prefix autocomplete index, built on the first call to suggest()
+_suggest_index = None
+
+# Fine / loan policies per borrower class (see fine_policy.py), cached
+# and re-read from FINE_POLICY at most every POLICY_TTL seconds;
+# set_fine_policy() drops the cache at once
+POLICY_TTL = 60.0
+_fine_policies = None
+_fine_policies_loaded_at = 0.0
+
+# Per-borrower results for the borrower views (get_borrower_fines,
+# get_borrower_loans, get_checkout_eligibility); every write that
+# touches a borrower drops their entries (see _invalidate_borrower)
+_borrower_cache = BorrowerCache(maxsize=1024, ttl=30.0)
+
+# Per-thread connections lent to this module by use_connection()
+_local = threading.local()
+
+
+def open_connection(path=None, read_only=False, check_same_thread=True):
+    """
+    Opens a new connection configured the way this module expects
+    (Row objects, foreign keys on). Long-lived callers such as the HTTP
+    service use it to build their own writer / reader connections.
+    """
+    path = path or DB_FILE
+    if read_only:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=BUSY_TIMEOUT,
+                               check_same_thread=check_same_thread)
+    else:
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=check_same_thread)
+        # Older databases may miss the newer indexes / helper tables
+        if path not in _schema_checked:
+            create_db.ensure_support_schema(conn)
+            _schema_checked.add(path)
+    # This line makes the 'row' object accessible by column name
+    conn.row_factory = sqlite3.Row
+    # Enable foreign key enforcement
+    conn.execute("PRAGMA foreign_keys = ON;")
+    return conn
+
+
+class _SharedConnection:
+    """
+    Wraps a connection lent through use_connection(): the library
+    functions use it as usual, but their close() leaves it open for
+    the owner.
+
+    Inside apply_batch() it also carries the savepoint of the current
+    operation: commit() is deferred to the end of the batch and
+    rollback() only undoes that one operation.
+    """
+
+    def __init__(self, conn, savepoint=None):
+        self._conn = conn
+        self.savepoint = savepoint
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def commit(self):
+        if self.savepoint is None:
+            self._conn.commit()
+
+    def rollback(self):
+        if self.savepoint is None:
+            self._conn.rollback()
+        else:
+            self._conn.execute(f"ROLLBACK TO {self.savepoint}")
+
+    def close(self):
+        pass
+
+
+@contextmanager
+def use_connection(conn=None, read_conn=None):
+    """
+    Makes library calls on the current thread run on caller-owned
+    connections instead of opening one per call:
+    - conn: used for writes (and reads, unless read_conn is given)
+    - read_conn: used for read-only queries
+
+        with library_app.use_connection(writer):
+            library_app.checkout_book(isbn, card_id)
+    """
+    previous = (getattr(_local, 'conn', None), getattr(_local, 'read_conn', None))
+    _local.conn = conn
+    _local.read_conn = read_conn
+    try:
+        yield
+    finally:
+        _local.conn, _local.read_conn = previous
+
 
 def _get_db_connection():
     """Helper function to create a database connection."""
+    lent = getattr(_local, 'conn', None)
+    if isinstance(lent, _SharedConnection):
+        return lent
+    if lent is not None:
+        return _SharedConnection(lent)
     try:
-        conn = sqlite3.connect(DB_FILE)
-        # This line makes the 'row' object accessible by column name
-        conn.row_factory = sqlite3.Row
-        # Enable foreign key enforcement
-        conn.execute("PRAGMA foreign_keys = ON;")
-        return conn
+        return open_connection()
     except sqlite3.Error as e:
         print(f"Error connecting to database: {e}")
         return None
 
 
+def _get_read_connection():
+    """
+    Connection for read-only queries: a lent reader connection, the
+    local replica when one is configured, otherwise the primary database.
+    """
+    lent = getattr(_local, 'read_conn', None) or getattr(_local, 'conn', None)
+    if isinstance(lent, _SharedConnection):
+        return lent
+    if lent is not None:
+        return _SharedConnection(lent)
+    if REPLICA_DB_FILE is None:
+        return _get_db_connection()
+    try:
+        return open_connection(REPLICA_DB_FILE, read_only=True)
+    except sqlite3.Error as e:
+        print(f"Error connecting to replica: {e}")
+        return None
+
+
+def apply_batch(conn, calls):
+    """
+    Group commit: runs several write functions of this module (e.g.
+    checkout_book, checkin_book) in ONE transaction on conn, so the
+    whole batch costs a single commit / fsync.
+
+    calls is a list of (function, args) pairs. Each call runs inside
+    its own savepoint, so a failing call (an error tuple or an
+    exception) is undone on its own without aborting the others.
+
+    Returns one entry per call, in order: the function's return value,
+    or the exception it raised. If the final COMMIT fails, every call
+    gets (False, message) because nothing was saved.
+    """
+    results = []
+    committed = False
+    conn.execute("BEGIN IMMEDIATE")
+    # Borrowers touched by the batch: their cache entries are dropped
+    # again once the batch is really committed
+    _local.batch_cards = set()
+    # In-memory index updates (see _after_commit), applied only if the
+    # batch commits
+    _local.batch_effects = []
+    try:
+        for number, (function, args) in enumerate(calls):
+            savepoint = f"batch_op_{number}"
+            effects_before = len(_local.batch_effects)
+            conn.execute(f"SAVEPOINT {savepoint}")
+            try:
+                with use_connection(_SharedConnection(conn, savepoint)):
+                    results.append(function(*args))
+            except Exception as e:
+                conn.execute(f"ROLLBACK TO {savepoint}")
+                del _local.batch_effects[effects_before:]
+                results.append(e)
+            conn.execute(f"RELEASE {savepoint}")
+
+        try:
+            conn.commit()
+            committed = True
+        except sqlite3.Error as e:
+            conn.rollback()
+            message = f"An unexpected database error occurred: {e}"
+            results = [(False, message)] * len(calls)
+    finally:
+        touched, _local.batch_cards = _local.batch_cards, None
+        effects, _local.batch_effects = _local.batch_effects, None
+        for card_id in touched:
+            _invalidate_borrower(card_id)
+        if committed:
+            for effect in effects:
+                effect()
+    return results
+
+
+def _after_commit(effect):
+    """
+    Runs effect() (an in-memory index update) once the current write is
+    really committed: at once, or at the end of the apply_batch() batch.
+    """
+    effects = getattr(_local, 'batch_effects', None)
+    if effects is None:
+        effect()
+    else:
+        effects.append(effect)
+
+
+# ---------------- Borrower cache ----------------
+
+def configure_borrower_cache(maxsize=1024, ttl=30.0):
+    """
+    Replaces the per-borrower cache (maxsize borrowers, entries kept ttl
+    seconds). maxsize=0 or ttl=0 turns caching off.
+    """
+    global _borrower_cache
+    _borrower_cache = BorrowerCache(maxsize, ttl)
+
+
+def clear_borrower_cache():
+    """
+    Drops every cached borrower result; for code that writes FINES or
+    BOOK_LOANS without going through this module (e.g. fine_batch).
+    """
+    _invalidate_borrower()
+
+
+def borrower_cache_stats():
+    """Hit / miss / invalidation / eviction counters of the borrower cache."""
+    return _borrower_cache.stats()
+
+
+def _invalidate_borrower(card_id=None):
+    """Drops the cached results of one borrower (card_id None: of everyone)."""
+    if card_id is None:
+        _borrower_cache.clear()
+    else:
+        _borrower_cache.invalidate(card_id)
+    touched = getattr(_local, 'batch_cards', None)
+    if touched is not None:
+        touched.add(card_id)
+
+
+def _cache_usable():
+    # Inside apply_batch the lent connection sees uncommitted rows
+    return getattr(_local, 'batch_cards', None) is None
+
+
+def _borrower_read_connection(use_cache):
+    # Cache fills come from the primary: the write path invalidates on
+    # its commit, and a lagging replica read would then be kept for the
+    # whole TTL
+    if use_cache and REPLICA_DB_FILE is not None:
+        return _get_db_connection()
+    return _get_read_connection()
+
+
+class WriteBatcher:
+    """
+    Group-commit coordinator for bursts of circulation writes.
+
+    Threads call submit() (or the checkout_book / checkin_book
+    shortcuts) and block until their own result is ready. A single
+    writer thread collects the operations that arrive within `window`
+    seconds of the first one, or until `max_batch` are waiting, and
+    applies them with apply_batch(): one transaction, one commit, and a
+    savepoint per operation so a failing item doesn't abort the rest.
+
+        batcher = WriteBatcher(window=0.005, max_batch=32)
+        success, message = batcher.checkout_book(isbn, card_id)
+        batcher.close()
+
+    `batches` and `operations` count the commits and the operations
+    they carried.
+    """
+
+    def __init__(self, path=None, window=0.005, max_batch=32):
+        self.path = path or DB_FILE
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.operations = 0
+        # Opened here so a bad path fails in the caller, used only by the writer thread
+        self._conn = open_connection(self.path, check_same_thread=False)
+        self._queue = queue.Queue()
+        # Guards _closed so nothing is queued behind the stop marker
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True, name="write-batcher")
+        self._thread.start()
+
+    def submit(self, function, *args):
+        """
+        Queues function(*args) for the next batch and waits for its result.
+        Raises RuntimeError once the batcher is closed.
+        """
+        done = threading.Event()
+        slot = {'done': done}
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("WriteBatcher is closed.")
+            self._queue.put((function, args, slot))
+        done.wait()
+        if 'error' in slot:
+            raise slot['error']
+        return slot['result']
+
+    def checkout_book(self, isbn, card_id):
+        return self.submit(checkout_book, isbn, card_id)
+
+    def checkin_book(self, loan_id):
+        return self.submit(checkin_book, loan_id)
+
+    def close(self):
+        """Applies what is still queued, then stops the writer thread."""
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self):
+        # Blocks for the first operation, then gathers more for one window
+        first = self._queue.get()
+        if first is None:
+            return None, True
+        batch = [first]
+        window_ends = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = window_ends - time.monotonic()
+            try:
+                if remaining > 0:
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        conn = self._conn
+        try:
+            stopping = False
+            while not stopping:
+                batch, stopping = self._collect()
+                if not batch:
+                    continue
+                try:
+                    results = apply_batch(conn, [(function, args) for function, args, _ in batch])
+                except sqlite3.Error as e:
+                    # Could not even start the transaction (e.g. database locked)
+                    if conn.in_transaction:
+                        conn.rollback()
+                    results = [(False, f"An unexpected database error occurred: {e}")] * len(batch)
+
+                self.batches += 1
+                self.operations += len(batch)
+                for (_, _, slot), result in zip(batch, results):
+                    if isinstance(result, Exception):
+                        slot['error'] = result
+                    else:
+                        slot['result'] = result
+                    slot['done'].set()
+        finally:
+            conn.close()
+
+
+def configure_replica(replica_path):
+    """
+    Sends searches and other reads to a local replica file (seeded and
+    kept in sync by replica.py). Pass None to read from DB_FILE again.
+    """
+    global REPLICA_DB_FILE
+    REPLICA_DB_FILE = replica_path
+
+
+def replication_lag():
+    """Replica lag as returned by replica.replication_lag, or None without a replica."""
+    if REPLICA_DB_FILE is None:
+        return None
+    import replica
+    return replica.replication_lag(DB_FILE, REPLICA_DB_FILE)
+
+
+def _load_catalog_index():
+    """Loads the in-memory CatalogIndex once; returns it (or None on error)."""
+    global _catalog_index
+
+    if _catalog_index is not None:
+        return _catalog_index
+
+    conn = _get_read_connection()
+    if conn is None:
+        return None
+
+    try:
+        _catalog_index = CatalogIndex.load(conn)
+    except sqlite3.Error as e:
+        print(f"An error occurred while loading the catalog index: {e}")
+    finally:
+        conn.close()
+    return _catalog_index
+
+
+def enable_catalog_index():
+    """
+    Loads BOOK, AUTHORS and BOOK_AUTHORS into the in-memory CatalogIndex.
+    From then on search_books is served from memory and checkout/checkin
+    keep its availability bitmap up to date.
+
+    Returns a (success, message) tuple.
+    """
+    global _catalog_search_enabled
+
+    index = _load_catalog_index()
+    if index is None:
+        return (False, "Error: Could not load the catalog index.")
+
+    _catalog_search_enabled = True
+    size_mb = index.memory_footprint() / 1024 / 1024
+    return (True, f"Catalog index loaded: {index.count} books, {size_mb:.1f} MiB.")
+
+
+def disable_catalog_index():
+    """Drops the in-memory indexes; search_books goes back to SQL."""
+    global _catalog_index, _catalog_search_enabled, _fuzzy_index
+    _catalog_index = None
+    _catalog_search_enabled = False
+    _fuzzy_index = None
+
+
+def suggest(prefix, limit=10):
+    """
+    Returns the top `limit` completions of prefix across book titles,
+    author names (full name or surname) and ISBNs, most circulated first.
+
+    Each completion is a dictionary with:
+    - Text (the full title / author name / ISBN)
+    - Kind ("title", "author" or "isbn")
+    - Score (number of loans behind the completion)
+    """
+    global _suggest_index
+
+    if _suggest_index is None:
+        conn = _get_read_connection()
+        if conn is None:
+            return []
+        try:
+            _suggest_index = SuggestIndex.load(conn)
+        except sqlite3.Error as e:
+            print(f"An error occurred while building suggestions: {e}")
+            return []
+        finally:
+            conn.close()
+
+    return _suggest_index.suggest(prefix, limit)
+
+
 def search_books(search_term):
     """
     Searches for books by ISBN, Title, or Author.
@@ -30,12 +503,40 @@ def search_books(search_term):
     - Title
     - Authors (comma-separated string)
     - Availability ("IN" or "OUT")
+
+    When the catalog index is enabled, every word of the term must match
+    the start of a word in the Title or an author name (or the start of
+    the ISBN) instead of any substring.
+
+    Fielded queries are also supported and compiled to the narrowest SQL
+    (see query_parser): title:, author:, isbn:, available:yes|no,
+    "quoted phrases", AND / OR. For example:
+        author:lenardon available:yes
+        isbn:0195153445
+        title:"classical mythology" OR title:odyssey
     """
 
+    if query_parser.is_structured(search_term):
+        return _search_books_structured(search_term)
+
+    # A scanned / typed ISBN (10 or 13, with or without hyphens) is a
+    # primary-key lookup, never a LIKE scan; the index is searched by
+    # the same canonical ISBN-10 key (it stores ISBN-10s only)
+    isbn_key = isbn_utils.canonical(search_term)
+    use_index = _catalog_search_enabled and _catalog_index is not None
+    if isbn_key is not None and not use_index:
+        return _search_books_structured(f"isbn:{isbn_key}")
+
+    if use_index:
+        results = _catalog_index.search(isbn_key or search_term)
+        for i, row_dict in enumerate(results, 1):
+            row_dict['NO'] = f"{i:02d}"
+        return results
+
     # We add '%' wildcards to the search term for substring matching
     query_param = f"%{search_term}%"
 
-    conn = _get_db_connection()
+    conn = _get_read_connection()
     if conn is None:
         return []
 
@@ -98,16 +599,179 @@ def search_books(search_term):
     return results
 
 
+def _search_books_structured(search_term):
+    """Runs a fielded query through the cached query plans."""
+    compiled = query_parser.compile_query(search_term)
+    if compiled is None:
+        return []
+    sql_query, params = compiled
+
+    conn = _get_read_connection()
+    if conn is None:
+        return []
+
+    results = []
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql_query, params)
+        for i, row in enumerate(cursor.fetchall(), 1):
+            row_dict = dict(row)
+            row_dict['NO'] = f"{i:02d}"
+            results.append(row_dict)
+    except sqlite3.Error as e:
+        print(f"An error occurred during book search: {e}")
+    finally:
+        conn.close()
+
+    return results
+
+
+def fuzzy_search_books(search_term, limit=50, min_score=0.6):
+    """
+    Typo-tolerant search over Title and author words, e.g.
+    "mythologie" finds "Classical Mythology" and "Lenardn" finds
+    books by Robert J. Lenardon.
+
+    Returns the same dictionaries as search_books plus a 'Score'
+    (0..1, 1 = exact words), best matches first.
+    """
+    global _fuzzy_index
+
+    if _fuzzy_index is None:
+        catalog = _load_catalog_index()
+        if catalog is None:
+            return []
+        _fuzzy_index = FuzzyIndex(catalog)
+
+    results = _fuzzy_index.search(search_term, limit, min_score)
+    for i, row_dict in enumerate(results, 1):
+        row_dict['NO'] = f"{i:02d}"
+    return results
+
+
+def _load_fine_policies(cursor):
+    """Returns the cached {class: FinePolicy}, reloading it when older than POLICY_TTL."""
+    global _fine_policies, _fine_policies_loaded_at
+
+    if _fine_policies is None or time.monotonic() - _fine_policies_loaded_at > POLICY_TTL:
+        _fine_policies = FinePolicy.load_all(cursor)
+        _fine_policies_loaded_at = time.monotonic()
+    return _fine_policies
+
+
+def _borrower_policy(cursor, card_id):
+    """FinePolicy of the borrower's class (the default class when unassigned)."""
+    policies = _load_fine_policies(cursor)
+    cursor.execute("SELECT Class FROM BORROWER_CLASS WHERE Card_id = ?", (card_id,))
+    row = cursor.fetchone()
+    return policies.get(row[0] if row else DEFAULT_CLASS, policies[DEFAULT_CLASS])
+
+
+def get_fine_policies():
+    """Returns the policies as a list of FinePolicy objects (default class first)."""
+    conn = _get_read_connection()
+    if conn is None:
+        return []
+    try:
+        policies = _load_fine_policies(conn.cursor())
+    except sqlite3.Error as e:
+        print(f"Database error in get_fine_policies: {e}")
+        return []
+    finally:
+        conn.close()
+    return sorted(policies.values(), key=lambda p: (p.name != DEFAULT_CLASS, p.name))
+
+
+def set_fine_policy(name, daily_rate=0.25, grace_days=0, max_days=None, max_fine=None,
+                    loan_days=14, max_loans=3):
+    """
+    Creates or replaces the policy of a borrower class.
+    Takes effect for this process at once (other processes within POLICY_TTL).
+
+    Returns a (success, message) tuple.
+    """
+    global _fine_policies
+
+    if not name or daily_rate < 0 or grace_days < 0 or loan_days < 1 or max_loans < 0:
+        return (False, "Error: Invalid policy values.")
+
+    conn = _get_db_connection()
+    if conn is None:
+        return (False, "Error: Could not connect to the database.")
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO FINE_POLICY (Class, Daily_rate, Grace_days, Max_days, Max_fine,
+                                     Loan_days, Max_loans)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(Class) DO UPDATE SET
+                Daily_rate = excluded.Daily_rate,
+                Grace_days = excluded.Grace_days,
+                Max_days = excluded.Max_days,
+                Max_fine = excluded.Max_fine,
+                Loan_days = excluded.Loan_days,
+                Max_loans = excluded.Max_loans
+        """, (name, daily_rate, grace_days, max_days, max_fine, loan_days, max_loans))
+        conn.commit()
+        _fine_policies = None
+        _invalidate_borrower()
+        return (True, f"Policy '{name}' saved.")
+    except sqlite3.Error as e:
+        conn.rollback()
+        return (False, f"An unexpected database error occurred: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+
+def set_borrower_class(card_id, name):
+    """
+    Puts a borrower in a policy class (name None or the default class
+    removes the assignment).
+
+    Returns a (success, message) tuple.
+    """
+    conn = _get_db_connection()
+    if conn is None:
+        return (False, "Error: Could not connect to the database.")
+
+    try:
+        cursor = conn.cursor()
+        if name is None or name == DEFAULT_CLASS:
+            cursor.execute("DELETE FROM BORROWER_CLASS WHERE Card_id = ?", (card_id,))
+        else:
+            cursor.execute("""
+                INSERT INTO BORROWER_CLASS (Card_id, Class) VALUES (?, ?)
+                ON CONFLICT(Card_id) DO UPDATE SET Class = excluded.Class
+            """, (card_id, name))
+        conn.commit()
+        _invalidate_borrower(card_id)
+        return (True, f"Borrower {card_id} is now in class '{name or DEFAULT_CLASS}'.")
+    except sqlite3.Error as e:
+        conn.rollback()
+        if "FOREIGN KEY constraint failed" in str(e):
+            return (False, "Error: Unknown borrower or policy class.")
+        return (False, f"An unexpected database error occurred: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+
 def checkout_book(isbn, card_id):
     """
     Checks out a book to a borrower.
     Performs all checks required by the project spec:
     1. Book is not already checked out.
     2. Borrower does not have unpaid fines.
-    3. Borrower does not have 3 active loans.
+    3. Borrower is below the Max_loans of their policy class (3 by default).
+    The due date is Loan_days (14 by default) after today.
 
     Returns a (success, message) tuple.
     """
+    # Accept ISBN-13 / hyphenated input; BOOK is keyed by ISBN-10
+    isbn = isbn_utils.canonical(isbn) or isbn_utils.normalize(isbn)
+
     conn = _get_db_connection()
     if conn is None:
         return (False, "Error: Could not connect to the database.")
@@ -115,6 +779,11 @@ def checkout_book(isbn, card_id):
     try:
         cursor = conn.cursor()
 
+        # --- CHECK 0: Does the book exist? (primary-key probe) ---
+        cursor.execute("SELECT 1 FROM BOOK WHERE Isbn = ?", (isbn,))
+        if cursor.fetchone() is None:
+            return (False, f"Error: No book found with ISBN {isbn}.")
+
         # --- CHECK 1: Is the book already checked out? ---
         cursor.execute("""
             SELECT 1 FROM BOOK_LOANS
@@ -137,19 +806,21 @@ def checkout_book(isbn, card_id):
         if fine_result and fine_result[0] and fine_result[0] > 0:
             return (False, f"Error: Borrower has ${fine_result[0]:.2f} in unpaid fines. Cannot check out.")
 
-        # --- CHECK 3: Does the borrower have 3 active loans? ---
+        # --- CHECK 3: Has the borrower reached their class's loan limit? ---
+        policy = _borrower_policy(cursor, card_id)
         cursor.execute("""
             SELECT COUNT(*) FROM BOOK_LOANS
             WHERE Card_id = ? AND Date_in IS NULL
         """, (card_id,))
 
         loan_count = cursor.fetchone()[0]
-        if loan_count >= 3:
-            return (False, "Error: Borrower has already reached the maximum of 3 active loans.")
+        if loan_count >= policy.max_loans:
+            return (False, f"Error: Borrower has already reached the maximum of "
+                           f"{policy.max_loans} active loans.")
 
         # --- ALL CHECKS PASSED: Proceed with checkout ---
         today = datetime.date.today()
-        due_date = today + datetime.timedelta(days=14)
+        due_date = today + datetime.timedelta(days=policy.loan_days)
 
         # Note: We use .isoformat() to store dates as 'YYYY-MM-DD' strings
         cursor.execute("""
@@ -157,7 +828,18 @@ def checkout_book(isbn, card_id):
             VALUES (?, ?, ?, ?)
         """, (isbn, card_id, today.isoformat(), due_date.isoformat()))
 
+        # Keep autocomplete ranking in step with circulation
+        title_row = None
+        if _suggest_index is not None:
+            cursor.execute("SELECT Title FROM BOOK WHERE Isbn = ?", (isbn,))
+            title_row = cursor.fetchone()
+
         conn.commit()
+        _invalidate_borrower(card_id)
+        if _catalog_index is not None:
+            _after_commit(functools.partial(_catalog_index.set_available, isbn, False))
+        if title_row:
+            _after_commit(functools.partial(_suggest_index.record_checkout, isbn, title_row[0]))
         return (True, f"Checkout successful! Due date is {due_date.isoformat()}.")
 
     except sqlite3.Error as e:
@@ -172,18 +854,63 @@ def checkout_book(isbn, card_id):
             conn.close()
 
 
-def search_active_loans(search_term):
+# Expressions matching the BORROWER name / phone indexes in create_db
+_SURNAME_EXPR = "substr(BR.Bname, length(rtrim(BR.Bname, replace(BR.Bname, ' ', ''))) + 1)"
+_PHONE_DIGITS_EXPR = "replace(replace(replace(replace(BR.Phone, '(', ''), ')', ''), ' ', ''), '-', '')"
+
+
+def _borrower_match(term):
+    """
+    Builds an indexed WHERE fragment (on BORROWER BR) for a search term.
+
+    - "ID000123"         -> exact Card_id (primary key)
+    - "ID0001" / "id12"  -> Card_id prefix range
+    - digits             -> phone-number prefix (digits only)
+    - anything else      -> prefix of the first or the last word of the
+                            name, case-insensitive ("Smith" finds
+                            "Mary Ann Smith"; middle names are not searched)
+
+    Returns (sql, params).
+    """
+    upper = term.upper()
+    if upper.startswith("ID") and upper[2:].isdigit():
+        if len(upper) == 8:
+            return "BR.Card_id = ?", [upper]
+        return "(BR.Card_id >= ? AND BR.Card_id < ?)", [upper, upper + "\uffff"]
+
+    digits = _ssn_key(term)
+    if digits and len(digits) == len(term.replace("-", "").replace(" ", "")
+                                          .replace("(", "").replace(")", "")):
+        return (f"({_PHONE_DIGITS_EXPR} >= ? AND {_PHONE_DIGITS_EXPR} < ?)",
+                [digits, digits + "\uffff"])
+
+    return (f"((BR.Bname COLLATE NOCASE >= ? AND BR.Bname COLLATE NOCASE < ?)"
+            f" OR ({_SURNAME_EXPR} COLLATE NOCASE >= ? AND {_SURNAME_EXPR} COLLATE NOCASE < ?))",
+            [term, term + "\uffff", term, term + "\uffff"])
+
+
+def search_active_loans(search_term, after=None, limit=None):
     """
-    Searches for active book loans (Date_in IS NULL) by matching
-    a substring against the Book's ISBN, Borrower's Card_id,
-    or Borrower's Name.
+    Searches for active book loans (Date_in IS NULL).
+
+    The term is matched using indexes only:
+    - a valid ISBN (10/13, hyphens allowed) -> loans of that book,
+      partial ISBN digits -> ISBN prefix
+    - a Card_id ("ID000123") or Card_id prefix ("ID0001")
+    - phone digits -> borrowers whose phone starts with them
+    - otherwise the start of the borrower's first name or surname
+    An empty term lists every active loan.
+
+    Results are sorted by Due_date (then Loan_id). For paging, pass
+    limit=N and, for the next page, after=(Due_date, Loan_id) of the
+    last row already shown (keyset pagination: no OFFSET scans).
 
     Returns a list of dictionaries, where each dictionary
     contains loan and borrower details.
     """
 
-    query_param = f"%{search_term}%"
-    conn = _get_db_connection()
+    term = (search_term or "").strip()
+    conn = _get_read_connection()
     if conn is None:
         return []
 
@@ -191,9 +918,31 @@ def search_active_loans(search_term):
     try:
         cursor = conn.cursor()
 
+        conditions = ["BL.Date_in IS NULL"]
+        params = []
+
+        if term:
+            isbn_key = isbn_utils.canonical(term)
+            borrower_sql, borrower_params = _borrower_match(term)
+            card_filter = f"BL.Card_id IN (SELECT BR.Card_id FROM BORROWER BR WHERE {borrower_sql})"
+            isbn_prefix = isbn_utils.normalize(term)
+            if isbn_key is not None:
+                conditions.append(f"(BL.Isbn = ? OR {card_filter})")
+                params.append(isbn_key)
+            elif re.fullmatch(r"\d+X?", isbn_prefix):
+                # Partial ISBN (e.g. scanned digits so far): key range
+                conditions.append(f"((BL.Isbn >= ? AND BL.Isbn < ?) OR {card_filter})")
+                params.extend([isbn_prefix, isbn_prefix + "\uffff"])
+            else:
+                conditions.append(card_filter)
+            params.extend(borrower_params)
+
+        if after is not None:
+            conditions.append("(BL.Due_date, BL.Loan_id) > (?, ?)")
+            params.extend(after)
+
         # This query joins BOOK_LOANS with BORROWER and BOOK
-        # to search across all specified fields.
-        sql_query = """
+        sql_query = f"""
         SELECT
             BL.Loan_id,
             BL.Isbn,
@@ -209,19 +958,15 @@ def search_active_loans(search_term):
         JOIN
             BOOK B ON BL.Isbn = B.Isbn
         WHERE
-            -- Only find books that are still checked out
-            BL.Date_in IS NULL
-            AND (
-                BL.Isbn LIKE ?
-                OR BL.Card_id LIKE ?
-                OR BR.Bname COLLATE NOCASE LIKE ?
-            )
+            {" AND ".join(conditions)}
         ORDER BY
-            BL.Due_date;
+            BL.Due_date, BL.Loan_id
         """
+        if limit is not None:
+            sql_query += " LIMIT ?"
+            params.append(int(limit))
 
-        # Pass the param 3 times, one for each '?'
-        cursor.execute(sql_query, (query_param, query_param, query_param))
+        cursor.execute(sql_query, params)
 
         for row in cursor.fetchall():
             results.append(dict(row))
@@ -235,6 +980,55 @@ def search_active_loans(search_term):
     return results
 
 
+def search_unpaid_fines(card_id="", name=""):
+    """
+    Unpaid fine totals per borrower for FinesPage.
+
+    card_id matches exactly (or as a Card_id prefix), name matches the
+    start of the first name or surname; when both are given either
+    may match. With no filters every borrower with unpaid fines is
+    returned.
+
+    Returns a list of dictionaries with Card_id, Bname and Total.
+    """
+    conn = _get_read_connection()
+    if conn is None:
+        return []
+
+    results = []
+    try:
+        cursor = conn.cursor()
+
+        filters = []
+        params = []
+        for term in (card_id.strip(), name.strip()):
+            if term:
+                sql, term_params = _borrower_match(term)
+                filters.append(sql)
+                params.extend(term_params)
+        where = f"AND ({' OR '.join(filters)})" if filters else ""
+
+        cursor.execute(f"""
+            SELECT BR.Card_id, BR.Bname, SUM(F.Fine_amt) AS Total
+            FROM BORROWER BR
+            JOIN BOOK_LOANS BL ON BR.Card_id = BL.Card_id
+            JOIN FINES F ON BL.Loan_id = F.Loan_id
+            WHERE F.Paid = 0 {where}
+            GROUP BY BR.Card_id, BR.Bname
+            ORDER BY BR.Card_id
+        """, params)
+
+        for row in cursor.fetchall():
+            results.append(dict(row))
+
+    except sqlite3.Error as e:
+        print(f"An error occurred during fines search: {e}")
+    finally:
+        conn.close()
+
+    return results
+
+
 def checkin_book(loan_id):
     """
     Checks in a book by setting its Date_in to today.
@@ -264,7 +1058,12 @@ def checkin_book(loan_id):
             conn.rollback()
             return (False, "Error: Invalid Loan ID or book is already checked in.")
         else:
+            cursor.execute("SELECT Isbn, Card_id FROM BOOK_LOANS WHERE Loan_id = ?", (loan_id,))
+            isbn, card_id = cursor.fetchone()
             conn.commit()
+            _invalidate_borrower(card_id)
+            if _catalog_index is not None:
+                _after_commit(functools.partial(_catalog_index.set_available, isbn, True))
             return (True, f"Book (Loan ID: {loan_id}) successfully checked in.")
 
     except sqlite3.Error as e:
@@ -275,46 +1074,99 @@ def checkin_book(loan_id):
             conn.close()
 
 
-def add_borrower(bname, ssn, address, phone):
+def allocate_card_ids(count=1):
     """
-    Creates a new borrower in the system.
+    Reserves `count` consecutive Card_ids (e.g. "ID000019") from the
+    persistent ID_SEQUENCE counter and returns them as a list.
 
-    - All fields are required.
-    - SSN must be unique.
-    - A new, compatible Card_id is automatically generated.
+    The counter is read and advanced under BEGIN IMMEDIATE, so two
+    desks signing people up at the same time can never get the same
+    ID. On first use the counter is seeded from the highest existing
+    Card_id (the only time BORROWER is scanned). IDs that end up not
+    being used are simply skipped, like any database sequence.
 
-    Returns a (success, message) tuple.
+    Raises sqlite3.Error if the database is unavailable.
     """
-    # Python-side check for required fields
-    if not all([bname, ssn, address, phone]):
-        return (False, "Error: All fields (Name, SSN, Address, Phone) are required.")
+    if count < 1:
+        return []
 
-    conn = _get_db_connection()
-    if conn is None:
-        return (False, "Error: Could not connect to the database.")
+    lent = getattr(_local, 'conn', None)
+    if isinstance(lent, _SharedConnection) and lent.savepoint is not None:
+        # Inside apply_batch(): the batch already holds the write lock,
+        # so advance the counter in its transaction
+        first = _advance_card_sequence(lent.cursor(), count)
+        return [f"ID{n:06d}" for n in range(first, first + count)]
+
+    # Otherwise a private connection: the counter commits on its own, even
+    # when the caller lent us a connection with a transaction in progress
+    conn = open_connection()
 
     try:
+        # Manage the transaction ourselves so we can take the write lock up front
+        conn.isolation_level = None
         cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        first = _advance_card_sequence(cursor, count)
+        cursor.execute("COMMIT")
+        # Format as a 6-digit string with 'ID' prefix, e.g. 19 -> "ID000019"
+        return [f"ID{n:06d}" for n in range(first, first + count)]
+
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
 
-        # --- 1. Generate new Card_id ---
-        # We find the maximum numeric part of all existing Card_ids
-        # e.g., for "ID000018", we extract 18.
+def _advance_card_sequence(cursor, count):
+    """Moves the card_id counter forward by count; returns the first reserved number."""
+    cursor.execute("SELECT Next_value FROM ID_SEQUENCE WHERE Name = 'card_id'")
+    row = cursor.fetchone()
+    if row is None:
         cursor.execute("""
-            SELECT MAX(CAST(SUBSTR(Card_id, 3) AS INTEGER)) 
+            SELECT MAX(CAST(SUBSTR(Card_id, 3) AS INTEGER))
             FROM BORROWER
         """)
-
         max_id_num = cursor.fetchone()[0]
+        first = (max_id_num or 0) + 1
+        cursor.execute("""
+            INSERT INTO ID_SEQUENCE (Name, Next_value) VALUES ('card_id', ?)
+        """, (first + count,))
+    else:
+        first = row[0]
+        cursor.execute("""
+            UPDATE ID_SEQUENCE SET Next_value = ? WHERE Name = 'card_id'
+        """, (first + count,))
+    return first
 
-        if max_id_num is None:
-            # Table is empty, start at 1
-            new_id_num = 1
-        else:
-            new_id_num = max_id_num + 1
 
-        # Format the new number as a 6-digit string with 'ID' prefix
-        # e.g., 19 -> "ID000019"
-        new_card_id = f"ID{new_id_num:06d}"
+def add_borrower(bname, ssn, address, phone, card_id=None, username=None, password=None):
+    """
+    Creates a new borrower in the system.
+
+    - All fields are required.
+    - SSN must be unique.
+    - A new, compatible Card_id is automatically generated, unless the
+      caller already reserved one with allocate_card_ids.
+    - With a username and password, the borrower's login is created in
+      USERS in the same transaction (usernames must be unique).
+
+    Returns a (success, message) tuple.
+    """
+    # Python-side check for required fields
+    if not all([bname, ssn, address, phone]):
+        return (False, "Error: All fields (Name, SSN, Address, Phone) are required.")
+
+    conn = _get_db_connection()
+    if conn is None:
+        return (False, "Error: Could not connect to the database.")
+
+    try:
+        cursor = conn.cursor()
+
+        # --- 1. Reserve a new Card_id from the ID sequence ---
+        new_card_id = card_id or allocate_card_ids(1)[0]
 
         # --- 2. Insert the new borrower ---
         cursor.execute("""
@@ -322,6 +1174,13 @@ def add_borrower(bname, ssn, address, phone):
             VALUES (?, ?, ?, ?, ?)
         """, (new_card_id, ssn, bname, address, phone))
 
+        # --- 3. Optional login ---
+        if username:
+            cursor.execute("""
+                INSERT INTO USERS (username, password, card_id, is_librarian)
+                VALUES (?, ?, ?, 0)
+            """, (username, password, new_card_id))
+
         conn.commit()
         return (True, f"Successfully created new borrower: {bname} (Card ID: {new_card_id})")
 
@@ -330,6 +1189,8 @@ def add_borrower(bname, ssn, address, phone):
         conn.rollback()
         if "UNIQUE constraint failed: BORROWER.Ssn" in str(e):
             return (False, "Error: An account with this SSN already exists.")
+        elif "UNIQUE constraint failed: USERS.username" in str(e):
+            return (False, "Error: Username is already taken.")
         else:
             return (False, f"An unexpected database error occurred: {e}")
     except sqlite3.Error as e:
@@ -340,44 +1201,213 @@ def add_borrower(bname, ssn, address, phone):
             conn.close()
 
 
-def update_all_fines():
+def authenticate_user(username, password):
     """
-    Updates all fines in the FINES table.
-    ... (docstring is the same) ...
+    Checks a login against USERS.
+
+    Returns a dictionary with 'success' and 'message', plus 'username',
+    'card_id' and 'is_librarian' when the login is valid.
     """
+    # USERS is not replicated: always the primary
     conn = _get_db_connection()
     if conn is None:
-        return (False, "Error: Could not connect to the database.")
+        return {'success': False, 'message': "Error: Could not connect to the database."}
 
     try:
         cursor = conn.cursor()
+        cursor.execute("""
+            SELECT username, password, card_id, is_librarian
+            FROM USERS
+            WHERE username = ?
+        """, (username,))
+        row = cursor.fetchone()
+    except sqlite3.Error as e:
+        return {'success': False, 'message': f"An unexpected database error occurred: {e}"}
+    finally:
+        conn.close()
 
-        # *** THE FIX IS HERE ***
-        # We now use date('now') instead of 'now' to ignore
-        # the time of day and get clean day-by-day math.
-        sql_upsert = """
-        INSERT INTO FINES (Loan_id, Fine_amt, Paid)
-        SELECT
-            Loan_id,
-            CAST(
-                MAX(0, JULIANDAY(COALESCE(Date_in, date('now'))) - JULIANDAY(Due_date)) * 0.25
-            AS NUMERIC(10, 2)) AS Calculated_Fine,
-            0 AS Paid
-        FROM
-            BOOK_LOANS
-        WHERE
-            -- Also use date('now') here
-            JULIANDAY(COALESCE(Date_in, date('now'))) > JULIANDAY(Due_date)
+    if row is None or row['password'] != password:
+        return {'success': False, 'message': "Incorrect username or password."}
+    return {'success': True, 'message': "Success", 'username': row['username'],
+            'card_id': row['card_id'], 'is_librarian': bool(row['is_librarian'])}
+
+
+def _ssn_key(ssn):
+    """SSNs arrive as '850-47-3740' (CSV) or '850473740' (GUI); compare digits only."""
+    return "".join(ch for ch in str(ssn) if ch.isdigit())
+
+
+def _borrower_fields(row):
+    """Returns (bname, ssn, address, phone) from a dict or a sequence row."""
+    if isinstance(row, dict):
+        lowered = {str(k).strip().lower(): v for k, v in row.items() if k is not None}
+        fields = (lowered.get('bname', lowered.get('name')), lowered.get('ssn'),
+                  lowered.get('address'), lowered.get('phone'))
+    else:
+        fields = tuple(row[:4]) if len(row) >= 4 else tuple(row) + (None,) * (4 - len(row))
+    return tuple(str(value).strip() if value is not None else "" for value in fields)
+
+
+def add_borrowers(rows, chunk_size=500):
+    """
+    Bulk version of add_borrower for large patron feeds.
+
+    `rows` can be:
+    - an iterable of dicts with Bname (or Name), Ssn, Address, Phone
+    - an iterable of (bname, ssn, address, phone) sequences
+    - an open CSV file / text stream with those column headers
+
+    SSNs are de-duplicated against BORROWER and within the batch using
+    an in-memory set, Card_ids are reserved in one block per chunk and
+    each chunk is inserted (BORROWER + matching USERS login, like
+    load_data) in a single transaction.
+
+    Returns a list with one report dictionary per input row:
+    - Row (1-based position in the input)
+    - Status ("created", "duplicate", "invalid" or "error")
+    - Card_id (only for created rows)
+    - Message
+    """
+    if hasattr(rows, 'read'):
+        rows = csv.DictReader(rows)
+
+    conn = _get_db_connection()
+    if conn is None:
+        return [{'Row': 0, 'Status': 'error', 'Card_id': None,
+                 'Message': "Error: Could not connect to the database."}]
+
+    report = []
+    try:
+        cursor = conn.cursor()
+
+        # One pass over BORROWER instead of one UNIQUE check per row
+        cursor.execute("SELECT Ssn FROM BORROWER")
+        seen_ssns = {_ssn_key(row[0]) for row in cursor}
+
+        pending = []
+        for row_no, row in enumerate(rows, 1):
+            bname, ssn, address, phone = _borrower_fields(row)
+            if not all([bname, ssn, address, phone]):
+                report.append({'Row': row_no, 'Status': 'invalid', 'Card_id': None,
+                               'Message': "Error: All fields (Name, SSN, Address, Phone) are required."})
+                continue
+
+            key = _ssn_key(ssn)
+            if key in seen_ssns:
+                report.append({'Row': row_no, 'Status': 'duplicate', 'Card_id': None,
+                               'Message': "Error: An account with this SSN already exists."})
+                continue
+            seen_ssns.add(key)
+
+            pending.append((row_no, bname, ssn, address, phone))
+            if len(pending) >= chunk_size:
+                report.extend(_insert_borrower_chunk(conn, pending))
+                pending = []
+
+        if pending:
+            report.extend(_insert_borrower_chunk(conn, pending))
+
+    except sqlite3.Error as e:
+        conn.rollback()
+        report.append({'Row': 0, 'Status': 'error', 'Card_id': None,
+                       'Message': f"An unexpected database error occurred: {e}"})
+    finally:
+        conn.close()
+
+    report.sort(key=lambda item: item['Row'])
+    return report
+
+
+def _insert_borrower_chunk(conn, pending):
+    """Inserts one chunk of validated borrowers in a single transaction."""
+    card_ids = allocate_card_ids(len(pending))
+    borrowers = []
+    users = []
+    for card_id, (row_no, bname, ssn, address, phone) in zip(card_ids, pending):
+        borrowers.append((card_id, ssn, bname, address, phone))
+        # Same login convention as load_data: username = Card_id, password = Ssn
+        users.append((card_id, ssn, card_id))
+
+    cursor = conn.cursor()
+    try:
+        cursor.executemany("""
+            INSERT INTO BORROWER (Card_id, Ssn, Bname, Address, Phone)
+            VALUES (?, ?, ?, ?, ?)
+        """, borrowers)
+        cursor.executemany("""
+            INSERT INTO USERS (username, password, card_id, is_librarian)
+            VALUES (?, ?, ?, 0)
+        """, users)
+        conn.commit()
+    except sqlite3.Error:
+        # Something in the chunk clashed: redo it row by row so only
+        # the offending rows are reported as errors
+        conn.rollback()
+        return _insert_borrowers_one_by_one(conn, pending, card_ids)
+
+    return [{'Row': row_no, 'Status': 'created', 'Card_id': card_id,
+             'Message': f"Successfully created new borrower: {bname} (Card ID: {card_id})"}
+            for card_id, (row_no, bname, _, _, _) in zip(card_ids, pending)]
+
+
+def _insert_borrowers_one_by_one(conn, pending, card_ids):
+    results = []
+    cursor = conn.cursor()
+    for card_id, (row_no, bname, ssn, address, phone) in zip(card_ids, pending):
+        try:
+            cursor.execute("""
+                INSERT INTO BORROWER (Card_id, Ssn, Bname, Address, Phone)
+                VALUES (?, ?, ?, ?, ?)
+            """, (card_id, ssn, bname, address, phone))
+            cursor.execute("""
+                INSERT INTO USERS (username, password, card_id, is_librarian)
+                VALUES (?, ?, ?, 0)
+            """, (card_id, ssn, card_id))
+            conn.commit()
+            results.append({'Row': row_no, 'Status': 'created', 'Card_id': card_id,
+                            'Message': f"Successfully created new borrower: {bname} (Card ID: {card_id})"})
+        except sqlite3.Error as e:
+            conn.rollback()
+            results.append({'Row': row_no, 'Status': 'error', 'Card_id': None,
+                            'Message': f"An unexpected database error occurred: {e}"})
+    return results
 
-        ON CONFLICT(Loan_id) DO UPDATE SET
-            Fine_amt = excluded.Fine_amt
-        WHERE
-            FINES.Paid = 0;
-        """
 
-        cursor.execute(sql_upsert)
-        updated_count = cursor.rowcount
+def _refresh_fines(cursor, since=None):
+    """
+    Runs every class's compiled fine upsert and clear (only loans out or
+    returned since `since` when given) and returns the rows changed.
+    """
+    changed = 0
+    for policy in _load_fine_policies(cursor).values():
+        if since is None:
+            statements, params = (policy.fine_upsert_sql, policy.fine_clear_sql), (policy.name,)
+        else:
+            statements = (policy.accrual_upsert_sql, policy.accrual_clear_sql)
+            params = (policy.name, since)
+        for statement in statements:
+            cursor.execute(statement, params)
+            changed += cursor.rowcount
+    return changed
+
+
+def update_all_fines():
+    """
+    Updates all fines in the FINES table.
+    Every overdue loan is fined by the policy of its borrower's class
+    (one compiled upsert per class, see fine_policy.py); unpaid fines the
+    policy no longer charges are removed, paid fines are left alone.
+    """
+    conn = _get_db_connection()
+    if conn is None:
+        return (False, "Error: Could not connect to the database.")
+
+    try:
+        cursor = conn.cursor()
+        updated_count = _refresh_fines(cursor)
         conn.commit()
+        if updated_count:
+            _invalidate_borrower()
 
         return (True, f"Successfully updated/processed {updated_count} fine records.")
 
@@ -389,12 +1419,119 @@ def update_all_fines():
             conn.close()
 
 
+# Accrual runs kept in FINE_ACCRUAL_LOG
+ACCRUAL_LOG_KEEP = 1000
+
+
+def accrue_fines(full=False):
+    """
+    Incremental fine accrual (what fine_scheduler runs in the background):
+    refreshes the fines of loans still out and of loans returned since
+    the day of the last run, by the same class policies as
+    update_all_fines. The first run, full=True, or the first run after
+    a FINE_POLICY / BORROWER_CLASS change (made by any process: the
+    FINE_ACCRUAL_STATE triggers record it) covers every loan, with the
+    policies re-read.
+
+    Each run is recorded in FINE_ACCRUAL_LOG (see get_accrual_status).
+    Returns a dictionary with 'success', 'message', 'changed', 'seconds'
+    and 'since' (None for a full run).
+    """
+    global _fine_policies
+
+    started_at = datetime.datetime.now().isoformat(sep=" ", timespec="seconds")
+    started = time.perf_counter()
+    conn = _get_db_connection()
+    if conn is None:
+        return {'success': False, 'message': "Error: Could not connect to the database.",
+                'changed': 0, 'seconds': 0.0, 'since': None}
+
+    since = None
+    try:
+        cursor = conn.cursor()
+        # Holds the write lock from here, so a policy change can't slip
+        # in between reading and clearing Full_due
+        if not conn.in_transaction:
+            cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("SELECT Full_due FROM FINE_ACCRUAL_STATE WHERE Id = 1")
+        row = cursor.fetchone()
+        if row and row[0]:
+            # Changed elsewhere: this process may hold a stale policy cache
+            full = True
+            _fine_policies = None
+        if full:
+            cursor.execute("UPDATE FINE_ACCRUAL_STATE SET Full_due = 0 WHERE Id = 1")
+        else:
+            cursor.execute("SELECT MAX(Started_at) FROM FINE_ACCRUAL_LOG")
+            last_run = cursor.fetchone()[0]
+            since = last_run[:10] if last_run else None
+
+        changed = _refresh_fines(cursor, since)
+
+        seconds = time.perf_counter() - started
+        cursor.execute("""
+            INSERT INTO FINE_ACCRUAL_LOG (Started_at, Seconds, Rows_changed, Since)
+            VALUES (?, ?, ?, ?)
+        """, (started_at, seconds, changed, since))
+        cursor.execute("DELETE FROM FINE_ACCRUAL_LOG WHERE Run_id <= ?",
+                       (cursor.lastrowid - ACCRUAL_LOG_KEEP,))
+        conn.commit()
+        if changed:
+            _invalidate_borrower()
+    except sqlite3.Error as e:
+        conn.rollback()
+        return {'success': False, 'message': f"An unexpected database error occurred: {e}",
+                'changed': 0, 'seconds': time.perf_counter() - started, 'since': since}
+    finally:
+        if conn:
+            conn.close()
+
+    scope = f"loans out or returned since {since}" if since else "all loans"
+    return {'success': True, 'changed': changed, 'seconds': seconds, 'since': since,
+            'message': f"Accrued fines for {scope}: {changed} changed in {seconds:.2f}s."}
+
+
+def get_accrual_status():
+    """
+    Returns the latest FINE_ACCRUAL_LOG row as a dictionary
+    (Started_at, Seconds, Rows_changed, Since), or None before the first run.
+    """
+    # FINE_ACCRUAL_LOG is not replicated: always ask the primary
+    conn = _get_db_connection()
+    if conn is None:
+        return None
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT Started_at, Seconds, Rows_changed, Since
+            FROM FINE_ACCRUAL_LOG
+            ORDER BY Run_id DESC
+            LIMIT 1
+        """)
+        row = cursor.fetchone()
+        return dict(row) if row else None
+    except sqlite3.Error as e:
+        print(f"Database error in get_accrual_status: {e}")
+        return None
+    finally:
+        conn.close()
+
+
 def get_borrower_fines(card_id, include_paid=False):
     """
-    Gets fine details for a borrower.
+    Gets fine details for a borrower (served from the borrower cache
+    when possible).
     Returns a dictionary with 'total' and 'details' (a list).
     """
-    conn = _get_db_connection()
+    key = ('fines', bool(include_paid))
+    use_cache = _cache_usable()
+    if use_cache:
+        cached = _borrower_cache.get(card_id, key)
+        if cached is not None:
+            return copy.deepcopy(cached)
+    epoch = _borrower_cache.epoch
+
+    conn = _borrower_read_connection(use_cache)
     if conn is None:
         return {'total': 0.0, 'details': [], 'message': "DB Connection Error"}
 
@@ -403,21 +1540,33 @@ def get_borrower_fines(card_id, include_paid=False):
     try:
         cursor = conn.cursor()
 
-        sql_filter = " AND F.Paid = 0" if not include_paid else ""
-
-        # Query to get line-item details
-        cursor.execute(f"""
-            SELECT
-                BL.Loan_id,
-                B.Title,
-                F.Fine_amt,
-                F.Paid,
-                (BL.Date_in IS NULL) AS Is_Still_Out
-            FROM FINES F
-            JOIN BOOK_LOANS BL ON F.Loan_id = BL.Loan_id
-            JOIN BOOK B ON BL.Isbn = B.Isbn
-            WHERE BL.Card_id = ? {sql_filter}
-        """, (card_id,))
+        if include_paid:
+            # Paid fines may already be archived: read both stores
+            cursor.execute("""
+                SELECT
+                    AL.Loan_id,
+                    B.Title,
+                    AL.Fine_amt,
+                    AL.Fine_paid AS Paid,
+                    (AL.Date_in IS NULL) AS Is_Still_Out
+                FROM ALL_LOANS AL
+                JOIN BOOK B ON AL.Isbn = B.Isbn
+                WHERE AL.Card_id = ? AND AL.Fine_amt IS NOT NULL
+            """, (card_id,))
+        else:
+            # Query to get line-item details
+            cursor.execute("""
+                SELECT
+                    BL.Loan_id,
+                    B.Title,
+                    F.Fine_amt,
+                    F.Paid,
+                    (BL.Date_in IS NULL) AS Is_Still_Out
+                FROM FINES F
+                JOIN BOOK_LOANS BL ON F.Loan_id = BL.Loan_id
+                JOIN BOOK B ON BL.Isbn = B.Isbn
+                WHERE BL.Card_id = ? AND F.Paid = 0
+            """, (card_id,))
 
         for row in cursor.fetchall():
             query_details.append(dict(row))
@@ -432,7 +1581,101 @@ def get_borrower_fines(card_id, include_paid=False):
         if conn:
             conn.close()
 
-    return {'total': query_total, 'details': query_details, 'message': 'Success'}
+    result = {'total': query_total, 'details': query_details, 'message': 'Success'}
+    if use_cache:
+        _borrower_cache.put(card_id, key, copy.deepcopy(result), epoch)
+    return result
+
+
+def get_borrower_loans(card_id):
+    """
+    Active loans of one borrower, soonest due first (served from the
+    borrower cache when possible).
+    Returns a list of dictionaries (Loan_id, Isbn, Title, Date_out,
+    Due_date, Is_overdue).
+    """
+    use_cache = _cache_usable()
+    if use_cache:
+        cached = _borrower_cache.get(card_id, 'loans')
+        if cached is not None:
+            return copy.deepcopy(cached)
+    epoch = _borrower_cache.epoch
+
+    conn = _borrower_read_connection(use_cache)
+    if conn is None:
+        return []
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT BL.Loan_id, BL.Isbn, B.Title, BL.Date_out, BL.Due_date,
+                   (BL.Due_date < date('now')) AS Is_overdue
+            FROM BOOK_LOANS BL
+            JOIN BOOK B ON B.Isbn = BL.Isbn
+            WHERE BL.Card_id = ? AND BL.Date_in IS NULL
+            ORDER BY BL.Due_date, BL.Loan_id
+        """, (card_id,))
+        loans = [dict(row) for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        print(f"Database error in get_borrower_loans: {e}")
+        return []
+    finally:
+        conn.close()
+
+    if use_cache:
+        _borrower_cache.put(card_id, 'loans', copy.deepcopy(loans), epoch)
+    return loans
+
+
+def get_checkout_eligibility(card_id):
+    """
+    Whether a borrower may check out another book right now, by the
+    same rules as checkout_book (served from the borrower cache when
+    possible; checkout_book itself always checks the database).
+
+    Returns a dictionary with 'eligible', 'reason', 'active_loans',
+    'max_loans' and 'unpaid_fines'.
+    """
+    use_cache = _cache_usable()
+    if use_cache:
+        cached = _borrower_cache.get(card_id, 'eligibility')
+        if cached is not None:
+            return dict(cached)
+    epoch = _borrower_cache.epoch
+
+    conn = _borrower_read_connection(use_cache)
+    if conn is None:
+        return {'eligible': False, 'reason': "Error: Could not connect to the database.",
+                'active_loans': 0, 'max_loans': 0, 'unpaid_fines': 0.0}
+
+    try:
+        cursor = conn.cursor()
+        policy = _borrower_policy(cursor, card_id)
+        cursor.execute("""
+            SELECT COUNT(*) FROM BOOK_LOANS
+            WHERE Card_id = ? AND Date_in IS NULL
+        """, (card_id,))
+        active_loans = cursor.fetchone()[0]
+        # Unpaid total straight from the BORROWER_FINES rollup
+        cursor.execute("SELECT Unpaid_amt FROM BORROWER_FINES WHERE Card_id = ?", (card_id,))
+        row = cursor.fetchone()
+        unpaid = float(row[0]) if row and row[0] else 0.0
+    except sqlite3.Error as e:
+        return {'eligible': False, 'reason': f"An unexpected database error occurred: {e}",
+                'active_loans': 0, 'max_loans': 0, 'unpaid_fines': 0.0}
+    finally:
+        conn.close()
+
+    reason = None
+    if unpaid > 0.005:
+        reason = f"Borrower has ${unpaid:.2f} in unpaid fines."
+    elif active_loans >= policy.max_loans:
+        reason = f"Borrower has already reached the maximum of {policy.max_loans} active loans."
+    result = {'eligible': reason is None, 'reason': reason, 'active_loans': active_loans,
+              'max_loans': policy.max_loans, 'unpaid_fines': round(unpaid, 2)}
+    if use_cache:
+        _borrower_cache.put(card_id, 'eligibility', dict(result), epoch)
+    return result
 
 
 def pay_borrower_fines(card_id):
@@ -477,6 +1720,7 @@ def pay_borrower_fines(card_id):
 
         paid_count = cursor.rowcount
         conn.commit()
+        _invalidate_borrower(card_id)
 
         if paid_count == 0:
             return (False, "No unpaid fines found for this borrower.")
@@ -490,9 +1734,336 @@ def pay_borrower_fines(card_id):
         if conn:
             conn.close()
 
+def archive_closed_loans(min_age_days=365, batch_size=500, pause=0.05, max_batches=None):
+    """
+    Moves returned loans older than `min_age_days` (by Date_in), with
+    their fines, from BOOK_LOANS / FINES into LOAN_HISTORY, so the hot
+    tables only hold active circulation plus recent returns.
+
+    Loans with an unpaid fine are never archived. A late return that was
+    never fined (accrual had not reached it yet) gets its fine by its
+    class policy instead, and stays. Work is done in batches of
+    `batch_size` loans, each in its own short transaction, sleeping
+    `pause` seconds between batches so checkouts at the desk never wait
+    long for the write lock. The ALL_LOANS view reads both stores for
+    history queries.
+
+    Returns a (success, message) tuple.
+    """
+    conn = _get_db_connection()
+    if conn is None:
+        return (False, "Error: Could not connect to the database.")
+
+    cutoff = (datetime.date.today() - datetime.timedelta(days=min_age_days)).isoformat()
+    today = datetime.date.today().isoformat()
+    archived = 0
+    fined = 0
+    batches = 0
+    try:
+        cursor = conn.cursor()
+        while max_batches is None or batches < max_batches:
+            cursor.execute("BEGIN IMMEDIATE")
+            policies = _load_fine_policies(cursor)
+            cursor.execute("""
+                SELECT BL.Loan_id, BL.Card_id, F.Loan_id IS NULL AS Unfined,
+                       julianday(BL.Date_in) - julianday(BL.Due_date) AS Late_days,
+                       COALESCE(BC.Class, ?) AS Class
+                FROM BOOK_LOANS BL
+                LEFT JOIN FINES F ON F.Loan_id = BL.Loan_id
+                LEFT JOIN BORROWER_CLASS BC ON BC.Card_id = BL.Card_id
+                WHERE BL.Date_in IS NOT NULL
+                  AND BL.Date_in < ?
+                  AND (F.Loan_id IS NULL OR F.Paid = 1)
+                ORDER BY BL.Loan_id
+                LIMIT ?
+            """, (DEFAULT_CLASS, cutoff, batch_size))
+            candidates = cursor.fetchall()
+            if not candidates:
+                conn.commit()
+                break
+
+            # Late returns without a FINES row are fined now, not archived
+            loan_ids, new_fines, fined_cards = [], [], set()
+            for loan_id, card_id, unfined, late_days, name in candidates:
+                policy = policies.get(name, policies[DEFAULT_CLASS])
+                fine = policy.fine_for(late_days) if unfined and late_days > 0 else 0.0
+                if fine > 0:
+                    new_fines.append((loan_id, fine))
+                    fined_cards.add(card_id)
+                else:
+                    loan_ids.append(loan_id)
+            cursor.executemany("INSERT INTO FINES (Loan_id, Fine_amt, Paid) VALUES (?, ?, 0)",
+                               new_fines)
+
+            if loan_ids:
+                marks = ", ".join("?" * len(loan_ids))
+                cursor.execute(f"""
+                    INSERT INTO LOAN_HISTORY
+                        (Loan_id, Isbn, Card_id, Date_out, Due_date, Date_in,
+                         Fine_amt, Fine_paid, Archived_on)
+                    SELECT BL.Loan_id, BL.Isbn, BL.Card_id, BL.Date_out, BL.Due_date, BL.Date_in,
+                           F.Fine_amt, F.Paid, ?
+                    FROM BOOK_LOANS BL
+                    LEFT JOIN FINES F ON F.Loan_id = BL.Loan_id
+                    WHERE BL.Loan_id IN ({marks})
+                """, [today] + loan_ids)
+                cursor.execute(f"DELETE FROM FINES WHERE Loan_id IN ({marks})", loan_ids)
+                cursor.execute(f"DELETE FROM BOOK_LOANS WHERE Loan_id IN ({marks})", loan_ids)
+            conn.commit()
+            for card_id in fined_cards:
+                _invalidate_borrower(card_id)
+
+            archived += len(loan_ids)
+            fined += len(new_fines)
+            batches += 1
+            if len(candidates) < batch_size:
+                break
+            time.sleep(pause)
+
+        message = f"Archived {archived} returned loan(s) in {batches} batch(es)."
+        if fined:
+            message += f" {fined} late return(s) were fined and kept."
+        return (True, message)
+
+    except sqlite3.Error as e:
+        conn.rollback()
+        return (False, f"Archived {archived} loan(s) before an error occurred: {e}")
+    finally:
+        conn.close()
+
+def _copy_database(source, dest_path, pages_per_step, sleep, progress):
+    """
+    Copies an open source connection into dest_path with the online
+    backup API, then runs PRAGMA integrity_check on the copy.
+
+    The copy is written to "<dest_path>.partial" and only renamed into
+    place once it is complete and verified. Returns a stats dictionary.
+    """
+    partial_path = dest_path + ".partial"
+    if os.path.exists(partial_path):
+        os.remove(partial_path)
+
+    started = time.perf_counter()
+    target = sqlite3.connect(partial_path)
+    try:
+        def report(status, remaining, total):
+            if progress is not None:
+                progress(total - remaining, total)
+
+        # pages_per_step pages are copied per step and the source is
+        # unlocked for `sleep` seconds in between, so writers at the
+        # desk keep going while the copy runs
+        source.backup(target, pages=pages_per_step, progress=report, sleep=sleep)
+        seconds = time.perf_counter() - started
+
+        integrity = target.execute("PRAGMA integrity_check").fetchone()[0]
+    finally:
+        target.close()
+
+    if integrity != "ok":
+        os.remove(partial_path)
+        return {'success': False, 'path': dest_path, 'bytes': 0, 'seconds': seconds,
+                'mb_per_sec': 0.0, 'message': f"Error: Copy failed integrity check: {integrity}"}
+
+    os.replace(partial_path, dest_path)
+    size = os.path.getsize(dest_path)
+    mb_per_sec = size / 1024 / 1024 / seconds if seconds > 0 else 0.0
+    return {'success': True, 'path': dest_path, 'bytes': size, 'seconds': seconds,
+            'mb_per_sec': mb_per_sec,
+            'message': f"Copied {size / 1024 / 1024:.1f} MB to {dest_path} in {seconds:.2f}s "
+                       f"({mb_per_sec:.1f} MB/s), integrity ok."}
+
+
+def backup_database(dest_path, pages_per_step=256, sleep=0.05, progress=None):
+    """
+    Makes a consistent online backup of the live database using
+    sqlite3's Connection.backup (safe while the app is running, unlike
+    copying library.db).
+
+    - pages_per_step: pages copied per step (-1 copies everything at once)
+    - sleep: seconds the source stays unlocked between steps
+    - progress: optional callback(pages_done, pages_total)
+
+    The copy is verified with PRAGMA integrity_check before it replaces
+    dest_path. Returns a dictionary with 'success', 'message', 'path',
+    'bytes', 'seconds' and 'mb_per_sec'.
+    """
+    conn = _get_db_connection()
+    if conn is None:
+        return {'success': False, 'path': dest_path, 'bytes': 0, 'seconds': 0.0,
+                'mb_per_sec': 0.0, 'message': "Error: Could not connect to the database."}
+    try:
+        return _copy_database(conn, dest_path, pages_per_step, sleep, progress)
+    except sqlite3.Error as e:
+        return {'success': False, 'path': dest_path, 'bytes': 0, 'seconds': 0.0,
+                'mb_per_sec': 0.0, 'message': f"An unexpected database error occurred: {e}"}
+    finally:
+        conn.close()
+
+
+def rotate_backups(directory, keep=7, pattern="library-*.db"):
+    """Deletes all but the `keep` newest backups in directory. Returns the removed paths."""
+    backups = sorted(glob.glob(os.path.join(directory, pattern)), key=os.path.getmtime)
+    removed = backups[:-keep] if keep > 0 else backups
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+def restore_database(backup_path, dest_path, pages_per_step=256, sleep=0.0, progress=None,
+                     overwrite=False):
+    """
+    Restores a backup into dest_path (a fresh file unless overwrite=True).
+    The backup is integrity-checked first, the restored copy again after.
+
+    Returns the same dictionary as backup_database.
+    """
+    failed = {'success': False, 'path': dest_path, 'bytes': 0, 'seconds': 0.0, 'mb_per_sec': 0.0}
+    if not os.path.exists(backup_path):
+        return dict(failed, message=f"Error: Backup file '{backup_path}' not found.")
+    if os.path.exists(dest_path) and not overwrite:
+        return dict(failed, message=f"Error: '{dest_path}' already exists.")
+
+    source = sqlite3.connect(f"file:{backup_path}?mode=ro", uri=True)
+    try:
+        integrity = source.execute("PRAGMA integrity_check").fetchone()[0]
+        if integrity != "ok":
+            return dict(failed, message=f"Error: Backup failed integrity check: {integrity}")
+        result = _copy_database(source, dest_path, pages_per_step, sleep, progress)
+        if result['success']:
+            _invalidate_borrower()
+        return result
+    except sqlite3.Error as e:
+        return dict(failed, message=f"An unexpected database error occurred: {e}")
+    finally:
+        source.close()
+
+def read_changes(after_seq=0, limit=500):
+    """
+    Returns up to `limit` CHANGE_LOG entries with Seq > after_seq, oldest
+    first. Each entry is a dictionary with Seq, Table_name, Op, Row_key,
+    Payload (the new row as a dict, None for deletes) and Changed_at.
+
+    Entries are written by triggers in the same transaction as the
+    change (checkouts, check-ins, new borrowers, fines, payments,
+    archiving), so a reader never sees a change that was rolled back.
+    """
+    conn = _get_db_connection()
+    if conn is None:
+        return []
+
+    changes = []
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT Seq, Table_name, Op, Row_key, Payload, Changed_at
+            FROM CHANGE_LOG
+            WHERE Seq > ?
+            ORDER BY Seq
+            LIMIT ?
+        """, (after_seq, limit))
+        for row in cursor.fetchall():
+            change = dict(row)
+            change['Payload'] = json.loads(change['Payload']) if change['Payload'] else None
+            changes.append(change)
+    except sqlite3.Error as e:
+        print(f"An error occurred while reading the change log: {e}")
+    finally:
+        conn.close()
+
+    return changes
+
+
+def get_consumer_position(name):
+    """
+    Last Seq processed by the named consumer (0 if it never committed
+    one), or None when it could not be read (e.g. database locked).
+    """
+    conn = _get_db_connection()
+    if conn is None:
+        return None
+    try:
+        row = conn.execute("SELECT Last_seq FROM CHANGE_LOG_CONSUMERS WHERE Name = ?",
+                           (name,)).fetchone()
+        return row[0] if row else 0
+    except sqlite3.Error as e:
+        print(f"An error occurred while reading the consumer position: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def save_consumer_position(name, seq):
+    """Records that the named consumer has processed everything up to seq."""
+    conn = _get_db_connection()
+    if conn is None:
+        return (False, "Error: Could not connect to the database.")
+    try:
+        conn.execute("""
+            INSERT INTO CHANGE_LOG_CONSUMERS (Name, Last_seq) VALUES (?, ?)
+            ON CONFLICT(Name) DO UPDATE SET Last_seq = MAX(Last_seq, excluded.Last_seq)
+        """, (name, seq))
+        conn.commit()
+        return (True, f"Consumer '{name}' is at sequence {seq}.")
+    except sqlite3.Error as e:
+        conn.rollback()
+        return (False, f"An unexpected database error occurred: {e}")
+    finally:
+        conn.close()
+
+
+def poll_changes(consumer, limit=500):
+    """
+    Reads the next batch of changes for a named consumer without
+    moving its position; call save_consumer_position(consumer, last Seq)
+    once the batch has been processed. Returns [] when the position
+    cannot be read, rather than replaying the log from the start.
+    """
+    position = get_consumer_position(consumer)
+    if position is None:
+        return []
+    return read_changes(position, limit)
+
+
+def compact_change_log(upto_seq=None):
+    """
+    Log compaction: removes entries (up to upto_seq, default: all) that
+    a later entry for the same table row supersedes. Replaying the
+    compacted log still yields the latest state of every row.
+
+    Returns a (success, message) tuple.
+    """
+    conn = _get_db_connection()
+    if conn is None:
+        return (False, "Error: Could not connect to the database.")
+    try:
+        cursor = conn.cursor()
+        if upto_seq is None:
+            upto_seq = cursor.execute("SELECT COALESCE(MAX(Seq), 0) FROM CHANGE_LOG").fetchone()[0]
+        cursor.execute("""
+            DELETE FROM CHANGE_LOG
+            WHERE Seq <= ?
+              AND EXISTS (
+                  SELECT 1 FROM CHANGE_LOG Later
+                  WHERE Later.Table_name = CHANGE_LOG.Table_name
+                    AND Later.Row_key = CHANGE_LOG.Row_key
+                    AND Later.Seq > CHANGE_LOG.Seq
+              )
+        """, (upto_seq,))
+        removed = cursor.rowcount
+        conn.commit()
+        return (True, f"Compacted change log: removed {removed} superseded entries.")
+    except sqlite3.Error as e:
+        conn.rollback()
+        return (False, f"An unexpected database error occurred: {e}")
+    finally:
+        conn.close()
+
 #Simply returns current borrower if there is one
 def get_borrower_for_book(isbn):
-    conn = _get_db_connection()
+    isbn = isbn_utils.canonical(isbn) or isbn_utils.normalize(isbn, restore_zeros=True)
+
+    conn = _get_read_connection()
     if conn is None:
         return None
 
@@ -517,7 +2088,7 @@ def get_borrower_for_book(isbn):
 
 #Added this function to be able to see what books are checked out in checkout/in page
 def getBooksCheckedOut(search=""):
-    conn = _get_db_connection()
+    conn = _get_read_connection()
     if conn is None:
         return []
 
@@ -544,7 +2115,7 @@ def getBooksCheckedOut(search=""):
         for row in rows:
             results.append({
                 "Loan_id": row[0],
-                "Isbn": str(row[1]).zfill(10),  #Preserve leading zeroes
+                "Isbn": isbn_utils.normalize(row[1], restore_zeros=True),  #Preserve leading zeroes
                 "Title": row[2],
                 "Card_id": row[3],
                 "Due_date": row[4]
@@ -559,6 +2130,151 @@ def getBooksCheckedOut(search=""):
         if conn:
             conn.close()
 
+# Rows fetched per round trip by the export generators
+EXPORT_BATCH_ROWS = 1000
+
+
+def _stream_rows(sql, params, batch_size):
+    """
+    Yields the rows of a query as dictionaries, fetching batch_size rows
+    at a time, so exports use the same memory whatever their size.
+    """
+    conn = _get_read_connection()
+    if conn is None:
+        raise sqlite3.OperationalError("Could not connect to the database.")
+    try:
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(row)
+    finally:
+        conn.close()
+
+
+def _date_filter(column, date_from, date_to, params):
+    """SQL for an inclusive 'YYYY-MM-DD' range on column (either end optional)."""
+    clauses = []
+    if date_from:
+        clauses.append(f"{column} >= ?")
+        params.append(date_from)
+    if date_to:
+        clauses.append(f"{column} <= ?")
+        params.append(date_to)
+    return " AND ".join(clauses) or "1"
+
+
+def iter_loans(date_from=None, date_to=None, include_archived=False, batch_size=EXPORT_BATCH_ROWS):
+    """
+    Streams loans (checked out between date_from and date_to, by
+    Date_out) with borrower name and title, oldest first. With
+    include_archived=True, loans moved to LOAN_HISTORY are included.
+    """
+    params = []
+    where = _date_filter("L.Date_out", date_from, date_to, params)
+    source = "ALL_LOANS" if include_archived else "BOOK_LOANS"
+    sql = f"""
+        SELECT L.Loan_id, L.Isbn, B.Title, L.Card_id, BR.Bname,
+               L.Date_out, L.Due_date, L.Date_in
+        FROM {source} L
+        JOIN BOOK B ON B.Isbn = L.Isbn
+        JOIN BORROWER BR ON BR.Card_id = L.Card_id
+        WHERE {where}
+        ORDER BY L.Date_out, L.Loan_id
+    """
+    return _stream_rows(sql, params, batch_size)
+
+
+def iter_fines(date_from=None, date_to=None, unpaid_only=False, include_archived=False,
+               batch_size=EXPORT_BATCH_ROWS):
+    """
+    Streams fines joined with BORROWER and BOOK, filtered by the loan's
+    Due_date (the day the fine started to accrue). Archived fines come
+    from LOAN_HISTORY when include_archived=True.
+    """
+    params = []
+    where = _date_filter("L.Due_date", date_from, date_to, params)
+    if unpaid_only:
+        where += " AND L.Fine_paid = 0"
+    if not include_archived:
+        where += " AND L.Archived = 0"
+    sql = f"""
+        SELECT L.Loan_id, L.Card_id, BR.Bname, BR.Phone, L.Isbn, B.Title,
+               L.Date_out, L.Due_date, L.Date_in,
+               L.Fine_amt, L.Fine_paid AS Paid, L.Archived
+        FROM ALL_LOANS L
+        JOIN BOOK B ON B.Isbn = L.Isbn
+        JOIN BORROWER BR ON BR.Card_id = L.Card_id
+        WHERE L.Fine_amt IS NOT NULL AND {where}
+        ORDER BY L.Due_date, L.Loan_id
+    """
+    return _stream_rows(sql, params, batch_size)
+
+
+def iter_catalog(batch_size=EXPORT_BATCH_ROWS):
+    """Streams every book with its authors and availability, in ISBN order."""
+    sql = """
+        SELECT
+            B.Isbn,
+            B.Title,
+            (
+                SELECT GROUP_CONCAT(A.Name, ', ')
+                FROM BOOK_AUTHORS BA
+                JOIN AUTHORS A ON BA.Author_id = A.Author_id
+                WHERE BA.Isbn = B.Isbn
+            ) AS Authors,
+            CASE WHEN EXISTS (
+                SELECT 1 FROM BOOK_LOANS BL
+                WHERE BL.Isbn = B.Isbn AND BL.Date_in IS NULL
+            ) THEN 'OUT' ELSE 'IN' END AS Availability
+        FROM BOOK B
+        ORDER BY B.Isbn
+    """
+    return _stream_rows(sql, [], batch_size)
+
+
+def write_export(rows, path, fmt=None, compress=None):
+    """
+    Writes rows (dictionaries, e.g. from iter_loans) to path one at a
+    time as CSV or JSONL (one JSON object per line).
+
+    fmt defaults from the file name ('.jsonl' -> JSONL, else CSV), and
+    compress defaults to True for names ending in '.gz'. The file is
+    written as "<path>.partial" and renamed when complete.
+
+    Returns the number of rows written.
+    """
+    name = path[:-3] if path.endswith(".gz") else path
+    fmt = fmt or ("jsonl" if name.endswith(".jsonl") else "csv")
+    if compress is None:
+        compress = path.endswith(".gz")
+
+    partial_path = path + ".partial"
+    opener = gzip.open if compress else open
+    count = 0
+    try:
+        with opener(partial_path, 'wt', encoding='utf-8', newline='') as out:
+            writer = None
+            for row in rows:
+                if fmt == "jsonl":
+                    out.write(json.dumps(row, default=str) + "\n")
+                else:
+                    if writer is None:
+                        writer = csv.DictWriter(out, fieldnames=list(row))
+                        writer.writeheader()
+                    writer.writerow(row)
+                count += 1
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+
+    os.replace(partial_path, path)
+    return count
+
+
 # --- Main block for testing ---
 if __name__ == "__main__":
 
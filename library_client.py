@@ -0,0 +1,148 @@
+"""
+Client adapter for server.py.
+
+Exposes the same functions as library_app (search_books, checkout_book,
+...) plus reports.dashboard, implemented as calls to the HTTP/JSON
+service, so gui.py can use either one as its `library` / `reports`
+backend:
+
+    python gui.py --server http://127.0.0.1:8080
+"""
+import http.client
+import json
+import threading
+from urllib.parse import quote, urlencode, urlparse
+
+SERVER_URL = "http://127.0.0.1:8080"
+
+# One persistent (keep-alive) connection per thread
+_local = threading.local()
+
+
+def connect(url):
+    """Points every function in this module at the service at url."""
+    global SERVER_URL
+    SERVER_URL = url
+    _local.conn = None
+
+
+def _request(method, path, params=None, body=None):
+    """Sends one request and returns the decoded JSON response."""
+    if params:
+        path = f"{path}?{urlencode(params)}"
+    payload = json.dumps(body).encode("utf-8") if body is not None else None
+    headers = {"Content-Type": "application/json"} if payload is not None else {}
+
+    # Retry once on a fresh connection if the server closed the idle one
+    for attempt in (1, 2):
+        conn = getattr(_local, 'conn', None)
+        if conn is None:
+            url = urlparse(SERVER_URL)
+            conn = _local.conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+        try:
+            conn.request(method, path, body=payload, headers=headers)
+            response = conn.getresponse()
+            data = json.loads(response.read().decode("utf-8"))
+            break
+        except (http.client.HTTPException, ConnectionError):
+            conn.close()
+            _local.conn = None
+            if attempt == 2:
+                raise
+
+    if response.status >= 400:
+        raise RuntimeError(data.get('error', f"HTTP {response.status}"))
+    return data
+
+
+def _result(data):
+    return (data['success'], data['message'])
+
+
+def search_books(search_term):
+    return _request("GET", "/books", {'q': search_term})
+
+
+def fuzzy_search_books(search_term, limit=50, min_score=0.6):
+    return _request("GET", "/books", {'q': search_term, 'fuzzy': 1, 'limit': limit,
+                                      'min_score': min_score})
+
+
+def suggest(prefix, limit=10):
+    return _request("GET", "/suggest", {'q': prefix, 'limit': limit})
+
+
+def get_borrower_for_book(isbn):
+    return _request("GET", f"/books/{quote(str(isbn))}/borrower")['card_id']
+
+
+def search_active_loans(search_term, after=None, limit=None):
+    params = {'q': search_term}
+    if after is not None:
+        params['after_due'], params['after_id'] = after
+    if limit is not None:
+        params['limit'] = limit
+    return _request("GET", "/loans", params)
+
+
+def getBooksCheckedOut(search=""):
+    return _request("GET", "/loans/checked-out", {'q': search})
+
+
+def search_unpaid_fines(card_id="", name=""):
+    return _request("GET", "/fines", {'card': card_id, 'name': name})
+
+
+def get_borrower_fines(card_id, include_paid=False):
+    return _request("GET", f"/fines/{quote(card_id)}", {'include_paid': int(include_paid)})
+
+
+def get_borrower_loans(card_id):
+    return _request("GET", f"/borrowers/{quote(card_id)}/loans")
+
+
+def get_checkout_eligibility(card_id):
+    return _request("GET", f"/borrowers/{quote(card_id)}/eligibility")
+
+
+def borrower_cache_stats():
+    return _request("GET", "/borrower-cache")
+
+
+def get_accrual_status():
+    return _request("GET", "/fines/accrual")
+
+
+def dashboard(limit=10, days=30):
+    """reports.dashboard on the service."""
+    return _request("GET", "/reports", {'limit': limit, 'days': days})
+
+
+def authenticate_user(username, password):
+    return _request("POST", "/login", body={'username': username, 'password': password})
+
+
+def checkout_book(isbn, card_id):
+    return _result(_request("POST", "/checkout", body={'isbn': isbn, 'card_id': card_id}))
+
+
+def checkin_book(loan_id):
+    return _result(_request("POST", "/checkin", body={'loan_id': loan_id}))
+
+
+def add_borrower(bname, ssn, address, phone, card_id=None, username=None, password=None):
+    return _result(_request("POST", "/borrowers", body={
+        'bname': bname, 'ssn': ssn, 'address': address, 'phone': phone,
+        'card_id': card_id, 'username': username, 'password': password}))
+
+
+def allocate_card_ids(count=1):
+    return _request("POST", "/card-ids", body={'count': count})
+
+
+def update_all_fines():
+    return _result(_request("POST", "/fines/refresh", body={}))
+
+
+def pay_borrower_fines(card_id):
+    return _result(_request("POST", f"/fines/{quote(card_id)}/pay", body={}))
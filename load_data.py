@@ -1,6 +1,14 @@
 import sqlite3
 import csv
+import io
+import itertools
 import os
+import re
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import create_db
 
 DB_FILE = "library.db"
 
@@ -29,9 +37,332 @@ CSV_FILES_TO_TABLES = {
 }
 
 
-def load_data():
+# Parallel mode: target size of one parsed chunk (bytes of CSV)
+CHUNK_BYTES = 4 * 1024 * 1024
+
+
+def _expected_columns(sql):
+    return sql.count('?')
+
+
+def find_chunks(filename, workers, chunk_bytes=CHUNK_BYTES):
+    """
+    Splits a CSV file into (start, end) byte ranges that each begin at
+    a row boundary. A newline only ends a row when it lies outside a
+    quoted field (an even number of '"' before it), so quoted newlines,
+    e.g. in a multi-line borrower address, stay inside their row.
+
+    The first range includes the header row.
+    """
+    size = os.path.getsize(filename)
+    count = max(workers, -(-size // chunk_bytes))
+    targets = [size * i // count for i in range(1, count)]
+
+    boundaries = [0]
+    quotes = 0        # '"' seen before the current block
+    offset = 0
+    with open(filename, 'rb') as file:
+        while targets:
+            block = file.read(1024 * 1024)
+            if not block:
+                break
+            while targets and targets[0] < offset + len(block):
+                position = max(targets[0], boundaries[-1]) - offset
+                newline = block.find(b'\n', position)
+                while newline != -1 and (quotes + block.count(b'"', 0, newline)) % 2:
+                    newline = block.find(b'\n', newline + 1)
+                if newline == -1:
+                    # Boundary lies in a later block: look for it from there
+                    targets[0] = offset + len(block)
+                    break
+                boundaries.append(offset + newline + 1)
+                targets.pop(0)
+            quotes += block.count(b'"')
+            offset += len(block)
+
+    boundaries = sorted(set(b for b in boundaries if b < size))
+    return list(zip(boundaries, boundaries[1:] + [size]))
+
+
+# Rows checked and inserted together in the single-process path
+BATCH_ROWS = 50000
+
+_ISBN_RE = re.compile(r"\d{9}[\dX]")
+_CARD_ID_RE = re.compile(r"ID\d+")
+_SSN_RE = re.compile(r"\d{3}-?\d{2}-?\d{4}")
+
+
+def check_row(table, row, columns):
+    """
+    Checks one row on its own (no other rows needed), so it can run in
+    the worker processes. Returns a list of reasons, empty if the row
+    is fine.
+    """
+    if len(row) != columns:
+        return ["wrong field count"]
+    reasons = []
+    if table == 'BOOK':
+        if not _ISBN_RE.fullmatch(row[0]):
+            reasons.append("bad ISBN")
+    elif table == 'AUTHORS':
+        if not row[0].isdigit():
+            reasons.append("bad Author_id")
+    elif table == 'BOOK_AUTHORS':
+        if not row[0].isdigit():
+            reasons.append("bad Author_id")
+        if not _ISBN_RE.fullmatch(row[1]):
+            reasons.append("bad ISBN")
+    elif table == 'BORROWER':
+        if not _CARD_ID_RE.fullmatch(row[0]):
+            reasons.append("bad Card_id")
+        if not _SSN_RE.fullmatch(row[1]):
+            reasons.append("bad SSN")
+        if not row[2].strip():
+            reasons.append("missing name")
+    return reasons
+
+
+def check_rows(table, rows, columns):
+    """check_row over a batch: {index in rows: reasons} for the bad ones."""
+    problems = {}
+    for index, row in enumerate(rows):
+        reasons = check_row(table, row, columns)
+        if reasons:
+            problems[index] = reasons
+    return problems
+
+
+class ImportValidator:
+    """
+    Checks that need the other rows of the load: duplicate keys (within
+    the feed and against rows already in the database) and Author_id /
+    Isbn references that point nowhere. Files must be fed in load order
+    (BOOK and AUTHORS before BOOK_AUTHORS), one batch at a time.
+    """
+
+    def __init__(self, cursor):
+        self.isbns = {row[0] for row in cursor.execute("SELECT Isbn FROM BOOK")}
+        self.author_ids = {row[0] for row in cursor.execute("SELECT Author_id FROM AUTHORS")}
+        self.book_authors = set(cursor.execute("SELECT Author_id, Isbn FROM BOOK_AUTHORS"))
+        self.card_ids = {row[0] for row in cursor.execute("SELECT Card_id FROM BORROWER")}
+        self.ssns = {self._ssn_digits(row[0]) for row in cursor.execute("SELECT Ssn FROM BORROWER")}
+
+    @staticmethod
+    def _ssn_digits(ssn):
+        return ssn.replace("-", "")
+
+    def _check(self, table, row):
+        if table == 'BOOK':
+            if row[0] in self.isbns:
+                return ["duplicate Isbn"]
+            self.isbns.add(row[0])
+        elif table == 'AUTHORS':
+            author_id = int(row[0])
+            if author_id in self.author_ids:
+                return ["duplicate Author_id"]
+            self.author_ids.add(author_id)
+        elif table == 'BOOK_AUTHORS':
+            key = (int(row[0]), row[1])
+            reasons = []
+            if key[0] not in self.author_ids:
+                reasons.append("unknown Author_id")
+            if key[1] not in self.isbns:
+                reasons.append("unknown Isbn")
+            if not reasons and key in self.book_authors:
+                reasons.append("duplicate book/author pair")
+            if not reasons:
+                self.book_authors.add(key)
+            return reasons
+        elif table == 'BORROWER':
+            ssn = self._ssn_digits(row[1])
+            reasons = []
+            if row[0] in self.card_ids:
+                reasons.append("duplicate Card_id")
+            if ssn in self.ssns:
+                reasons.append("duplicate SSN")
+            if not reasons:
+                self.card_ids.add(row[0])
+                self.ssns.add(ssn)
+            return reasons
+        return []
+
+    def check_batch(self, table, rows, problems):
+        """
+        Adds the cross-row reasons to `problems` ({index: reasons}) and
+        returns the indexes of the rows that passed every check. Rows
+        that already failed check_row are not registered as keys.
+        """
+        valid = []
+        for index, row in enumerate(rows):
+            if index in problems:
+                continue
+            reasons = self._check(table, row)
+            if reasons:
+                problems[index] = reasons
+            else:
+                valid.append(index)
+        return valid
+
+
+class RejectFile:
+    """
+    Sidecar CSV next to the source file (book.csv -> book.rejects.csv)
+    with the data row number, the reasons and the original fields of
+    every rejected row. Only created when something is rejected.
+    """
+
+    def __init__(self, filename, header):
+        self.path = os.path.splitext(filename)[0] + ".rejects.csv"
+        self.header = header
+        self.counts = Counter()     # reason -> rows (a row can have several)
+        self.rows = 0
+        self._file = None
+        self._writer = None
+        # Drop the report of an earlier run
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def add(self, row_number, reasons, row):
+        if self._writer is None:
+            self._file = open(self.path, 'w', newline='', encoding='utf-8')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(["Row", "Reason"] + list(self.header or []))
+        self._writer.writerow([row_number, "; ".join(reasons)] + list(row))
+        self.counts.update(reasons)
+        self.rows += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+    @property
+    def total(self):
+        """Rejected rows (not reasons)."""
+        return self.rows
+
+
+def parse_chunk(filename, start, end, table, columns):
+    """
+    Parses one byte range of a CSV file and runs check_row on it (in a
+    worker process). Skips the header in the first chunk.
+    Returns (rows, problems) as for check_rows.
+    """
+    with open(filename, 'rb') as file:
+        file.seek(start)
+        text = file.read(end - start).decode('utf-8-sig' if start == 0 else 'utf-8')
+
+    reader = csv.reader(io.StringIO(text, newline=''))
+    if start == 0:
+        next(reader, None)
+
+    rows = list(reader)
+    return rows, check_rows(table, rows, columns)
+
+
+def _read_header(filename):
+    with open(filename, 'r', encoding='utf-8-sig', newline='') as file:
+        return next(csv.reader(file), None)
+
+
+def _read_batches(filename, table, columns):
+    """Single-process path: yields (rows, problems) batches of BATCH_ROWS rows."""
+    with open(filename, 'r', encoding='utf-8-sig', newline='') as file:
+        # 'utf-8-sig' handles potential BOM (Byte Order Mark)
+
+        reader = csv.reader(file)
+
+        # Skip the header row
+        next(reader, None)
+
+        while True:
+            rows = list(itertools.islice(reader, BATCH_ROWS))
+            if not rows:
+                return
+            yield rows, check_rows(table, rows, columns)
+
+
+def _parallel_batches(filename, table, columns, pool, workers):
+    """Yields (rows, problems) for each chunk, in file order, parsed in the pool."""
+    # At most two chunks per worker are parsed ahead of the writer, so
+    # memory stays bounded when parsing outruns the inserts
+    pending = deque()
+    for start, end in find_chunks(filename, workers):
+        pending.append(pool.submit(parse_chunk, filename, start, end, table, columns))
+        if len(pending) >= 2 * workers:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _insert_batch(cursor, sql, rows, numbers, rejects):
+    """
+    Inserts rows with one executemany. If the database still refuses
+    one of them, the batch is undone and retried row by row so only the
+    offending rows are rejected. Returns the number of rows inserted.
+    """
+    cursor.execute("SAVEPOINT load_batch")
+    try:
+        cursor.executemany(sql, rows)
+        cursor.execute("RELEASE load_batch")
+        return len(rows)
+    except sqlite3.IntegrityError:
+        cursor.execute("ROLLBACK TO load_batch")
+        cursor.execute("RELEASE load_batch")
+
+    inserted = 0
+    for number, row in zip(numbers, rows):
+        try:
+            cursor.execute(sql, row)
+            inserted += 1
+        except sqlite3.IntegrityError as e:
+            rejects.add(number, [f"database: {e}"], row)
+    return inserted
+
+
+def _load_file(cursor, filename, info, validator, pool, workers):
+    """Validates and loads one CSV file; returns (rows loaded, RejectFile)."""
+    table, sql = info['table'], info['sql']
+    columns = _expected_columns(sql)
+    rejects = RejectFile(filename, _read_header(filename))
+
+    if pool is not None:
+        batches = _parallel_batches(filename, table, columns, pool, workers)
+    else:
+        batches = _read_batches(filename, table, columns)
+
+    loaded = 0
+    row_number = 0  # data rows before the current batch (header excluded)
+    try:
+        for rows, problems in batches:
+            valid = validator.check_batch(table, rows, problems)
+            for index in sorted(problems):
+                rejects.add(row_number + index + 1, problems[index], rows[index])
+            loaded += _insert_batch(cursor, sql,
+                                    [rows[i] for i in valid],
+                                    [row_number + i + 1 for i in valid],
+                                    rejects)
+            row_number += len(rows)
+    finally:
+        rejects.close()
+    return loaded, rejects
+
+
+def load_data(workers=1):
     """
     Loads data from normalized CSV files into the SQLite database.
+
+    Every row is validated first (field count, ISBN / Card_id / SSN
+    format, duplicate keys, dangling Author_id / Isbn references). Bad
+    rows don't stop the load: they are written to a <name>.rejects.csv
+    file next to the CSV with their reasons, the good rows are loaded,
+    and a summary of the rejections is printed at the end.
+
+    With workers > 1, CSV parsing and the per-row checks run in a pool
+    of that many processes while this process only does the cross-row
+    checks and inserts (see find_chunks / parse_chunk); rows still go
+    in in file order on one connection.
+
+    Returns {filename: (rows loaded, rows rejected, Counter of rejection reasons)}.
     """
     if not os.path.exists(DB_FILE):
         print(f"Error: Database file '{DB_FILE}' not found.")
@@ -39,12 +370,19 @@ def load_data():
         return
 
     conn = None
+    pool = ProcessPoolExecutor(workers) if workers > 1 else None
+    summary = {}
     try:
         conn = sqlite3.connect(DB_FILE)
         cursor = conn.cursor()
 
         # Enable foreign key enforcement
         cursor.execute("PRAGMA foreign_keys = ON;")
+        create_db.ensure_support_schema(conn)
+
+        # One transaction for the whole load (the batch savepoints nest in it)
+        cursor.execute("BEGIN")
+        validator = ImportValidator(cursor)
 
         print("Starting data load...")
 
@@ -55,28 +393,21 @@ def load_data():
                 continue
 
             try:
-                with open(filename, 'r', encoding='utf-8-sig') as file:
-                    # 'utf-8-sig' handles potential BOM (Byte Order Mark)
-
-                    reader = csv.reader(file)
-
-                    # Skip the header row
-                    header = next(reader, None)
-                    if header is None:
-                        print(f"  [*] Skipping empty file: {filename}")
-                        continue
+                if _read_header(filename) is None:
+                    print(f"  [*] Skipping empty file: {filename}")
+                    continue
 
-                    # Read all remaining data into a list
-                    data = list(reader)
+                loaded, rejects = _load_file(cursor, filename, info, validator, pool, workers)
+                summary[filename] = (loaded, rejects.total, rejects.counts)
 
-                    if not data:
-                        print(f"  [*] No data found in {filename} (after header).")
-                        continue
+                if not loaded and not rejects.total:
+                    print(f"  [*] No data found in {filename} (after header).")
+                    continue
 
-                    # Use executemany for fast bulk insertion
-                    cursor.executemany(info['sql'], data)
-
-                    print(f"  [+] Successfully loaded {len(data)} rows into {info['table']}.")
+                message = f"  [+] Successfully loaded {loaded} rows into {info['table']}"
+                if rejects.total:
+                    message += f" ({rejects.total} rejected -> {rejects.path})"
+                print(message + ".")
 
             except Exception as e:
                 print(f"  [!] FAILED to load {filename}. Error: {e}")
@@ -89,12 +420,19 @@ def load_data():
         cursor.execute("""
             INSERT INTO USERS (username, password, card_id, is_librarian)
             SELECT Card_id, Ssn, Card_id, 0
-            FROM BORROWER;
+            FROM BORROWER
+            WHERE Card_id NOT IN (SELECT card_id FROM USERS WHERE card_id IS NOT NULL);
         """)
 
+        # Card_ids were loaded explicitly: let the ID sequence re-seed
+        # itself from the new maximum on its next allocation
+        cursor.execute("DELETE FROM ID_SEQUENCE WHERE Name = 'card_id';")
+
         # If all files loaded successfully, commit the changes
         conn.commit()
         print("\nSuccess! All data has been loaded and committed to the database.")
+        _print_reject_summary(summary)
+        return summary
 
     except sqlite3.Error as e:
         print(f"\nAn error occurred with the database: {e}")
@@ -104,7 +442,61 @@ def load_data():
     finally:
         if conn:
             conn.close()
+        if pool is not None:
+            pool.shutdown()
+
+
+def _print_reject_summary(summary):
+    rejected = {name: (rows, counts) for name, (_, rows, counts) in summary.items() if rows}
+    if not rejected:
+        print("No rows were rejected.")
+        return
+    print("\nRejected rows:")
+    for filename, (rows, counts) in rejected.items():
+        print(f"  {filename}: {rows}")
+        for reason, count in counts.most_common():
+            print(f"      {reason}: {count}")
+
+
+def benchmark(worker_counts=(1, 2, 4, 8)):
+    """
+    Loads the CSVs into fresh scratch databases with each worker count
+    and prints the time and the speedup over the single-process loader.
+    """
+    global DB_FILE
+    import contextlib
+    import tempfile
+
+    original = (DB_FILE, create_db.DB_FILE)
+    timings = []
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            for workers in worker_counts:
+                DB_FILE = create_db.DB_FILE = os.path.join(workdir, f"bench-{workers}.db")
+                with contextlib.redirect_stdout(io.StringIO()):
+                    create_db.create_database()
+                    started = time.perf_counter()
+                    load_data(workers)
+                    timings.append((workers, time.perf_counter() - started))
+    finally:
+        DB_FILE, create_db.DB_FILE = original
+
+    baseline = timings[0][1]
+    for workers, seconds in timings:
+        print(f"  {workers:>2} worker(s): {seconds:6.2f}s  speedup x{baseline / seconds:.2f}")
 
 
 if __name__ == "__main__":
-    load_data()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Load the CSV files into library.db")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="parse CSVs in this many processes (default: single-process)")
+    parser.add_argument("--benchmark", type=int, nargs="*", metavar="N",
+                        help="compare load times for these worker counts (default 1 2 4 8)")
+    args = parser.parse_args()
+
+    if args.benchmark is not None:
+        benchmark(args.benchmark or (1, 2, 4, 8))
+    else:
+        load_data(args.workers)
\ No newline at end of file
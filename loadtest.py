@@ -0,0 +1,351 @@
+"""
+Load generator: how many desks can share library.db?
+
+Each worker plays one circulation desk with its own connections and
+replays a weighted mix of search_books, checkout_book, checkin_book,
+get_borrower_fines and pay_borrower_fines. Runs are made on copies of a
+scaled database (extra borrowers, a share of books already out, some of
+them overdue) in rollback-journal (DELETE) and WAL mode, at increasing
+worker counts.
+
+Reported per run: throughput, latency percentiles per operation,
+"database is locked"/busy errors (after retries) and retry counts, plus
+the worker count where throughput stops growing.
+
+    python loadtest.py --workers 1 2 4 8 16 --duration 10
+    python loadtest.py --processes --journal wal --scale 5
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+import library_app as library
+
+# Operation -> share of the mix (front desk: mostly lookups)
+DEFAULT_MIX = {
+    'search_books': 50,
+    'checkout_book': 20,
+    'checkin_book': 15,
+    'get_borrower_fines': 10,
+    'pay_borrower_fines': 5,
+}
+
+SEARCH_WORDS = ["history", "love", "war", "the", "guide", "art", "life",
+                "world", "american", "new", "myth", "science", "cook"]
+
+
+# ---------------- Scaled database ----------------
+
+def build_scaled_database(source, dest, scale=1, out_share=0.05, overdue_share=0.2, seed=7):
+    """
+    Copies source to dest and scales it up for load testing:
+    - scale: multiplies the borrowers (new Card_ids / SSNs)
+    - out_share: share of books put on active loan
+    - overdue_share: share of those loans that are overdue (they get fines)
+    """
+    shutil.copy(source, dest)
+    conn = sqlite3.connect(dest)
+    rng = random.Random(seed)
+    try:
+        cursor = conn.cursor()
+        base = cursor.execute("SELECT MAX(CAST(SUBSTR(Card_id, 3) AS INTEGER)) FROM BORROWER").fetchone()[0] or 0
+        for copy in range(1, scale):
+            cursor.execute("""
+                INSERT INTO BORROWER (Card_id, Ssn, Bname, Address, Phone)
+                SELECT printf('ID%06d', CAST(SUBSTR(Card_id, 3) AS INTEGER) + ?),
+                       Ssn || '-' || ?, Bname, Address, Phone
+                FROM BORROWER
+                WHERE CAST(SUBSTR(Card_id, 3) AS INTEGER) <= ?
+            """, (base * copy, copy, base))
+        cursor.execute("DELETE FROM ID_SEQUENCE WHERE Name = 'card_id'")
+
+        cards = [row[0] for row in cursor.execute("SELECT Card_id FROM BORROWER")]
+        isbns = [row[0] for row in cursor.execute(
+            "SELECT Isbn FROM BOOK WHERE Isbn NOT IN (SELECT Isbn FROM BOOK_LOANS WHERE Date_in IS NULL)")]
+        rng.shuffle(isbns)
+
+        loans = []
+        active = {}
+        for isbn in isbns[:int(len(isbns) * out_share)]:
+            card = rng.choice(cards)
+            if active.get(card, 0) >= 3:
+                continue
+            active[card] = active.get(card, 0) + 1
+            days_out = rng.randint(15, 40) if rng.random() < overdue_share else rng.randint(0, 13)
+            loans.append((isbn, card, f"-{days_out} day", f"{14 - days_out} day"))
+        cursor.executemany("""
+            INSERT INTO BOOK_LOANS (Isbn, Card_id, Date_out, Due_date)
+            VALUES (?, ?, date('now', ?), date('now', ?))
+        """, loans)
+        conn.commit()
+    finally:
+        conn.close()
+
+    library.DB_FILE = dest
+    library.update_all_fines()
+    return len(cards), len(loans)
+
+
+def set_journal_mode(path, mode):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(f"PRAGMA journal_mode = {mode}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+# ---------------- One desk ----------------
+
+class _ReadCursor(sqlite3.Cursor):
+    def execute(self, *args):
+        try:
+            return super().execute(*args)
+        except sqlite3.Error as e:
+            self.connection.error = e
+            raise
+
+    def fetchall(self):
+        try:
+            return super().fetchall()
+        except sqlite3.Error as e:
+            self.connection.error = e
+            raise
+
+
+class _ReadConnection(sqlite3.Connection):
+    """
+    A desk's read connection. library_app's read functions catch their
+    errors (search_books prints them and returns []), so the last one is
+    kept in `error` for the harness to count busy / locked reads.
+    """
+    error = None
+
+    def cursor(self, factory=_ReadCursor):
+        return super().cursor(factory)
+
+    def execute(self, *args):
+        try:
+            return super().execute(*args)
+        except sqlite3.Error as e:
+            self.error = e
+            raise
+
+
+def _is_busy(result):
+    if isinstance(result, tuple):
+        message = result[1]
+    elif isinstance(result, dict):
+        message = result.get('message', '')
+    else:
+        return False
+    return "locked" in message or "busy" in message
+
+
+def _succeeded(result):
+    if isinstance(result, tuple):
+        return result[0]
+    if isinstance(result, dict):
+        return result.get('message') == 'Success'
+    return True
+
+
+def run_desk(db_path, worker, workers, duration, mix, retries, busy_timeout, seed):
+    """
+    Runs one desk for `duration` seconds and returns its counters:
+    {operation: {'latencies': [...], 'ok': n, 'rejected': n, 'busy': n, 'retries': n}}
+    'rejected' are business-rule refusals (fines, loan limit, ...).
+    """
+    library.DB_FILE = db_path
+    library.BUSY_TIMEOUT = busy_timeout
+    rng = random.Random(seed)
+
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=busy_timeout)
+    isbns = [row[0] for row in conn.execute("SELECT Isbn FROM BOOK ORDER BY random() LIMIT 5000")]
+    cards = [row[0] for row in conn.execute("SELECT Card_id FROM BORROWER ORDER BY random() LIMIT 2000")]
+    # Each desk returns its own share of the loans, so desks don't race for the same book
+    my_loans = [row[0] for row in conn.execute(
+        "SELECT Loan_id FROM BOOK_LOANS WHERE Date_in IS NULL AND Loan_id % ? = ?",
+        (workers, worker))]
+    fined_cards = [row[0] for row in conn.execute("""
+        SELECT DISTINCT BL.Card_id FROM FINES F JOIN BOOK_LOANS BL ON BL.Loan_id = F.Loan_id
+        WHERE F.Paid = 0 ORDER BY random() LIMIT 500
+    """)] or cards
+    conn.close()
+
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    stats = {name: {'latencies': [], 'ok': 0, 'rejected': 0, 'busy': 0, 'retries': 0} for name in names}
+
+    def call(name):
+        if name == 'search_books':
+            return library.search_books(rng.choice(SEARCH_WORDS)), None
+        if name == 'checkout_book':
+            return library.checkout_book(rng.choice(isbns), rng.choice(cards)), None
+        if name == 'checkin_book':
+            if not my_loans:
+                return (False, "nothing to check in"), None
+            loan_id = my_loans.pop(rng.randrange(len(my_loans)))
+            return library.checkin_book(loan_id), loan_id
+        if name == 'get_borrower_fines':
+            return library.get_borrower_fines(rng.choice(fined_cards)), None
+        return library.pay_borrower_fines(rng.choice(fined_cards)), None
+
+    reader = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=busy_timeout,
+                             factory=_ReadConnection)
+    reader.row_factory = sqlite3.Row
+
+    stop_at = time.perf_counter() + duration
+    while time.perf_counter() < stop_at:
+        name = rng.choices(names, weights)[0]
+        counters = stats[name]
+        started = time.perf_counter()
+        for attempt in range(retries + 1):
+            reader.error = None
+            try:
+                with library.use_connection(read_conn=reader):
+                    result, loan_id = call(name)
+            except sqlite3.OperationalError as e:
+                result, loan_id = (False, str(e)), None
+            if reader.error is not None:
+                # A read that failed inside library_app (e.g. search_books -> [])
+                result = (False, str(reader.error))
+            if not _is_busy(result):
+                break
+            if loan_id is not None:
+                my_loans.append(loan_id)
+            if attempt < retries:
+                counters['retries'] += 1
+                time.sleep(0.01 * 2 ** attempt * rng.random())
+        counters['latencies'].append(time.perf_counter() - started)
+
+        if _is_busy(result):
+            counters['busy'] += 1
+        elif _succeeded(result):
+            counters['ok'] += 1
+        else:
+            counters['rejected'] += 1
+    reader.close()
+    return stats
+
+
+def _run_desk_args(args):
+    return run_desk(*args)
+
+
+# ---------------- One run ----------------
+
+def _percentile(ordered, share):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def run_load(db_path, workers, duration, mix=None, retries=3, busy_timeout=5.0,
+             processes=False, seed=1):
+    """
+    Runs `workers` desks (threads, or processes with processes=True) in
+    parallel and returns a summary dictionary (throughput, latencies, errors).
+    """
+    mix = mix or DEFAULT_MIX
+    jobs = [(db_path, worker, workers, duration, mix, retries, busy_timeout, seed + worker)
+            for worker in range(workers)]
+
+    started = time.perf_counter()
+    if processes:
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.map(_run_desk_args, jobs)
+    else:
+        results = [None] * workers
+
+        def thread_main(index):
+            results[index] = run_desk(*jobs[index])
+
+        threads = [threading.Thread(target=thread_main, args=(i,)) for i in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - started
+
+    summary = {'workers': workers, 'seconds': elapsed, 'operations': {}}
+    totals = {'count': 0, 'busy': 0, 'retries': 0}
+    for name in mix:
+        latencies = sorted(lat for desk in results for lat in desk[name]['latencies'])
+        counters = {key: sum(desk[name][key] for desk in results)
+                    for key in ('ok', 'rejected', 'busy', 'retries')}
+        counters.update({
+            'count': len(latencies),
+            'p50_ms': _percentile(latencies, 0.50) * 1000,
+            'p95_ms': _percentile(latencies, 0.95) * 1000,
+            'p99_ms': _percentile(latencies, 0.99) * 1000,
+        })
+        summary['operations'][name] = counters
+        for key in totals:
+            totals[key] += counters[key]
+    summary.update(totals)
+    summary['ops_per_sec'] = totals['count'] / elapsed
+    return summary
+
+
+def print_summary(summary):
+    print(f"  {summary['workers']:>3} desks: {summary['ops_per_sec']:8.0f} ops/s  "
+          f"busy={summary['busy']}  retries={summary['retries']}")
+    for name, counters in summary['operations'].items():
+        print(f"        {name:<20}{counters['count']:>7}  ok={counters['ok']:<6}"
+              f"rejected={counters['rejected']:<6}busy={counters['busy']:<4}"
+              f"p50={counters['p50_ms']:7.1f}ms  p95={counters['p95_ms']:7.1f}ms  "
+              f"p99={counters['p99_ms']:7.1f}ms")
+
+
+def saturation_point(summaries, gain=0.10):
+    """First worker count after which throughput grows by less than `gain`."""
+    for previous, current in zip(summaries, summaries[1:]):
+        if current['ops_per_sec'] < previous['ops_per_sec'] * (1 + gain):
+            return previous['workers']
+    return summaries[-1]['workers'] if summaries else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent-desk load test for library.db")
+    parser.add_argument("--db", default=library.DB_FILE, help="source database (never modified)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--journal", choices=["delete", "wal", "both"], default="both")
+    parser.add_argument("--processes", action="store_true", help="one process per desk instead of threads")
+    parser.add_argument("--retries", type=int, default=3, help="retries after a busy error")
+    parser.add_argument("--busy-timeout", type=float, default=5.0,
+                        help="seconds a connection waits on a lock")
+    parser.add_argument("--scale", type=int, default=1, help="borrower multiplier")
+    args = parser.parse_args(argv)
+
+    modes = ["delete", "wal"] if args.journal == "both" else [args.journal]
+    workdir = tempfile.mkdtemp()
+    try:
+        scaled = os.path.join(workdir, "scaled.db")
+        borrowers, loans = build_scaled_database(args.db, scaled, scale=args.scale)
+        print(f"Scaled database: {borrowers} borrowers, {loans} active loans")
+
+        for mode in modes:
+            print(f"\njournal_mode={mode} ({'processes' if args.processes else 'threads'})")
+            summaries = []
+            for workers in args.workers:
+                run_path = os.path.join(workdir, f"run-{mode}-{workers}.db")
+                shutil.copy(scaled, run_path)
+                set_journal_mode(run_path, mode)
+                summary = run_load(run_path, workers, args.duration, retries=args.retries,
+                                   busy_timeout=args.busy_timeout, processes=args.processes)
+                print_summary(summary)
+                summaries.append(summary)
+            print(f"  throughput saturates at about {saturation_point(summaries)} desk(s)")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+import isbn_utils
+
+# One search condition, e.g. author:"le guin" -> Term('author', 'le guin', True)
+Term = namedtuple('Term', ['field', 'value', 'phrase'])
+
+FIELDS = ('title', 'author', 'isbn', 'available')
+
+# field:"quoted phrase" | field:word | "quoted phrase" | word
+_TOKEN_RE = re.compile(r'(?:(\w+):)?(?:"([^"]*)"?|(\S+))')
+_FIELD_HINT_RE = re.compile(r'\b(?:%s):' % '|'.join(FIELDS), re.IGNORECASE)
+# Words the full-text indexes store (letters and digits, like FTS5's tokenizer)
+_WORD_RE = re.compile(r'[^\W_]+')
+
+# Books that have at least one author (same rule as the plain search join).
+# Correlated, so it is one index probe per candidate book rather than a
+# list of every ISBN in BOOK_AUTHORS
+_HAS_AUTHOR = "EXISTS (SELECT 1 FROM BOOK_AUTHORS HA WHERE HA.Isbn = B.Isbn)"
+
+# Word / prefix matches through the full-text indexes (see create_db)
+_TITLE_MATCH = """B.Isbn IN (
+                SELECT Isbn FROM BOOK_TITLE_FTS WHERE BOOK_TITLE_FTS MATCH ?
+            )"""
+
+_AUTHOR_MATCH = """B.Isbn IN (
+                SELECT BA.Isbn
+                FROM AUTHOR_NAME_FTS
+                JOIN BOOK_AUTHORS BA ON BA.Author_id = AUTHOR_NAME_FTS.rowid
+                WHERE AUTHOR_NAME_FTS MATCH ?
+            )"""
+
+# Values without any word (e.g. "&") can't be looked up in the indexes
+_TITLE_LIKE = "B.Title COLLATE NOCASE LIKE ?"
+
+_AUTHOR_LIKE = """B.Isbn IN (
+                SELECT BA.Isbn
+                FROM AUTHORS A
+                JOIN BOOK_AUTHORS BA ON BA.Author_id = A.Author_id
+                WHERE A.Name COLLATE NOCASE LIKE ?
+            )"""
+
+_IS_OUT = """EXISTS (
+                SELECT 1 FROM BOOK_LOANS BL
+                WHERE BL.Isbn = B.Isbn AND BL.Date_in IS NULL
+            )"""
+
+_SELECT = """
+        SELECT
+            B.Isbn,
+            B.Title,
+            (
+                SELECT GROUP_CONCAT(A.Name, ', ')
+                FROM BOOK_AUTHORS BA
+                JOIN AUTHORS A ON BA.Author_id = A.Author_id
+                WHERE BA.Isbn = B.Isbn
+            ) AS Authors,
+            CASE WHEN %s THEN 'OUT' ELSE 'IN' END AS Availability
+        FROM
+            BOOK B
+        WHERE
+            %s
+            AND (%s)
+        ORDER BY
+            B.Title;
+        """
+
+
+def is_structured(search_term):
+    """True if the term uses field prefixes, quotes or AND/OR."""
+    if not search_term:
+        return False
+    if '"' in search_term or _FIELD_HINT_RE.search(search_term):
+        return True
+    words = search_term.split()
+    return len(words) > 1 and any(word in ('AND', 'OR') for word in words)
+
+
+def parse(search_term):
+    """
+    Parses a query into OR-groups of AND-ed Terms.
+
+    Syntax:
+        title:word  author:word  isbn:0195153445  available:yes|no
+        "quoted phrase" (also after a field, e.g. title:"classical myth")
+        a b         -> a AND b (AND is implied, but may be written)
+        a OR b      -> either side
+
+    Words match the start of a word in the Title or an author name (the
+    start of the ISBN for plain words); a phrase matches those words in
+    order, the last one as a prefix. Unknown fields are kept as plain words, so "re:birth" still works.
+    """
+    groups = [[]]
+    for match in _TOKEN_RE.finditer(search_term or ""):
+        field, quoted, word = match.group(1), match.group(2), match.group(3)
+        phrase = quoted is not None
+        value = quoted if phrase else word
+
+        if field is not None and field.lower() not in FIELDS:
+            # Not one of ours: treat the whole thing as a word
+            value = match.group(0).strip('"')
+            field = None
+        field = field.lower() if field else None
+
+        if field is None and not phrase:
+            if value == 'OR':
+                if groups[-1]:
+                    groups.append([])
+                continue
+            if value == 'AND':
+                continue
+
+        if not value:
+            continue
+        if field == 'isbn':
+            # Valid ISBN-10/13 -> stored ISBN-10 key, anything else is a prefix
+            value = isbn_utils.canonical(value) or isbn_utils.normalize(value)
+        elif field == 'available':
+            value = 'yes' if value.lower() in ('yes', 'y', 'true', 'in', '1') else 'no'
+        groups[-1].append(Term(field, value, phrase))
+
+    return [group for group in groups if group]
+
+
+def _term_shape(term):
+    """The part of a term that changes the SQL (never the value itself)."""
+    if term.field == 'isbn':
+        return ('isbn', 'exact' if len(term.value) in (10, 13) else 'prefix')
+    if term.field == 'available':
+        return ('available', term.value)
+    return (term.field or 'any', 'words' if _WORD_RE.search(term.value) else 'like')
+
+
+def shape_of(groups):
+    """Hashable plan key for a parsed query, e.g. ((('isbn', 'exact'),),)."""
+    return tuple(tuple(_term_shape(term) for term in group) for group in groups)
+
+
+def _term_sql(shape):
+    kind = shape[0]
+    if kind == 'title':
+        return _TITLE_MATCH if shape[1] == 'words' else _TITLE_LIKE
+    if kind == 'author':
+        return _AUTHOR_MATCH if shape[1] == 'words' else _AUTHOR_LIKE
+    if kind == 'isbn':
+        # Exact ISBN is a primary-key probe, prefix is a key range
+        return "B.Isbn = ?" if shape[1] == 'exact' else "(B.Isbn >= ? AND B.Isbn < ?)"
+    if kind == 'available':
+        return ("NOT " if shape[1] == 'yes' else "") + _IS_OUT
+    # Plain word: same three-way match as the classic search
+    if shape[1] == 'words':
+        return "(%s OR (B.Isbn >= ? AND B.Isbn < ?) OR %s)" % (_TITLE_MATCH, _AUTHOR_MATCH)
+    return "(%s OR B.Isbn LIKE ? OR %s)" % (_TITLE_LIKE, _AUTHOR_LIKE)
+
+
+@lru_cache(maxsize=256)
+def compile_shape(shape):
+    """Builds (and caches) the SQL for one query shape."""
+    ors = []
+    for group in shape:
+        ors.append("(" + " AND ".join(_term_sql(term_shape) for term_shape in group) + ")")
+    return _SELECT % (_IS_OUT, _HAS_AUTHOR, "\n            OR ".join(ors))
+
+
+def _match_expression(value):
+    """FTS5 query for a value: its words as one phrase, the last one a prefix."""
+    return '"%s"*' % " ".join(_WORD_RE.findall(value))
+
+
+def _term_params(term):
+    if term.field == 'isbn':
+        if len(term.value) in (10, 13):
+            return [term.value]
+        return [term.value, term.value + "\uffff"]
+    if term.field == 'available':
+        return []
+    if not _WORD_RE.search(term.value):
+        like = f"%{term.value}%"
+        return [like] if term.field else [like, like, like]
+    match = _match_expression(term.value)
+    if term.field:
+        return [match]
+    key = isbn_utils.normalize(term.value)
+    return [match, key, key + "\uffff", match]
+
+
+def compile_query(search_term):
+    """Returns (sql, params) for a structured query, or None if it is empty."""
+    groups = parse(search_term)
+    if not groups:
+        return None
+    params = []
+    for group in groups:
+        for term in group:
+            params.extend(_term_params(term))
+    return compile_shape(shape_of(groups)), params
+
+
+def plan_cache_info():
+    """Hit/miss counters of the query-plan cache."""
+    return compile_shape.cache_info()
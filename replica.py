@@ -0,0 +1,242 @@
+"""
+Read replica of library.db for branch workstations.
+
+A replica is a local copy of the primary database, seeded with the
+sqlite3 backup API and kept current by replaying the primary's
+CHANGE_LOG (see create_db.CHANGE_LOG_TABLES). Reads go to the local
+file, so searches no longer compete with the circulation desk for the
+lock on the shared primary; writes still go to the primary.
+
+Usage:
+    python replica.py seed  //server/share/library.db branch.db
+    python replica.py follow //server/share/library.db branch.db --interval 2
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from create_db import CHANGE_LOG_TABLES
+
+
+def _open_primary(primary_path):
+    # Read-only: a replica never writes to the primary
+    return sqlite3.connect(f"file:{primary_path}?mode=ro", uri=True)
+
+
+def seed_replica(primary_path, replica_path, pages_per_step=1024, sleep=0.0):
+    """
+    Creates replica_path as a snapshot of the primary and records the
+    CHANGE_LOG position that snapshot already contains.
+
+    Returns a (success, message) tuple.
+    """
+    if not os.path.exists(primary_path):
+        return (False, f"Error: Primary database '{primary_path}' not found.")
+
+    partial_path = replica_path + ".partial"
+    if os.path.exists(partial_path):
+        os.remove(partial_path)
+
+    primary = _open_primary(primary_path)
+    replica = sqlite3.connect(partial_path)
+    try:
+        primary.backup(replica, pages=pages_per_step, sleep=sleep)
+
+        cursor = replica.cursor()
+        # The replica must not log its own replays back into CHANGE_LOG, and
+        # its report rollups arrive through the log instead of being recounted
+        cursor.execute("""
+            SELECT name FROM sqlite_master
+            WHERE type = 'trigger' AND (name LIKE 'trg_cdc_%' OR name LIKE 'trg_rollup_%')
+        """)
+        for (trigger,) in cursor.fetchall():
+            cursor.execute(f"DROP TRIGGER {trigger}")
+
+        seq = cursor.execute("SELECT COALESCE(MAX(Seq), 0) FROM CHANGE_LOG").fetchone()[0]
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS REPLICA_STATE (
+                Id INTEGER PRIMARY KEY CHECK (Id = 1),
+                Applied_seq INTEGER NOT NULL,
+                Synced_at REAL NOT NULL
+            )
+        """)
+        cursor.execute("INSERT OR REPLACE INTO REPLICA_STATE VALUES (1, ?, ?)", (seq, time.time()))
+        replica.commit()
+    except sqlite3.Error as e:
+        replica.close()
+        os.remove(partial_path)
+        return (False, f"An unexpected database error occurred: {e}")
+    finally:
+        primary.close()
+
+    replica.close()
+    os.replace(partial_path, replica_path)
+    return (True, f"Replica '{replica_path}' seeded at change sequence {seq}.")
+
+
+def _apply_change(cursor, table, op, row_key, payload):
+    key_column, columns = CHANGE_LOG_TABLES[table]
+    if op == 'DELETE':
+        cursor.execute(f"DELETE FROM {table} WHERE {key_column} = ?", (row_key,))
+        return
+    names = ", ".join(columns)
+    marks = ", ".join("?" * len(columns))
+    cursor.execute(f"INSERT OR REPLACE INTO {table} ({names}) VALUES ({marks})",
+                   [payload.get(column) for column in columns])
+
+
+def sync_replica(primary_path, replica_path, batch_size=1000):
+    """
+    Applies every CHANGE_LOG entry the replica has not seen yet, one
+    transaction per batch. Returns (success, number of changes applied).
+    """
+    primary = _open_primary(primary_path)
+    replica = sqlite3.connect(replica_path)
+    applied = 0
+    try:
+        cursor = replica.cursor()
+        position = cursor.execute("SELECT Applied_seq FROM REPLICA_STATE WHERE Id = 1").fetchone()[0]
+
+        while True:
+            changes = primary.execute("""
+                SELECT Seq, Table_name, Op, Row_key, Payload
+                FROM CHANGE_LOG
+                WHERE Seq > ?
+                ORDER BY Seq
+                LIMIT ?
+            """, (position, batch_size)).fetchall()
+
+            for seq, table, op, row_key, payload in changes:
+                if table in CHANGE_LOG_TABLES:
+                    _apply_change(cursor, table, op, row_key,
+                                  json.loads(payload) if payload else None)
+                position = seq
+
+            cursor.execute("UPDATE REPLICA_STATE SET Applied_seq = ?, Synced_at = ? WHERE Id = 1",
+                           (position, time.time()))
+            replica.commit()
+            applied += len(changes)
+            if len(changes) < batch_size:
+                break
+
+        return (True, applied)
+
+    except sqlite3.Error as e:
+        replica.rollback()
+        print(f"Replica sync failed: {e}")
+        return (False, applied)
+    finally:
+        primary.close()
+        replica.close()
+
+
+def replication_lag(primary_path, replica_path):
+    """
+    How far the replica is behind the primary. Returns a dictionary:
+    - applied_seq / primary_seq: CHANGE_LOG positions
+    - behind: number of sequence numbers not yet applied
+    - seconds_since_sync: time since the last successful sync
+    """
+    primary = _open_primary(primary_path)
+    replica = sqlite3.connect(f"file:{replica_path}?mode=ro", uri=True)
+    try:
+        primary_seq = primary.execute("SELECT COALESCE(MAX(Seq), 0) FROM CHANGE_LOG").fetchone()[0]
+        applied_seq, synced_at = replica.execute(
+            "SELECT Applied_seq, Synced_at FROM REPLICA_STATE WHERE Id = 1").fetchone()
+    finally:
+        primary.close()
+        replica.close()
+
+    return {
+        'applied_seq': applied_seq,
+        'primary_seq': primary_seq,
+        'behind': max(0, primary_seq - applied_seq),
+        'seconds_since_sync': time.time() - synced_at,
+    }
+
+
+class ReplicaFollower(threading.Thread):
+    """Background thread that keeps a replica in sync every `interval` seconds."""
+
+    def __init__(self, primary_path, replica_path, interval=2.0):
+        super().__init__(daemon=True, name="replica-follower")
+        self.primary_path = primary_path
+        self.replica_path = replica_path
+        self.interval = interval
+        self.last_applied = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            ok, applied = sync_replica(self.primary_path, self.replica_path)
+            if ok:
+                self.last_applied = applied
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def _demo():
+    """Primary + branch copy in a temp directory: seed, write, sync, compare."""
+    import shutil
+    import tempfile
+
+    import library_app as library
+
+    workdir = tempfile.mkdtemp()
+    primary_path = os.path.join(workdir, "primary.db")
+    replica_path = os.path.join(workdir, "branch.db")
+    shutil.copy(library.DB_FILE, primary_path)
+    library.DB_FILE = primary_path
+
+    print(seed_replica(primary_path, replica_path)[1])
+    library.configure_replica(replica_path)
+
+    book = library.search_books("isbn:0312970242")[0]
+    print(f"Before: {book['Isbn']} is {book['Availability']} on the replica")
+
+    print(library.checkout_book("0312970242", "ID000010")[1])
+    print(f"Lag after write: {replication_lag(primary_path, replica_path)['behind']} change(s)")
+    print(f"Replica still says: {library.search_books('isbn:0312970242')[0]['Availability']}")
+
+    print(f"Applied {sync_replica(primary_path, replica_path)[1]} change(s)")
+    print(f"Lag after sync: {replication_lag(primary_path, replica_path)['behind']} change(s)")
+    print(f"Replica now says: {library.search_books('isbn:0312970242')[0]['Availability']}")
+
+    shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local read replica of library.db")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in ("seed", "sync", "follow", "lag"):
+        command = commands.add_parser(name)
+        command.add_argument("primary")
+        command.add_argument("replica")
+        if name == "follow":
+            command.add_argument("--interval", type=float, default=2.0)
+    commands.add_parser("demo", help="run a primary/branch round trip on a copy of library.db")
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        print(seed_replica(args.primary, args.replica)[1])
+    elif args.command == "sync":
+        print(f"Applied {sync_replica(args.primary, args.replica)[1]} change(s).")
+    elif args.command == "lag":
+        print(replication_lag(args.primary, args.replica))
+    elif args.command == "follow":
+        follower = ReplicaFollower(args.primary, args.replica, args.interval)
+        follower.start()
+        try:
+            while True:
+                time.sleep(args.interval)
+                lag = replication_lag(args.primary, args.replica)
+                print(f"applied={lag['applied_seq']} behind={lag['behind']}")
+        except KeyboardInterrupt:
+            follower.stop()
+    else:
+        _demo()
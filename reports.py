@@ -0,0 +1,198 @@
+"""
+Fines aging and circulation reports.
+
+Every report reads the rollup tables that create_db's trg_rollup_*
+triggers keep current on each checkout, check-in and fine change
+(DAILY_CIRCULATION, TITLE_CIRCULATION, FINE_AGING, BORROWER_FINES), so
+a dashboard never re-aggregates BOOK_LOANS ⋈ FINES.
+
+    python reports.py                 # print the dashboard
+    python reports.py --rebuild       # recompute the rollups first
+"""
+import argparse
+import datetime
+import sqlite3
+
+import create_db
+import library_app as library
+
+# (label, first day overdue, last day overdue or None)
+AGING_BUCKETS = [
+    ("0-30 days", 0, 30),
+    ("31-90 days", 31, 90),
+    ("90+ days", 91, None),
+]
+
+
+def _query(sql, params=()):
+    """Runs a read-only report query and returns its rows as dictionaries."""
+    conn = library._get_read_connection()
+    if conn is None:
+        return []
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        return [dict(row) for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        print(f"Database error in reports: {e}")
+        return []
+    finally:
+        conn.close()
+
+
+def fines_aging(today=None):
+    """
+    Unpaid fines grouped by how long ago the book was due.
+    Returns a list of {'Bucket', 'Fines', 'Amount'}, one per AGING_BUCKETS entry.
+    """
+    today = today or datetime.date.today()
+    cases = []
+    params = []
+    for label, low, high in AGING_BUCKETS:
+        if high is None:
+            cases.append("WHEN julianday(?) - julianday(Due_date) >= ? THEN ?")
+            params += [today.isoformat(), low, label]
+        else:
+            cases.append("WHEN julianday(?) - julianday(Due_date) <= ? THEN ?")
+            params += [today.isoformat(), high, label]
+    rows = _query(f"""
+        SELECT CASE {' '.join(cases)} END AS Bucket,
+               SUM(Unpaid_count) AS Fines,
+               ROUND(SUM(Unpaid_amt), 2) AS Amount
+        FROM FINE_AGING
+        WHERE Unpaid_count > 0
+        GROUP BY Bucket
+    """, params)
+
+    found = {row['Bucket']: row for row in rows}
+    return [{'Bucket': label,
+             'Fines': found.get(label, {}).get('Fines') or 0,
+             'Amount': found.get(label, {}).get('Amount') or 0.0}
+            for label, _, _ in AGING_BUCKETS]
+
+
+def top_overdue_borrowers(limit=10):
+    """Borrowers with the largest unpaid fines, with how many books they still have overdue."""
+    return _query("""
+        SELECT BF.Card_id, B.Bname,
+               ROUND(BF.Unpaid_amt, 2) AS Unpaid_amt,
+               BF.Unpaid_count,
+               (SELECT COUNT(*) FROM BOOK_LOANS BL
+                WHERE BL.Card_id = BF.Card_id AND BL.Date_in IS NULL
+                  AND BL.Due_date < date('now')) AS Overdue_books
+        FROM BORROWER_FINES BF
+        JOIN BORROWER B ON B.Card_id = BF.Card_id
+        WHERE BF.Unpaid_count > 0
+        ORDER BY BF.Unpaid_amt DESC
+        LIMIT ?
+    """, (limit,))
+
+
+def top_titles(limit=10):
+    """Most borrowed titles of all time (archived loans included)."""
+    return _query("""
+        SELECT TC.Isbn, B.Title, TC.Checkouts
+        FROM TITLE_CIRCULATION TC
+        JOIN BOOK B ON B.Isbn = TC.Isbn
+        ORDER BY TC.Checkouts DESC
+        LIMIT ?
+    """, (limit,))
+
+
+def top_authors(limit=10):
+    """Authors whose books were borrowed most often."""
+    return _query("""
+        SELECT A.Name, SUM(TC.Checkouts) AS Checkouts, COUNT(*) AS Titles
+        FROM TITLE_CIRCULATION TC
+        JOIN BOOK_AUTHORS BA ON BA.Isbn = TC.Isbn
+        JOIN AUTHORS A ON A.Author_id = BA.Author_id
+        GROUP BY A.Author_id
+        ORDER BY Checkouts DESC
+        LIMIT ?
+    """, (limit,))
+
+
+def daily_volumes(days=30, today=None):
+    """Checkouts and check-ins per day for the last `days` days (newest first, busy days only)."""
+    today = today or datetime.date.today()
+    since = today - datetime.timedelta(days=days - 1)
+    return _query("""
+        SELECT Day, Checkouts, Checkins
+        FROM DAILY_CIRCULATION
+        WHERE Day >= ?
+        ORDER BY Day DESC
+    """, (since.isoformat(),))
+
+
+def dashboard(limit=10, days=30):
+    """All reports in one dictionary (what the GUI and the CLI show)."""
+    return {
+        'aging': fines_aging(),
+        'borrowers': top_overdue_borrowers(limit),
+        'titles': top_titles(limit),
+        'authors': top_authors(limit),
+        'daily': daily_volumes(days),
+    }
+
+
+def rebuild_rollups():
+    """
+    Recomputes every rollup table from BOOK_LOANS, LOAN_HISTORY and FINES.
+    Only needed after data was changed with the triggers missing.
+    """
+    conn = library._get_db_connection()
+    if conn is None:
+        return (False, "DB Connection Error")
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        for statement in create_db.ROLLUP_BACKFILL:
+            cursor.execute(statement)
+        conn.commit()
+        return (True, "Report rollups rebuilt.")
+    except sqlite3.Error as e:
+        conn.rollback()
+        return (False, f"An unexpected database error occurred: {e}")
+    finally:
+        conn.close()
+
+
+def print_dashboard(report):
+    print("Unpaid fines by age")
+    for row in report['aging']:
+        print(f"  {row['Bucket']:<12}{row['Fines']:>7} fines  ${row['Amount']:>10.2f}")
+
+    print("\nTop borrowers by unpaid fines")
+    for row in report['borrowers']:
+        print(f"  {row['Card_id']}  {row['Bname']:<30}${row['Unpaid_amt']:>8.2f}  "
+              f"{row['Overdue_books']} overdue")
+
+    print("\nMost borrowed titles")
+    for row in report['titles']:
+        print(f"  {row['Checkouts']:>5}  {row['Title']}")
+
+    print("\nMost borrowed authors")
+    for row in report['authors']:
+        print(f"  {row['Checkouts']:>5}  {row['Name']} ({row['Titles']} titles)")
+
+    print("\nDaily circulation")
+    for row in report['daily']:
+        print(f"  {row['Day']}  out {row['Checkouts']:>4}  in {row['Checkins']:>4}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fines aging and circulation reports")
+    parser.add_argument("--db", default=library.DB_FILE)
+    parser.add_argument("--limit", type=int, default=10, help="rows in the top-N reports")
+    parser.add_argument("--days", type=int, default=30, help="days of daily volumes")
+    parser.add_argument("--rebuild", action="store_true", help="recompute the rollups first")
+    args = parser.parse_args(argv)
+
+    library.DB_FILE = args.db
+    if args.rebuild:
+        print(rebuild_rollups()[1])
+    print_dashboard(dashboard(args.limit, args.days))
+
+
+if __name__ == "__main__":
+    main()
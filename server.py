@@ -0,0 +1,230 @@
+"""
+Local HTTP/JSON service in front of library_app.
+
+Workstations talk to this one process instead of opening library.db
+themselves, so SQLite only ever sees one writer connection (writes are
+serialized by a lock) plus a small pool of reader connections.
+
+Run:
+    python server.py --host 127.0.0.1 --port 8080
+
+Endpoints (all responses are JSON):
+    GET  /books?q=...[&fuzzy=1&limit=50&min_score=0.6]   search_books / fuzzy_search_books
+    GET  /suggest?q=...[&limit=10]       suggest
+    GET  /books/<isbn>/borrower          get_borrower_for_book
+    GET  /loans?q=...[&limit=&after_due=&after_id=]   search_active_loans
+    GET  /loans/checked-out?q=...        getBooksCheckedOut
+    GET  /fines?card=...&name=...        search_unpaid_fines
+    GET  /fines/<card_id>[?include_paid=1]   get_borrower_fines
+    GET  /fines/accrual                  get_accrual_status
+    GET  /borrowers/<card_id>/loans      get_borrower_loans
+    GET  /borrowers/<card_id>/eligibility   get_checkout_eligibility
+    GET  /borrower-cache                 borrower_cache_stats
+    GET  /reports[?limit=10&days=30]     reports.dashboard
+    POST /checkout        {"isbn", "card_id"}
+    POST /checkin         {"loan_id"}
+    POST /login           {"username", "password"}   authenticate_user
+    POST /borrowers       {"bname", "ssn", "address", "phone"[, "card_id", "username", "password"]}
+    POST /card-ids        {"count"}    allocate_card_ids
+    POST /fines/refresh
+    POST /fines/<card_id>/pay
+
+Every response carries a Server-Timing header with the time spent in
+library_app, and connections are kept alive (HTTP/1.1). Fines are
+accrued in the background (--accrual-interval, 0 turns it off).
+"""
+import argparse
+import json
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import fine_scheduler
+import library_app as library
+import reports
+
+
+class LibraryServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, readers=4, db_file=None):
+        super().__init__(address, LibraryRequestHandler)
+        db_file = db_file or library.DB_FILE
+        # One writer connection shared by every request thread; the lock
+        # makes sure only one write runs on it at a time
+        self.writer = library.open_connection(db_file, check_same_thread=False)
+        self.writer_lock = threading.Lock()
+        self.readers = queue.Queue()
+        for _ in range(readers):
+            self.readers.put(library.open_connection(db_file, read_only=True,
+                                                     check_same_thread=False))
+
+    @contextmanager
+    def reading(self):
+        conn = self.readers.get()
+        try:
+            with library.use_connection(read_conn=conn):
+                yield
+        finally:
+            self.readers.put(conn)
+
+    @contextmanager
+    def writing(self):
+        with self.writer_lock:
+            with library.use_connection(self.writer):
+                yield
+
+    def server_close(self):
+        super().server_close()
+        self.writer.close()
+        while not self.readers.empty():
+            self.readers.get().close()
+
+
+class LibraryRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    # ---------------- Plumbing ----------------
+    def _send_json(self, status, payload, elapsed_ms):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Server-Timing", f"app;dur={elapsed_ms:.2f}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length).decode("utf-8"))
+
+    def _dispatch(self, method):
+        url = urlparse(self.path)
+        parts = [unquote(p) for p in url.path.strip("/").split("/") if p]
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        started = time.perf_counter()
+        try:
+            body = self._read_json() if method == "POST" else {}
+            status, payload = self._route(method, parts, params, body)
+        except (ValueError, KeyError, TypeError) as e:
+            status, payload = 400, {'error': f"Bad request: {e}"}
+        except sqlite3.Error as e:
+            status, payload = 500, {'error': f"An unexpected database error occurred: {e}"}
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._send_json(status, payload, elapsed_ms)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def log_message(self, format, *args):
+        # Keep the console quiet; timing is reported in the headers
+        pass
+
+    # ---------------- Routes ----------------
+    def _route(self, method, parts, params, body):
+        server = self.server
+
+        if method == "GET":
+            with server.reading():
+                if parts == ["books"]:
+                    if params.get("fuzzy") in ("1", "true", "yes"):
+                        return 200, library.fuzzy_search_books(
+                            params.get("q", ""), int(params.get("limit", 50)),
+                            float(params.get("min_score", 0.6)))
+                    return 200, library.search_books(params.get("q", ""))
+                if parts == ["suggest"]:
+                    return 200, library.suggest(params.get("q", ""), int(params.get("limit", 10)))
+                if len(parts) == 3 and parts[0] == "books" and parts[2] == "borrower":
+                    return 200, {'card_id': library.get_borrower_for_book(parts[1])}
+                if parts == ["loans"]:
+                    after = None
+                    if "after_due" in params:
+                        after = (params["after_due"], int(params["after_id"]))
+                    limit = int(params["limit"]) if "limit" in params else None
+                    return 200, library.search_active_loans(params.get("q", ""), after, limit)
+                if parts == ["loans", "checked-out"]:
+                    return 200, library.getBooksCheckedOut(params.get("q", ""))
+                if parts == ["fines"]:
+                    return 200, library.search_unpaid_fines(params.get("card", ""),
+                                                            params.get("name", ""))
+                if len(parts) == 3 and parts[0] == "borrowers" and parts[2] == "loans":
+                    return 200, library.get_borrower_loans(parts[1])
+                if len(parts) == 3 and parts[0] == "borrowers" and parts[2] == "eligibility":
+                    return 200, library.get_checkout_eligibility(parts[1])
+                if parts == ["borrower-cache"]:
+                    return 200, library.borrower_cache_stats()
+                if parts == ["fines", "accrual"]:
+                    return 200, library.get_accrual_status()
+                if parts == ["reports"]:
+                    return 200, reports.dashboard(int(params.get("limit", 10)),
+                                                  int(params.get("days", 30)))
+                if len(parts) == 2 and parts[0] == "fines":
+                    include_paid = params.get("include_paid") in ("1", "true", "yes")
+                    return 200, library.get_borrower_fines(parts[1], include_paid)
+
+        if method == "POST":
+            with server.writing():
+                if parts == ["checkout"]:
+                    return self._result(library.checkout_book(body["isbn"], body["card_id"]))
+                if parts == ["checkin"]:
+                    return self._result(library.checkin_book(int(body["loan_id"])))
+                if parts == ["login"]:
+                    return 200, library.authenticate_user(body.get("username"), body.get("password"))
+                if parts == ["borrowers"]:
+                    return self._result(library.add_borrower(
+                        body.get("bname"), body.get("ssn"), body.get("address"), body.get("phone"),
+                        body.get("card_id"), body.get("username"), body.get("password")))
+                if parts == ["card-ids"]:
+                    return 200, library.allocate_card_ids(int(body.get("count", 1)))
+                if parts == ["fines", "refresh"]:
+                    return self._result(library.update_all_fines())
+                if len(parts) == 3 and parts[0] == "fines" and parts[2] == "pay":
+                    return self._result(library.pay_borrower_fines(parts[1]))
+
+        return 404, {'error': f"No such endpoint: {method} /{'/'.join(parts)}"}
+
+    @staticmethod
+    def _result(result):
+        success, message = result
+        return 200, {'success': success, 'message': message}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Library HTTP/JSON service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--readers", type=int, default=4, help="reader connections in the pool")
+    parser.add_argument("--db", default=library.DB_FILE)
+    parser.add_argument("--accrual-interval", type=float, default=300.0,
+                        help="seconds between background fine accruals (0: off)")
+    args = parser.parse_args(argv)
+
+    library.DB_FILE = args.db
+    server = LibraryServer((args.host, args.port), readers=args.readers)
+    scheduler = None
+    if args.accrual_interval > 0:
+        scheduler = fine_scheduler.FineAccrualScheduler(args.accrual_interval)
+        scheduler.start()
+    print(f"Serving {args.db} on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if scheduler is not None:
+            scheduler.stop()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
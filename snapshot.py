@@ -0,0 +1,398 @@
+"""
+Snapshot export / import of the library database.
+
+A snapshot is one file that rebuilds a database without create_db.py,
+load_data.py or any CSV parsing:
+
+    magic    b"LIBSNAP1"
+    header   uint32 length, uint32 CRC32, then JSON: format version,
+             creation time, the schema (CREATE statements from
+             sqlite_master) and the tables with their columns
+    chunks   uint16 table number, uint32 row count, uint32 compressed
+             length, uint32 CRC32 of the uncompressed payload, then the
+             zlib-compressed payload (the rows, marshal-encoded)
+    end      uint16 0xFFFF
+
+Restore creates the tables, streams the chunks in with executemany
+under bulk-load settings (no journal, no fsync, foreign keys off) and
+only then builds the indexes, views and triggers, so the change-log
+triggers do not fire for restored rows. Report rollups are not carried:
+they are recomputed from the restored tables before the triggers exist,
+and so are the full-text search indexes.
+The AUTOINCREMENT counters (sqlite_sequence) travel in the header, so
+Loan_ids already archived to LOAN_HISTORY are not handed out again.
+
+    python library_admin.py snapshot export library.snap
+    python library_admin.py snapshot restore library.snap branch.db
+    python library_admin.py snapshot bench --scales 1 10
+"""
+import json
+import marshal
+import os
+import sqlite3
+import struct
+import time
+import zlib
+
+import create_db
+
+MAGIC = b"LIBSNAP1"
+FORMAT_VERSION = 1
+END_OF_DATA = 0xFFFF
+
+# Tables carried in a snapshot, in restore order (parents first)
+SNAPSHOT_TABLES = ['BOOK', 'AUTHORS', 'BOOK_AUTHORS', 'BORROWER', 'BOOK_LOANS',
+                   'FINES', 'USERS', 'LOAN_HISTORY', 'FINE_POLICY', 'BORROWER_CLASS']
+
+_HEADER = struct.Struct("<II")
+_TABLE_NUMBER = struct.Struct("<H")
+_CHUNK = struct.Struct("<III")
+_MARSHAL_VERSION = 4
+
+
+class SnapshotError(Exception):
+    """The snapshot file is damaged or not a snapshot at all."""
+
+
+def _schema(conn):
+    """
+    CREATE statements from sqlite_master, tables first (internal objects
+    and the full-text indexes' own storage tables skipped).
+    """
+    rows = conn.execute("""
+        SELECT type, name, sql FROM sqlite_master
+        WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'
+        ORDER BY CASE type WHEN 'table' THEN 0 WHEN 'index' THEN 1
+                           WHEN 'view' THEN 2 ELSE 3 END, rowid
+    """).fetchall()
+    shadow = tuple(f"{table}_" for table in create_db.SEARCH_TABLES)
+    return [{'type': kind, 'name': name, 'sql': sql} for kind, name, sql in rows
+            if not name.startswith(shadow)]
+
+
+def _sequences(conn):
+    """AUTOINCREMENT counters as [table, last id] pairs (empty without such tables)."""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'").fetchone()
+    if not exists:
+        return []
+    return [list(row) for row in conn.execute("SELECT name, seq FROM sqlite_sequence")]
+
+
+def _restore_sequences(conn, sequences):
+    """
+    Puts the saved counters back (never below what the restored rows
+    already set). Snapshots without them get BOOK_LOANS reseeded past
+    every Loan_id in LOAN_HISTORY.
+    """
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if 'sqlite_sequence' not in tables:
+        return
+    wanted = {name: seq for name, seq in sequences}
+    if 'BOOK_LOANS' in tables and 'LOAN_HISTORY' in tables:
+        archived = conn.execute("SELECT MAX(Loan_id) FROM LOAN_HISTORY").fetchone()[0]
+        if archived is not None:
+            wanted['BOOK_LOANS'] = max(wanted.get('BOOK_LOANS', 0), archived)
+    for name, seq in wanted.items():
+        current = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (name,)).fetchone()
+        if current is None:
+            conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (name, seq))
+        elif current[0] < seq:
+            conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = ?", (seq, name))
+
+
+def export_snapshot(db_path, snapshot_path, tables=None, chunk_rows=20000, level=6):
+    """
+    Writes a snapshot of db_path to snapshot_path (via a .partial file).
+
+    Rows are read in chunk_rows batches, so memory stays flat on large
+    databases. Returns a dictionary with 'success', 'message', 'path',
+    'bytes', 'rows' and 'seconds'.
+    """
+    tables = tables or SNAPSHOT_TABLES
+    failed = {'success': False, 'path': snapshot_path, 'bytes': 0, 'rows': 0, 'seconds': 0.0}
+    if not os.path.exists(db_path):
+        return dict(failed, message=f"Error: Database file '{db_path}' not found.")
+
+    started = time.perf_counter()
+    partial_path = snapshot_path + ".partial"
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    total_rows = 0
+    try:
+        # One read transaction: every table comes from the same moment
+        conn.execute("BEGIN")
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        tables = [table for table in tables if table in existing]
+        header = {
+            'version': FORMAT_VERSION,
+            'created': time.strftime("%Y-%m-%d %H:%M:%S"),
+            'schema': _schema(conn),
+            'sequences': _sequences(conn),
+            'tables': [{'name': table,
+                        'columns': [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]}
+                       for table in tables],
+        }
+        header_bytes = json.dumps(header).encode("utf-8")
+
+        with open(partial_path, 'wb') as out:
+            out.write(MAGIC)
+            out.write(_HEADER.pack(len(header_bytes), zlib.crc32(header_bytes)))
+            out.write(header_bytes)
+
+            for number, table in enumerate(tables):
+                columns = ", ".join(header['tables'][number]['columns'])
+                cursor = conn.execute(f"SELECT {columns} FROM {table}")
+                while True:
+                    rows = cursor.fetchmany(chunk_rows)
+                    if not rows:
+                        break
+                    payload = marshal.dumps(rows, _MARSHAL_VERSION)
+                    compressed = zlib.compress(payload, level)
+                    out.write(_TABLE_NUMBER.pack(number))
+                    out.write(_CHUNK.pack(len(rows), len(compressed), zlib.crc32(payload)))
+                    out.write(compressed)
+                    total_rows += len(rows)
+
+            out.write(_TABLE_NUMBER.pack(END_OF_DATA))
+        conn.rollback()
+    except (sqlite3.Error, OSError) as e:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        return dict(failed, message=f"Error: Snapshot failed: {e}")
+    finally:
+        conn.close()
+
+    os.replace(partial_path, snapshot_path)
+    seconds = time.perf_counter() - started
+    size = os.path.getsize(snapshot_path)
+    return {'success': True, 'path': snapshot_path, 'bytes': size, 'rows': total_rows,
+            'seconds': seconds,
+            'message': f"Wrote {total_rows} rows from {len(tables)} tables to {snapshot_path} "
+                       f"({size / 1024 / 1024:.1f} MB) in {seconds:.2f}s."}
+
+
+def _read_exact(file, size):
+    data = file.read(size)
+    if len(data) != size:
+        raise SnapshotError("Snapshot is truncated.")
+    return data
+
+
+def read_header(file):
+    """Reads and checks the magic and header; returns the header dictionary."""
+    if file.read(len(MAGIC)) != MAGIC:
+        raise SnapshotError("Not a library snapshot file.")
+    length, checksum = _HEADER.unpack(_read_exact(file, _HEADER.size))
+    header_bytes = _read_exact(file, length)
+    if zlib.crc32(header_bytes) != checksum:
+        raise SnapshotError("Snapshot header checksum mismatch.")
+    header = json.loads(header_bytes)
+    if header['version'] != FORMAT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot version {header['version']}.")
+    return header
+
+
+def read_chunks(file):
+    """Yields (table number, rows) for each chunk, verifying every checksum."""
+    while True:
+        (number,) = _TABLE_NUMBER.unpack(_read_exact(file, _TABLE_NUMBER.size))
+        if number == END_OF_DATA:
+            return
+        count, length, checksum = _CHUNK.unpack(_read_exact(file, _CHUNK.size))
+        payload = zlib.decompress(_read_exact(file, length))
+        if zlib.crc32(payload) != checksum:
+            raise SnapshotError(f"Chunk checksum mismatch in table #{number}.")
+        rows = marshal.loads(payload)
+        if len(rows) != count:
+            raise SnapshotError(f"Chunk row count mismatch in table #{number}.")
+        yield number, rows
+
+
+def restore_snapshot(snapshot_path, dest_path, overwrite=False):
+    """
+    Builds dest_path from a snapshot (via a .partial file), then runs
+    PRAGMA integrity_check and foreign_key_check on the result.
+
+    Returns a dictionary with 'success', 'message', 'path', 'bytes',
+    'rows' and 'seconds'.
+    """
+    failed = {'success': False, 'path': dest_path, 'bytes': 0, 'rows': 0, 'seconds': 0.0}
+    if not os.path.exists(snapshot_path):
+        return dict(failed, message=f"Error: Snapshot file '{snapshot_path}' not found.")
+    if os.path.exists(dest_path) and not overwrite:
+        return dict(failed, message=f"Error: '{dest_path}' already exists.")
+
+    started = time.perf_counter()
+    partial_path = dest_path + ".partial"
+    if os.path.exists(partial_path):
+        os.remove(partial_path)
+
+    conn = sqlite3.connect(partial_path)
+    total_rows = 0
+    try:
+        # Bulk-load settings: the file is thrown away if anything fails
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA foreign_keys = OFF")
+        conn.execute("PRAGMA cache_size = -65536")
+
+        with open(snapshot_path, 'rb') as file:
+            header = read_header(file)
+            schema = header['schema']
+            tables = header['tables']
+
+            conn.execute("BEGIN")
+            for entry in schema:
+                if entry['type'] == 'table':
+                    conn.execute(entry['sql'])
+
+            inserts = []
+            for table in tables:
+                marks = ", ".join("?" * len(table['columns']))
+                inserts.append(f"INSERT INTO {table['name']} ({', '.join(table['columns'])}) "
+                               f"VALUES ({marks})")
+            for number, rows in read_chunks(file):
+                conn.executemany(inserts[number], rows)
+                total_rows += len(rows)
+            carried = {table['name'] for table in tables}
+            _restore_sequences(conn, [entry for entry in header.get('sequences', [])
+                                      if entry[0] in carried])
+
+            # Indexes are built once over the loaded data; triggers last
+            # so restored rows don't land in CHANGE_LOG
+            for entry in schema:
+                if entry['type'] in ('index', 'view'):
+                    conn.execute(entry['sql'])
+            if any(entry['name'] == 'DAILY_CIRCULATION' for entry in schema):
+                for statement in create_db.ROLLUP_BACKFILL:
+                    conn.execute(statement)
+            if any(entry['name'] == 'BOOK_TITLE_FTS' for entry in schema):
+                for statement in create_db.SEARCH_BACKFILL:
+                    conn.execute(statement)
+            for entry in schema:
+                if entry['type'] == 'trigger':
+                    conn.execute(entry['sql'])
+            conn.commit()
+
+        integrity = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        dangling = conn.execute("PRAGMA foreign_key_check").fetchone()
+    except (sqlite3.Error, SnapshotError, OSError, ValueError, EOFError, zlib.error) as e:
+        conn.close()
+        os.remove(partial_path)
+        return dict(failed, message=f"Error: Restore failed: {e}")
+    conn.close()
+
+    if integrity != "ok" or dangling is not None:
+        os.remove(partial_path)
+        problem = integrity if integrity != "ok" else f"dangling reference in {dangling[0]}"
+        return dict(failed, message=f"Error: Restored database failed checks: {problem}")
+
+    os.replace(partial_path, dest_path)
+    seconds = time.perf_counter() - started
+    size = os.path.getsize(dest_path)
+    return {'success': True, 'path': dest_path, 'bytes': size, 'rows': total_rows,
+            'seconds': seconds,
+            'message': f"Restored {total_rows} rows into {dest_path} in {seconds:.2f}s."}
+
+
+# ---------------- Benchmark ----------------
+
+def _isbn10(number):
+    body = f"{number:09d}"
+    total = sum((10 - i) * int(digit) for i, digit in enumerate(body))
+    check = (11 - total % 11) % 11
+    return body + ("X" if check == 10 else str(check))
+
+
+def write_scaled_csvs(source_dir, dest_dir, factor):
+    """
+    Writes book/authors/book_authors/borrower CSVs that are `factor`
+    copies of the ones in source_dir, with fresh ISBNs, Author_ids,
+    Card_ids and SSNs so every copy loads cleanly.
+    """
+    import csv
+
+    def read(name):
+        with open(os.path.join(source_dir, name), encoding='utf-8-sig', newline='') as file:
+            rows = list(csv.reader(file))
+        return rows[0], rows[1:]
+
+    def write(name, header, rows):
+        with open(os.path.join(dest_dir, name), 'w', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(header)
+            writer.writerows(rows)
+
+    book_header, books = read('book.csv')
+    author_header, authors = read('authors.csv')
+    link_header, links = read('book_authors.csv')
+    borrower_header, borrowers = read('borrower.csv')
+    max_author = max(int(row[0]) for row in authors)
+
+    new_books, new_authors, new_links, new_borrowers = [], [], [], []
+    serial = 0
+    for copy in range(factor):
+        isbn_map = {}
+        for isbn, title in books:
+            serial += 1
+            isbn_map[isbn] = _isbn10(serial)
+            new_books.append([isbn_map[isbn], title])
+        offset = copy * max_author
+        new_authors.extend([int(author_id) + offset, name] for author_id, name in authors)
+        new_links.extend([int(author_id) + offset, isbn_map[isbn]]
+                         for author_id, isbn in links if isbn in isbn_map)
+        for card_id, ssn, name, address, phone in borrowers:
+            number = int(card_id[2:]) + copy * len(borrowers)
+            digits = f"{number:09d}"
+            new_borrowers.append([f"ID{number:06d}", f"{digits[:3]}-{digits[3:5]}-{digits[5:]}",
+                                  name, address, phone])
+
+    write('book.csv', book_header, new_books)
+    write('authors.csv', author_header, new_authors)
+    write('book_authors.csv', link_header, new_links)
+    write('borrower.csv', borrower_header, new_borrowers)
+
+
+def benchmark(scales=(1, 10), source_dir="."):
+    """Times create_db + load_data against snapshot restore at each scale."""
+    import contextlib
+    import io
+    import tempfile
+
+    import create_db
+    import load_data
+
+    original = (create_db.DB_FILE, load_data.DB_FILE, os.getcwd())
+    source_dir = os.path.abspath(source_dir)
+    try:
+        for factor in scales:
+            with tempfile.TemporaryDirectory() as workdir:
+                write_scaled_csvs(source_dir, workdir, factor)
+                # load_data reads the CSVs from the current directory
+                os.chdir(workdir)
+                db_path = os.path.join(workdir, "library.db")
+                create_db.DB_FILE = load_data.DB_FILE = db_path
+
+                started = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    create_db.create_database()
+                    load_data.load_data()
+                csv_seconds = time.perf_counter() - started
+                csv_bytes = sum(os.path.getsize(name) for name in load_data.CSV_FILES_TO_TABLES)
+                os.chdir(original[2])
+
+                snap_path = os.path.join(workdir, "library.snap")
+                export = export_snapshot(db_path, snap_path)
+                restore = restore_snapshot(snap_path, os.path.join(workdir, "restored.db"))
+                if not restore['success']:
+                    print(restore['message'])
+                    continue
+
+                print(f"x{factor}: {restore['rows']} rows, CSV {csv_bytes / 1024 / 1024:.1f} MB, "
+                      f"snapshot {export['bytes'] / 1024 / 1024:.1f} MB")
+                print(f"    CSV reload (create_db + load_data): {csv_seconds:6.2f}s")
+                print(f"    snapshot export:                    {export['seconds']:6.2f}s")
+                print(f"    snapshot restore:                   {restore['seconds']:6.2f}s"
+                      f"  (x{csv_seconds / restore['seconds']:.1f} faster)")
+    finally:
+        create_db.DB_FILE, load_data.DB_FILE = original[:2]
+        os.chdir(original[2])